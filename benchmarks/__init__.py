@@ -0,0 +1,7 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Benchmarks of the PlasticSCM API client against a local stand-in server.
+
+Run with: python -m benchmarks --help
+"""
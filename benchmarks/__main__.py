@@ -0,0 +1,89 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import argparse
+import datetime
+import platform
+import json
+import sys
+
+import plasticscm
+from plasticscm import Plastic
+from plasticscm.metrics import metrics
+
+from .data import SyntheticRepo
+from .server import FakeServer
+from . import suite
+
+SUITES = ("methods", "parse", "memory", "clients")
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmarks of the PlasticSCM API client.")
+    parser.add_argument("--changesets", type=int, default=1000)
+    parser.add_argument("--branches",   type=int, default=50)
+    parser.add_argument("--labels",     type=int, default=100)
+    parser.add_argument("--diff-size",  type=int, default=100,
+                        help="entries of a diff and of the pending changes")
+    parser.add_argument("--history-size", type=int, default=50)
+    parser.add_argument("--seed",       type=int, default=0)
+    parser.add_argument("--latency",    type=float, default=0.0,
+                        help="artificial server latency in seconds")
+    parser.add_argument("--repeat",     type=int, default=20)
+    parser.add_argument("--calls",      type=int, default=200,
+                        help="requests of the client comparison")
+    parser.add_argument("--workers",    type=int, default=8)
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help="run only the given suite(s)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="disable the built-in metrics of the client")
+    parser.add_argument("-o", "--output", help="store the results (JSON) in the file")
+    parser.add_argument("--baseline", help="compare with the results (JSON) in the file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="tolerated slowdown against the baseline (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    metrics.enabled = not args.no_metrics
+    repo = SyntheticRepo(changesets=args.changesets, branches=args.branches,
+                         labels=args.labels, diff_size=args.diff_size,
+                         history_size=args.history_size, seed=args.seed)
+    params = {key: value for key, value in vars(args).items()
+              if key not in ("output", "baseline", "tolerance")}
+    results = {"meta": {"date":       datetime.datetime.now().isoformat(timespec="seconds"),
+                        "version":    plasticscm.__version__,
+                        "python":     platform.python_version(),
+                        "platform":   platform.platform(),
+                        "parameters": params}}
+    suites = args.suite or SUITES
+    with FakeServer(repo, latency=args.latency) as server:
+        plastic = Plastic(server.url)
+        if "methods" in suites:
+            results["methods"] = suite.bench_methods(plastic, repo, args.repeat)
+        if "parse" in suites:
+            results["parse"] = suite.bench_parse(plastic, repo, args.repeat)
+        if "memory" in suites:
+            results["memory"] = suite.bench_memory(plastic, repo)
+        if "clients" in suites:
+            results["clients"] = suite.bench_clients(plastic, repo, args.calls, args.workers)
+
+    for name in ("methods", "parse", "clients"):
+        for key, stats in results.get(name, {}).items():
+            print("{:<10} {:<40} median {:10.6f}s  p95 {:10.6f}s".format(
+                  name, key, stats["median"], stats["p95"]))
+    for key, peak in results.get("memory", {}).items():
+        print("{:<10} {:<40} peak {:10d} B".format("memory", key, peak))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = suite.compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Synthetic repositories in the JSON format of the PlasticSCM REST API (v1)."""
+
+from typing import Any, Dict, List
+from datetime import datetime, timedelta
+from functools import lru_cache
+import uuid
+import random
+
+EPOCH = datetime(2020, 1, 1)
+
+
+class SyntheticRepo:
+    """A deterministic, generated repository.
+
+    All the payloads are plain JSON-compatible objects, as returned by
+    the REST API.
+    """
+
+    def __init__(self, *, name: str = "bench", server: str = "localhost:8087",
+                 changesets: int = 1000, branches: int = 50, labels: int = 100,
+                 diff_size: int = 100, history_size: int = 50, dir_size: int = 100,
+                 blob_size: int = 64 * 1024, seed: int = 0):
+        """Init
+
+        Args:
+            name:         The name of the repository.
+            server:       The name of the PlasticSCM server.
+            changesets:   The number of changesets.
+            branches:     The number of branches (including /main).
+            labels:       The number of labels.
+            diff_size:    The number of entries of a diff (and of pending changes).
+            history_size: The number of revisions of an item.
+            dir_size:     The number of entries of a directory.
+            blob_size:    The size of a file content in bytes.
+            seed:         The seed of the generator.
+        """
+        self.name = name
+        self.server = server
+        self.diff_size = diff_size
+        self.history_size = history_size
+        self.dir_size = dir_size
+        self.blob_size = blob_size
+        self.seed = seed
+        rnd = random.Random(seed)
+        self.owner = {"name": "tester", "isGroup": False}
+        self.repository = {"repId": {"id": 1, "moduleId": 0}, "name": name,
+                           "guid": self._guid(rnd), "owner": self.owner, "server": server}
+        self.repository_ref = {"name": name, "server": server}
+        self.branches: List[Dict[str, Any]] = []
+        for id in range(max(1, branches)):  # noqa A001
+            self.branches.append({
+                "name": "/main" if id == 0 else "/main/task{:04}".format(id),
+                "id": id + 1, "parentId": 1 if id else -1, "lastChangeset": 0,
+                "comment": "branch {}".format(id), "creationDate": self._date(id),
+                "guid": self._guid(rnd), "owner": self.owner,
+                "repository": self.repository_ref})
+        self.changesets: List[Dict[str, Any]] = []
+        for id in range(max(1, changesets)):  # noqa A001
+            branch = self.branches[0] if id == 0 else rnd.choice(self.branches)
+            branch["lastChangeset"] = id
+            self.changesets.append({
+                "id": id, "parentId": id - 1, "comment": "changeset {}".format(id),
+                "creationDate": self._date(id), "guid": self._guid(rnd),
+                "branch": branch, "owner": self.owner, "repository": self.repository_ref})
+        self.labels: List[Dict[str, Any]] = [{
+            "name": "BL{:04}".format(index), "id": index + 1,
+            "changeset": rnd.randrange(len(self.changesets)),
+            "comment": "label {}".format(index), "creationDate": self._date(index),
+            "branch": self.branches[0], "owner": self.owner,
+            "repository": self.repository_ref} for index in range(labels)]
+        self.workspaces = [{"name": "wk{}".format(index),
+                            "path": "/wkspaces/wk{}".format(index),
+                            "machineName": "bench", "guid": self._guid(rnd)}
+                           for index in range(4)]
+
+    @staticmethod
+    def _guid(rnd: random.Random) -> str:
+        return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+    @staticmethod
+    def _date(offset: int) -> str:
+        return (EPOCH + timedelta(minutes=offset)).isoformat()
+
+    def branch(self, name: str) -> Dict[str, Any]:
+        name = "/" + name.strip("/")
+        return next(branch for branch in self.branches if branch["name"] == name)
+
+    def label(self, name: str) -> Dict[str, Any]:
+        return next(label for label in self.labels if label["name"] == name)
+
+    def changeset(self, changeset_id: int) -> Dict[str, Any]:
+        return next(chset for chset in self.changesets if chset["id"] == changeset_id)
+
+    @lru_cache(maxsize=1024)
+    def diff(self, changeset_id: int) -> List[Dict[str, Any]]:
+        rnd = random.Random(self.seed * 1000003 + changeset_id)
+        changeset = self.changesets[changeset_id % len(self.changesets)]
+        diffs = []
+        for index in range(self.diff_size):
+            status = rnd.choice(("Added", "Changed", "Deleted", "Moved"))
+            diff = {"status": status, "path": "/src/dir{}/file{}.c".format(index // 20, index),
+                    "revisionId": 10000 + index, "isDirectory": False,
+                    "size": rnd.randrange(1, 100000), "hash": "u0gJQzQnjLNUUHRI1+QQLg==",
+                    "isUnderXlink": False, "isItemFSProtectionChanged": False,
+                    "itemFileSystemProtection": "NOT_DEFINED",
+                    "repository": self.repository_ref,
+                    "modifiedTime": self._date(index), "createdBy": self.owner}
+            if status == "Moved":
+                diff["srcPath"] = diff["path"] + ".old"
+            if status == "Changed":
+                diff["srcRevisionId"] = 9000 + index
+                diff["srcHash"] = "tLq1aWZ24MGupAHKZAgYFA=="
+            if index % 10 == 0:
+                diff["merges"] = [{"mergeType": "Merged", "sourceChangeset": changeset}]
+            diffs.append(diff)
+        return diffs
+
+    def history(self, branch_name: str, item_path: str) -> List[Dict[str, Any]]:
+        return [{"type": "text", "revisionId": 1000 + index,
+                 "changesetId": index % len(self.changesets),
+                 "branchName": "/" + branch_name.strip("/"), "repositoryName": self.name,
+                 "comment": "revision {}".format(index), "creationDate": self._date(index),
+                 "owner": self.owner} for index in range(self.history_size)]
+
+    def item(self, item_path: str) -> Dict[str, Any]:
+        path = "/" + item_path.strip("/")
+        if path.endswith(".c"):
+            return {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path,
+                    "revisionId": 5000, "size": self.blob_size, "isUnderXlink": False,
+                    "hash": "u0gJQzQnjLNUUHRI1+QQLg==", "repository": self.repository_ref,
+                    "content": "/api/v1/repos/{}/revisions/5000/blob".format(self.name)}
+        return {"type": "directory", "name": path.rsplit("/", 1)[-1], "path": path,
+                "revisionId": 4000, "size": 0, "isUnderXlink": False,
+                "repository": self.repository_ref,
+                "items": [{"type": "file", "name": "file{}.c".format(index),
+                           "path": "{}/file{}.c".format(path.rstrip("/"), index),
+                           "revisionId": 5000 + index, "size": self.blob_size,
+                           "isUnderXlink": False, "hash": "u0gJQzQnjLNUUHRI1+QQLg==",
+                           "content": "/api/v1/repos/{}/revisions/{}/blob".format(
+                                      self.name, 5000 + index)}
+                          for index in range(self.dir_size)]}
+
+    def blob(self, revision_id: int) -> bytes:
+        line = "/* revision {} */\n".format(revision_id).encode()
+        return (line * (self.blob_size // len(line) + 1))[:self.blob_size]
+
+    def pending_changes(self) -> List[Dict[str, Any]]:
+        return [{"changes": ["CH"],
+                 "path": "/wkspaces/wk0/src/file{}.c".format(index),
+                 "serverPath": "/src/file{}.c".format(index), "isXlink": False,
+                 "localInfo": {"modifiedTime": self._date(index), "size": 1000 + index,
+                               "isMissing": False},
+                 "revisionInfo": {"id": 1000 + index, "parentId": -1, "itemId": index,
+                                  "type": "text", "size": 1000, "hash": "tLq1aWZ24MGupAHKZAgYFA==",
+                                  "branchId": 1, "changesetId": 1, "isCheckedOut": False,
+                                  "creationDate": self._date(index),
+                                  "repositoryId": {"id": 1, "moduleId": 0},
+                                  "owner": self.owner}}
+                for index in range(self.diff_size)]
+
+    def operation_status(self) -> Dict[str, Any]:
+        return {"status": "Finished", "totalFiles": 10, "totalBytes": 1000,
+                "updatedFiles": 10, "updatedBytes": 1000}
@@ -0,0 +1,148 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Local stand-in of the PlasticSCM REST API (v1) serving a synthetic repository."""
+
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+import threading
+import json
+import time
+import re
+
+from .data import SyntheticRepo
+
+_REPO = r"/api/v1/repos/(?P<repo>[^/]+)"
+
+
+class FakeServer:
+    """Threaded HTTP/1.1 (keep-alive) server of the read-only API routes.
+
+    Serialized responses are cached, so the client side dominates the
+    measurements. An artificial latency can be added to every response.
+    """
+
+    def __init__(self, repo: SyntheticRepo, *, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0):
+        """Init
+
+        Args:
+            repo:    The served repository.
+            host:    The address to listen on (default: "127.0.0.1").
+            port:    The port to listen on (default: any free port).
+            latency: The artificial delay of every response in seconds.
+        """
+        self.repo = repo
+        self.latency = latency
+        self.requests = 0
+        self._routes: List[Tuple[Pattern, Callable[..., Any]]] = [
+            (re.compile(pattern + "$"), handler) for pattern, handler in (
+                (r"/api/v1/repos",                lambda: [repo.repository]),
+                (_REPO,                           lambda repo_: repo.repository),
+                (r"/api/v1/wkspaces",             lambda: repo.workspaces),
+                (r"/api/v1/wkspaces/(?P<wk>[^/]+)",
+                 lambda wk: next(w for w in repo.workspaces if w["name"] == wk)),
+                (r"/api/v1/wkspaces/[^/]+/changes", repo.pending_changes),
+                (r"/api/v1/wkspaces/[^/]+/(update|switch)",
+                 lambda *_: repo.operation_status()),
+                (_REPO + r"/branches",            lambda repo_: repo.branches),
+                (_REPO + r"/branches/(?P<branch>.+)/changesets",
+                 lambda repo_, branch: [chset for chset in repo.changesets
+                                        if chset["branch"]["name"] == "/" + branch]),
+                (_REPO + r"/branches/(?P<branch>.+)/diff",
+                 lambda repo_, branch: repo.diff(repo.branch(branch)["lastChangeset"])),
+                (_REPO + r"/branches/(?P<branch>.+)/history/(?P<path>.+)",
+                 lambda repo_, branch, path: repo.history(branch, path)),
+                (_REPO + r"/branches/(?P<branch>.+)/contents/(?P<path>.*)",
+                 lambda repo_, branch, path: repo.item(path)),
+                (_REPO + r"/branches/(?P<branch>.+)",
+                 lambda repo_, branch: repo.branch(branch)),
+                (_REPO + r"/labels",              lambda repo_: repo.labels),
+                (_REPO + r"/labels/(?P<label>[^/]+)",
+                 lambda repo_, label: repo.label(label)),
+                (_REPO + r"/changesets",          lambda repo_: repo.changesets),
+                (_REPO + r"/changesets/(?P<id>\d+)/diff(/(?P<src>\d+))?",
+                 lambda repo_, id, src: repo.diff(int(id))),  # noqa A002
+                (_REPO + r"/changesets/(?P<id>\d+)/contents/(?P<path>.*)",
+                 lambda repo_, id, path: repo.item(path)),  # noqa A002
+                (_REPO + r"/changesets/(?P<id>\d+)",
+                 lambda repo_, id: repo.changeset(int(id))),  # noqa A002
+                (_REPO + r"/contents/(?P<path>.*)", lambda repo_, path: repo.item(path)),
+                (_REPO + r"/revisions/(?P<rev>\d+)/blob", lambda repo_, rev: repo.blob(int(rev))),
+            )]
+        self._responses: Dict[str, Tuple[int, bytes, str]] = {}
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._host, self._port = host, port
+
+    @property
+    def url(self) -> str:
+        """The endpoint of the API (to be passed to Plastic)."""
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self) -> "FakeServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def do_GET(self):  # noqa N802
+                server.requests += 1
+                status, body, content_type = server._respond(urlsplit(self.path).path)
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # noqa A002
+                pass
+
+        self._httpd = ThreadingHTTPServer((self._host, self._port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = self._thread = None
+
+    def __enter__(self):
+        """Start the server on entry."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop the server on exit."""
+        self.stop()
+
+    def _respond(self, path: str) -> Tuple[int, bytes, str]:
+        response = self._responses.get(path)
+        if response is None:
+            response = self._render(path)
+            if len(self._responses) < 4096:
+                self._responses[path] = response
+        return response
+
+    def _render(self, path: str) -> Tuple[int, bytes, str]:
+        path = unquote(path)
+        for pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            try:
+                payload = handler(*(value for name, value in match.groupdict().items()))
+            except (StopIteration, IndexError):
+                break
+            if isinstance(payload, bytes):
+                return 200, payload, "application/octet-stream"
+            return 200, json.dumps(payload).encode("utf-8"), "application/json"
+        return 404, b'{"error": {"message": "Not found"}}', "application/json"
@@ -0,0 +1,175 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""The benchmarks."""
+
+from typing import Any, Callable, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import tracemalloc
+import asyncio
+import time
+
+from plasticscm import Plastic
+
+from .data import SyntheticRepo
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Latency statistics (in seconds) and throughput (calls/s) of a function."""
+    func()  # warm-up (connections, caches)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {"calls": repeat,
+            "min":    timings[0],
+            "median": statistics.median(timings),
+            "p95":    timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "mean":   statistics.fmean(timings),
+            "throughput": repeat / sum(timings) if sum(timings) else float("inf")}
+
+
+def method_calls(plastic: Plastic, repo: SyntheticRepo) -> Dict[str, Callable[[], Any]]:
+    """The benchmarked Plastic methods (with arguments valid for the repository)."""
+    name = repo.name
+    last = len(repo.changesets) - 1
+    task = repo.branches[-1]["name"]
+    label = repo.labels[0]["name"] if repo.labels else None
+    calls = {
+        "get_repositories":         lambda: plastic.get_repositories(),
+        "get_repository":           lambda: plastic.get_repository(name),
+        "get_workspaces":           lambda: plastic.get_workspaces(),
+        "get_workspace":            lambda: plastic.get_workspace("wk0"),
+        "get_branches":             lambda: plastic.get_branches(name),
+        "get_branch":               lambda: plastic.get_branch(name, task),
+        "get_labels":               lambda: plastic.get_labels(name),
+        "get_changesets":           lambda: plastic.get_changesets(name),
+        "get_changesets_in_branch": lambda: plastic.get_changesets_in_branch(name, "/main"),
+        "get_changeset":            lambda: plastic.get_changeset(name, last),
+        "get_pending_changes":      lambda: plastic.get_pending_changes("wk0"),
+        "get_workspace_update_status": lambda: plastic.get_workspace_update_status("wk0"),
+        "get_item":                 lambda: plastic.get_item(name, "src"),
+        "get_item_in_branch":       lambda: plastic.get_item_in_branch(name, "/main", "src"),
+        "get_item_revision_history_in_branch":
+            lambda: plastic.get_item_revision_history_in_branch(name, "/main", "src/a.c"),
+        "get_item_content":         lambda: plastic.get_item_content(name, 5000),
+        "diff_changeset":           lambda: plastic.diff_changeset(name, last),
+        "diff_changesets":          lambda: plastic.diff_changesets(name, last, 0),
+        "diff_branch":              lambda: plastic.diff_branch(name, task),
+    }
+    if label is not None:
+        calls["get_label"] = lambda: plastic.get_label(name, label)
+    return calls
+
+
+def bench_methods(plastic: Plastic, repo: SyntheticRepo, repeat: int) -> Dict[str, Dict]:
+    """Latency and throughput of every Plastic method (round trip to the server)."""
+    return {method: measure(call, repeat)
+            for method, call in sorted(method_calls(plastic, repo).items())}
+
+
+def converters(plastic: Plastic, repo: SyntheticRepo) -> Dict[str, Tuple[Callable, List]]:
+    """The JSON to model converters of the API with their synthetic inputs."""
+    api = plastic._Plastic__api
+    inputs = {
+        "Repository":          [repo.repository],
+        "Workspace":           repo.workspaces,
+        "Branch":              repo.branches,
+        "Label":               repo.labels,
+        "Changeset":           repo.changesets,
+        "Change":              repo.pending_changes(),
+        "OperationStatus":     [repo.operation_status()],
+        "CheckinStatus":       [{"status": "Checkin finished", "totalSize": 10,
+                                 "transferredSize": 10}],
+        "Item":                [repo.item("src")],
+        "RevisionHistoryItem": repo.history("/main", "src/a.c"),
+        "Diff":                repo.diff(len(repo.changesets) - 1),
+        "AffectedPaths":       [{"affectedPaths": ["/src/file{}.c".format(index)
+                                                   for index in range(repo.diff_size)]}],
+    }
+    return {name: (api.CONVERTERS[name], objects)
+            for name, objects in inputs.items() if objects}
+
+
+def bench_parse(plastic: Plastic, repo: SyntheticRepo, repeat: int) -> Dict[str, Dict]:
+    """Parse-only micro-benchmarks of every JSON to model converter."""
+    results = {}
+    for name, (convert, objects) in sorted(converters(plastic, repo).items()):
+        stats = measure(lambda: [convert(obj) for obj in objects], repeat)
+        stats["objects"] = len(objects)
+        stats["objects_per_second"] = len(objects) / stats["median"] if stats["median"] \
+                                      else float("inf")
+        results[name] = stats
+    return results
+
+
+def bench_memory(plastic: Plastic, repo: SyntheticRepo) -> Dict[str, int]:
+    """Peak of memory allocated (in bytes) by a call of every Plastic method."""
+    results = {}
+    for method, call in sorted(method_calls(plastic, repo).items()):
+        call()  # warm-up
+        tracemalloc.start()
+        try:
+            call()
+            results[method] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def bench_clients(plastic: Plastic, repo: SyntheticRepo, calls: int,
+                  workers: int) -> Dict[str, Dict]:
+    """Throughput of sync, threaded and async (asyncio.to_thread) clients.
+
+    All the clients make the same number of get_changeset() calls.
+    """
+    name = repo.name
+    ids = [index % len(repo.changesets) for index in range(calls)]
+
+    def sync():
+        for changeset_id in ids:
+            plastic.get_changeset(name, changeset_id)
+
+    def threaded():
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda changeset_id: plastic.get_changeset(name, changeset_id),
+                              ids))
+
+    async def gather():
+        semaphore = asyncio.Semaphore(workers)
+
+        async def get(changeset_id):
+            async with semaphore:
+                return await asyncio.to_thread(plastic.get_changeset, name, changeset_id)
+
+        await asyncio.gather(*(get(changeset_id) for changeset_id in ids))
+
+    results = {}
+    for client, run in (("sync", sync), ("threaded", threaded),
+                        ("async", lambda: asyncio.run(gather()))):
+        stats = measure(run, 3)
+        stats["requests_per_second"] = calls / stats["median"] if stats["median"] \
+                                       else float("inf")
+        results[client] = stats
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.1) -> List[str]:
+    """The regressions of results against a baseline.
+
+    A regression is a median slower by more than the tolerance.
+    """
+    regressions = []
+    for suite in ("methods", "parse", "clients"):
+        for name, stats in results.get(suite, {}).items():
+            base = baseline.get(suite, {}).get(name)
+            if base is None or not base["median"]:
+                continue
+            ratio = stats["median"] / base["median"]
+            if ratio > 1 + tolerance:
+                regressions.append("{}.{}: {:.2f}x slower ({:.6f}s vs {:.6f}s)".format(
+                                   suite, name, ratio, stats["median"], base["median"]))
+    return regressions
@@ -1,9 +1,43 @@
 # Copyright (c) 2019 Adam Karpierz
 # SPDX-License-Identifier: Zlib
 
-from .__about__ import * ; del __about__  # noqa
+from types import ModuleType as _ModuleType
 
 from ._plastic   import * ; del _plastic  # noqa
 from .exceptions import *  # noqa
+from .query      import * ; del query     # noqa
+from .index      import * ; del index     # noqa
+from .annotate   import * ; del annotate  # noqa
+from .watch      import * ; del watch     # noqa
+from .pool       import * ; del pool      # noqa
+from .tracing    import * ; del tracing   # noqa
 from . import config ; del config
 from . import model  ; del model
+
+# Loaded on first use (they import pkg_about or requests).
+_lazy = {name: module for module, names in (
+    ("__about__", ("__title__", "__version__", "__version_info__", "__summary__",
+                   "__uri__", "__urls__", "__author__", "__email__", "__author_email__",
+                   "__maintainer__", "__maintainer_email__", "__license__",
+                   "__copyright__")),
+    ("fleet",     ("FleetReport", "WorkspaceFleet")),
+    ("transport", ("Exchange", "save_traffic", "load_traffic",
+                   "TrafficRecorder", "TrafficReplayer")),
+) for name in names}
+
+__all__ = sorted(name for name, value in globals().items()
+                 if not name.startswith("_") and not isinstance(value, _ModuleType)) + \
+          [name for name in _lazy if not name.startswith("_")]
+
+
+def __getattr__(name):
+    module = _lazy.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    from importlib import import_module
+    value = globals()[name] = getattr(import_module("." + module, __name__), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -3,26 +3,98 @@
 
 """All operations will be performed in the machine hosting the API server."""
 
-from typing    import List, Tuple, Optional, Union
+from typing    import (Any, List, Tuple, Dict, Set, Iterable, Iterator, Callable,
+                       Optional, Union)
 from types     import ModuleType
 from pathlib   import Path
 from importlib import import_module
+from importlib.util import find_spec
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+import itertools
+import tempfile
 import shutil
+import mmap
+import time
+import os
 
 from public import public
 
 from .model import (Repository, Workspace, ObjectType, Branch, Label, Changeset,
                     RevisionHistoryItem, Change, OperationStatus, CheckinStatus,
                     Item, Diff, AffectedPaths)
+from .exceptions import PlasticOperationError, PlasticBatchError
+from .util import file_hash
+from .annotate import Annotator, AnnotatedLine
+from .watch import PendingChangesWatcher
+from .tracing import Hook
+from .query import Query, pushdown
 from . import config
 
 _ = __doc__
 
+# The methods accepting the 'cm find' queries.
+_QUERY_METHODS = ("get_branches", "get_labels", "get_changesets", "get_changesets_in_branch")
+
+
+def _query_text(query: Union[None, str, Query]) -> Optional[str]:
+    return query if query is None or isinstance(query, str) else str(query)
+
+
+class _Poller:
+    """Adaptive polling schedule of a long-running operation.
+
+    While the operation progresses, the next poll is scheduled at half
+    of its estimated remaining time; otherwise the interval doubles.
+    """
+
+    FINISHED = ("Finished", "Checkin finished", "Not running")
+    FAILED   = ("Failed",)
+
+    def __init__(self, timeout: Optional[float], min_interval: float, max_interval: float):
+        self.deadline = (time.monotonic() + timeout) if timeout is not None else None
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval  = min_interval
+        self.last_time = None
+        self.last_done = 0
+
+    def finished(self, status: Union[OperationStatus, CheckinStatus]) -> bool:
+        if status.status in self.FAILED:
+            raise PlasticOperationError(status.message or status.status)
+        return status.status in self.FINISHED
+
+    def next_interval(self, status: Union[OperationStatus, CheckinStatus]) -> float:
+        if isinstance(status, CheckinStatus):
+            done, total = status.transferred_size, status.total_size
+        else:
+            done, total = status.updated_bytes, status.total_bytes
+        now = time.monotonic()
+        if self.last_time is not None and done > self.last_done:
+            rate = (done - self.last_done) / max(now - self.last_time, 1e-6)
+            self.interval = max(total - done, 0) / rate / 2
+        elif self.last_time is not None:
+            self.interval *= 2
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        self.last_time, self.last_done = now, done
+        interval = self.interval
+        if self.deadline is not None:
+            if now >= self.deadline:
+                raise TimeoutError("Operation status is '{}'".format(status.status))
+            interval = min(interval, self.deadline - now)
+        return interval
+
 
 @public
 class Plastic:
     """PlasticSCM client API."""
 
+    __api_versions: Set[str] = set()  # the supported API versions found so far
+    __api_modules: Dict[Tuple[str, str], ModuleType] = {}  # (version, "api"|"model") -> module
+    __shared: Dict[tuple, "Plastic"] = {}
+    __shared_lock = threading.Lock()
+
     @classmethod
     def from_config(cls,
                     plastic_id: Optional[str] = None,
@@ -48,7 +120,8 @@ class Plastic:
                    http_password=config_parser.http_password,
                    ssl_verify=config_parser.ssl_verify,
                    timeout=config_parser.timeout,
-                   api_version=config_parser.api_version)
+                   api_version=config_parser.api_version,
+                   replica_urls=config_parser.replica_urls)
 
     def __new__(cls,
                 url: str = "http://localhost:9090", *,
@@ -56,31 +129,111 @@ class Plastic:
                 http_password: Optional[str] = None,
                 ssl_verify: bool = True,
                 timeout: Union[int, float] = None,
-                api_version: Union[str, int, float] = "1"):
+                api_version: Union[str, int, float] = "1",
+                replica_urls: Optional[List[str]] = None):
         """Instantiates a new PlasticSCM API wrapper.
 
         Args:
-            url:         The endpoint of API, in format http://host:port
-                         (default: "http://localhost:9090").
-            timeout:     Timeout to use for requests to the PlasticSCM server.
-            api_version: PlasticSCM API version to use (support for 1 only).
+            url:          The endpoint of API, in format http://host:port
+                          (default: "http://localhost:9090").
+            timeout:      Timeout to use for requests to the PlasticSCM server.
+            api_version:  PlasticSCM API version to use (support for 1 only).
+            replica_urls: The endpoints of read replicas of the server.
+                          Read-only (GET) requests are routed to the healthy
+                          endpoint with the lowest latency, all the others
+                          always go to url (default: no replicas).
 
         """
         self = super().__new__(cls)
         self.__api_version = api_version = str(api_version)
+        if api_version not in Plastic.__api_versions:
+            if find_spec(".v{}.api".format(api_version), __package__) is None:
+                raise ModuleNotFoundError("Unsupported API version: {}".format(api_version))
+            Plastic.__api_versions.add(api_version)
         # Headers that will be used in request to PlasticSCM
         # self.headers = {"User-Agent": "%s/%s" % (__title__, __version__)}
-        api   = import_module(".v{}.api".format(api_version),   __package__)
-        model = import_module(".v{}.model".format(api_version), __package__)
-        self.__api = api.API(url,
-                             http_username=http_username,
-                             http_password=http_password,
-                             ssl_verify=ssl_verify,
-                             timeout=timeout)
-        self.__model = model
+        # The API client (with requests, dateutil, ...) is created on first use.
+        self.__api_args = dict(url=url,
+                               http_username=http_username,
+                               http_password=http_password,
+                               ssl_verify=ssl_verify,
+                               timeout=timeout,
+                               replica_urls=replica_urls)
+        self.__api_client = None
+        self.__api_lock = threading.Lock()
+        self.__annotator = None
         # self.repositories = model.RepositoryManager(self)
         return self
 
+    @classmethod
+    def shared(cls,
+               url: str = "http://localhost:9090", *,
+               http_username: Optional[str] = None,
+               http_password: Optional[str] = None,
+               ssl_verify: bool = True,
+               timeout: Union[int, float] = None,
+               api_version: Union[str, int, float] = "1",
+               replica_urls: Optional[List[str]] = None) -> 'Plastic':
+        """Get the PlasticSCM API wrapper shared by all callers with the same arguments.
+
+        The wrapper is created on the first call only, so getting it is
+        effectively free and its pooled connections are reused. It is
+        thread-safe. Note that its tracing hooks are shared too.
+
+        Args:
+            The same as of Plastic().
+
+        Returns:
+            A PlasticSCM API wrapper.
+        """
+        key = (cls, url, http_username, http_password, ssl_verify,
+               float(timeout) if timeout is not None else None, str(api_version),
+               tuple(replica_urls or ()))
+        client = cls.__shared.get(key)
+        if client is None:
+            with cls.__shared_lock:
+                client = cls.__shared.get(key)
+                if client is None:
+                    client = cls.__shared[key] = cls(url,
+                                                     http_username=http_username,
+                                                     http_password=http_password,
+                                                     ssl_verify=ssl_verify,
+                                                     timeout=timeout,
+                                                     api_version=api_version,
+                                                     replica_urls=replica_urls)
+        return client
+
+    @classmethod
+    def clear_shared(cls) -> None:
+        """Forget the wrappers returned by shared() (e.g. after a configuration change)."""
+        with cls.__shared_lock:
+            cls.__shared.clear()
+
+    @classmethod
+    def __api_module(cls, api_version: str, name: str) -> ModuleType:
+        # The (cached) "v<api_version>.<name>" module.
+        key = (api_version, name)
+        module = cls.__api_modules.get(key)
+        if module is None:
+            module = cls.__api_modules[key] = import_module(
+                ".v{}.{}".format(api_version, name), __package__)
+        return module
+
+    @property
+    def __api(self):
+        api = self.__api_client
+        if api is None:
+            with self.__api_lock:
+                api = self.__api_client
+                if api is None:
+                    module = self.__api_module(self.__api_version, "api")
+                    api = self.__api_client = module.API(**self.__api_args)
+        return api
+
+    @property
+    def __model(self) -> ModuleType:
+        return self.__api_module(self.__api_version, "model")
+
     @property
     def api_version(self) -> str:
         """The API version used (1 only)."""
@@ -91,6 +244,51 @@ class Plastic:
         """Classes of objects provided by the API."""
         return self.__model
 
+    def __getattr__(self, name: str):
+        """Get a generated variant of an API method.
+
+        E.g. get_branches_async, get_branches_batch or get_branches_iter
+        (see endpoint.install_endpoints()).
+        """
+        base, _, variant = name.rpartition("_")
+        if variant in ("async", "batch", "iter") and base in Plastic.__dict__:
+            try:
+                return getattr(self.__api, name)
+            except AttributeError:
+                pass
+        raise AttributeError("{!r} object has no attribute {!r}".format(
+                             type(self).__name__, name))
+
+    # Tracing
+
+    def add_hook(self, hook: Hook) -> None:
+        """Registers a tracing hook.
+
+        The hook's on_start() and on_end() are called around every API
+        call with its Span (route, parameters, HTTP status, timings and
+        retry count). Without registered hooks no spans are reported.
+
+        Args:
+            hook: The hook (e.g. an adapter to a tracer or a structured logger).
+        """
+        self.__api.add_hook(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Unregisters a tracing hook.
+
+        Args:
+            hook: The hook registered with add_hook().
+
+        Raises:
+            ValueError: If the hook is not registered.
+        """
+        self.__api.remove_hook(hook)
+
+    @property
+    def hooks(self) -> Tuple[Hook, ...]:
+        """The registered tracing hooks."""
+        return self.__api.hooks
+
     # Utils
 
     def get_cm_location(self) -> Path:
@@ -223,18 +421,19 @@ class Plastic:
 
     # Branches
 
-    def get_branches(self, repo_name: str, *, query: Optional[str] = None) -> Tuple[Branch]:
+    def get_branches(self, repo_name: str, *,
+                     query: Union[None, str, Query] = None) -> Tuple[Branch]:
         """Gets branches in a repository, along with their information.
 
         Args:
             repo_name: The name of the branches's host repository.
-            query:     An optional constraints string using the 'cm find'
-                       command syntax.
+            query:     Optional constraints using the 'cm find' command
+                       syntax (a string or a Query, e.g. Q.id > 100).
 
         Returns:
             A list of all branches in a repository.
         """
-        return self.__api.get_branches(repo_name, query=query)
+        return self.__api.get_branches(repo_name, query=_query_text(query))
 
     def create_branch(self,
                       repo_name: str,
@@ -310,18 +509,19 @@ class Plastic:
 
     # Labels
 
-    def get_labels(self, repo_name: str, *, query: Optional[str] = None) -> Tuple[Label]:
+    def get_labels(self, repo_name: str, *,
+                   query: Union[None, str, Query] = None) -> Tuple[Label]:
         """Gets labels in a repository, along with their information.
 
         Args:
             repo_name: The name of the host repository of the labels.
-            query:     An optional constraints string using the 'cm find'
-                       command syntax.
+            query:     Optional constraints using the 'cm find' command
+                       syntax (a string or a Query, e.g. Q.id > 100).
 
         Returns:
             A list of all labels in a repository.
         """
-        return self.__api.get_labels(repo_name, query=query)
+        return self.__api.get_labels(repo_name, query=_query_text(query))
 
     def create_label(self, repo_name: str, label_name: str, changeset_id: int, *,
                      comment: Optional[str] = None, apply_to_xlinks: bool = False) -> Label:
@@ -381,21 +581,22 @@ class Plastic:
 
     # Changesets
 
-    def get_changesets(self, repo_name: str, *, query: Optional[str] = None) -> Tuple[Changeset]:
+    def get_changesets(self, repo_name: str, *,
+                       query: Union[None, str, Query] = None) -> Tuple[Changeset]:
         """Gets changesets in a repository, along with their information.
 
         Args:
             repo_name: The name of the host repository of the changesets.
-            query:     An optional constraints string using the 'cm find'
-                       command syntax.
+            query:     Optional constraints using the 'cm find' command
+                       syntax (a string or a Query, e.g. Q.id > 100).
 
         Returns:
             A list of all changesets in a repository.
         """
-        return self.__api.get_changesets(repo_name, query=query)
+        return self.__api.get_changesets(repo_name, query=_query_text(query))
 
     def get_changesets_in_branch(self, repo_name: str, branch_name: str, *,
-                                 query: Optional[str] = None) -> Tuple[Changeset]:
+                                 query: Union[None, str, Query] = None) -> Tuple[Changeset]:
         """Gets changesets in a given branch, along with their information.
 
         Args:
@@ -403,13 +604,14 @@ class Plastic:
             branch_name: The hierarchical name of the host branch.
                          Please note that branch names are hierarchical
                          (e.g. "main/task001/task002").
-            query:       An optional constraints string using the 'cm find'
-                         command syntax.
+            query:       Optional constraints using the 'cm find' command
+                         syntax (a string or a Query, e.g. Q.id > 100).
 
         Returns:
             A list of all changesets in a given branch.
         """
-        return self.__api.get_changesets_in_branch(repo_name, branch_name, query=query)
+        return self.__api.get_changesets_in_branch(repo_name, branch_name,
+                                                   query=_query_text(query))
 
     def get_changeset(self, repo_name: str, changeset_id: int) -> Changeset:
         """Gets information about a single changeset.
@@ -424,6 +626,35 @@ class Plastic:
         """
         return self.__api.get_changeset(repo_name, changeset_id)
 
+    def find(self, method: str, *args,
+             where: Union[Query, Callable[[Any], bool]]) -> Tuple:
+        """Gets the objects of a query method matching the conditions.
+
+        The conditions of the 'cm find' syntax are evaluated by the server
+        whenever possible, so only the necessary objects are downloaded;
+        the Python predicates (and what depends on them) are evaluated
+        locally (see query.pushdown()).
+
+        Args:
+            method: The name of a query method: "get_branches", "get_labels",
+                    "get_changesets" or "get_changesets_in_branch".
+            args:   The positional arguments of the method.
+            where:  The conditions: a Query (e.g. Q.date >= since) combined
+                    with & and | with Python predicates, e.g.
+                    (Q.id > 100) & (lambda chset: ...).
+
+        Returns:
+            The objects matching the conditions.
+
+        Raises:
+            ValueError: If the method is not a query method.
+        """
+        if method not in _QUERY_METHODS:
+            raise ValueError("Not a query method: {!r}".format(method))
+        server, local = pushdown(where)
+        result = getattr(self, method)(*args, query=server)
+        return tuple(filter(local, result)) if local is not None else result
+
     # Changes
 
     def get_pending_changes(self, wkspace_name: str, *,
@@ -444,6 +675,26 @@ class Plastic:
         else:
             return self.__api.get_pending_changes(wkspace_name, change_types=change_types)
 
+    def watch_pending_changes(self, wkspace_name: str, *,
+                              change_types: Optional[List[Change.Type]] = None) \
+            -> PendingChangesWatcher:
+        """Creates an incremental watcher of the pending changes in a workspace.
+
+        Args:
+            wkspace_name: The name of the workspace.
+            change_types: A list detailing the desired change types.
+                          It should be a list of Change.Type's values
+                          (default: all change types).
+
+        Returns:
+            The watcher, whose poll() reports only the added, removed
+            and modified changes.
+        """
+        kwargs = {} if change_types is None else dict(change_types=change_types)
+        return PendingChangesWatcher(partial(self.__api.get_pending_changes_raw,
+                                             wkspace_name, **kwargs),
+                                     self.__api.change_from_json)
+
     def undo_pending_changes(self, wkspace_name: str,
                              paths: List[Union[str, Path]]) -> AffectedPaths:
         """Deletes the pending changes in a workspace.
@@ -515,6 +766,103 @@ class Plastic:
         """
         return self.__api.switch_workspace(wkspace_name, object_type, object)
 
+    def wait_for_update(self, wkspace_name: str, *,
+                        timeout: Optional[float] = None,
+                        on_progress: Optional[Callable[[OperationStatus], None]] = None,
+                        cancel: Optional[threading.Event] = None,
+                        min_interval: float = 0.1,
+                        max_interval: float = 5.0) -> OperationStatus:
+        """Waits for the workspace update operation to finish.
+
+        The status is polled with adaptive intervals: derived from the
+        progress (updated_bytes/total_bytes) while the operation advances,
+        and exponentially growing while it does not.
+
+        Args:
+            wkspace_name: The name of the workspace.
+            timeout:      The maximal time to wait in seconds (default: no limit).
+            on_progress:  A callable invoked with every polled status.
+            cancel:       An event which stops the waiting once set
+                          (the operation itself keeps running on the server).
+            min_interval: The shortest polling interval (default: 0.1 s).
+            max_interval: The longest polling interval (default: 5 s).
+
+        Returns:
+            The last polled status of the operation.
+
+        Raises:
+            PlasticOperationError: If the operation failed.
+            TimeoutError: If the operation did not finish in time.
+        """
+        return self.__wait_for(self.get_workspace_update_status, wkspace_name,
+                               timeout, on_progress, cancel, min_interval, max_interval)
+
+    def wait_for_switch(self, wkspace_name: str, *,
+                        timeout: Optional[float] = None,
+                        on_progress: Optional[Callable[[OperationStatus], None]] = None,
+                        cancel: Optional[threading.Event] = None,
+                        min_interval: float = 0.1,
+                        max_interval: float = 5.0) -> OperationStatus:
+        """Waits for the workspace switch operation to finish.
+
+        See wait_for_update() for details.
+        """
+        return self.__wait_for(self.get_workspace_switch_status, wkspace_name,
+                               timeout, on_progress, cancel, min_interval, max_interval)
+
+    async def wait_for_update_async(self, wkspace_name: str, *,
+                                    timeout: Optional[float] = None,
+                                    on_progress: Optional[Callable[[OperationStatus],
+                                                                   None]] = None,
+                                    min_interval: float = 0.1,
+                                    max_interval: float = 5.0) -> OperationStatus:
+        """Asynchronous variant of wait_for_update().
+
+        Requests are run in worker threads, so one event loop can supervise
+        many workspaces. The waiting is stopped by cancelling the task.
+        """
+        return await self.__wait_for_async(self.get_workspace_update_status, wkspace_name,
+                                           timeout, on_progress, min_interval, max_interval)
+
+    async def wait_for_switch_async(self, wkspace_name: str, *,
+                                    timeout: Optional[float] = None,
+                                    on_progress: Optional[Callable[[OperationStatus],
+                                                                   None]] = None,
+                                    min_interval: float = 0.1,
+                                    max_interval: float = 5.0) -> OperationStatus:
+        """Asynchronous variant of wait_for_switch()."""
+        return await self.__wait_for_async(self.get_workspace_switch_status, wkspace_name,
+                                           timeout, on_progress, min_interval, max_interval)
+
+    @staticmethod
+    def __wait_for(get_status, wkspace_name, timeout, on_progress, cancel,
+                   min_interval, max_interval):
+        poller = _Poller(timeout, min_interval, max_interval)
+        while True:
+            status = get_status(wkspace_name)
+            if on_progress is not None:
+                on_progress(status)
+            if poller.finished(status):
+                return status
+            interval = poller.next_interval(status)
+            if cancel is None:
+                time.sleep(interval)
+            elif cancel.wait(interval):
+                return status
+
+    @staticmethod
+    async def __wait_for_async(get_status, wkspace_name, timeout, on_progress,
+                               min_interval, max_interval):
+        import asyncio
+        poller = _Poller(timeout, min_interval, max_interval)
+        while True:
+            status = await asyncio.to_thread(get_status, wkspace_name)
+            if on_progress is not None:
+                on_progress(status)
+            if poller.finished(status):
+                return status
+            await asyncio.sleep(poller.next_interval(status))
+
     # Checkin
 
     def get_workspace_checkin_status(self, wkspace_name: str) -> CheckinStatus:
@@ -550,6 +898,30 @@ class Plastic:
         return self.__api.checkin_workspace(wkspace_name,
                                             paths=paths, comment=comment, recurse=recurse)
 
+    def wait_for_checkin(self, wkspace_name: str, *,
+                         timeout: Optional[float] = None,
+                         on_progress: Optional[Callable[[CheckinStatus], None]] = None,
+                         cancel: Optional[threading.Event] = None,
+                         min_interval: float = 0.1,
+                         max_interval: float = 5.0) -> CheckinStatus:
+        """Waits for the workspace checkin operation to finish.
+
+        The progress is measured with transferred_size/total_size.
+        See wait_for_update() for details.
+        """
+        return self.__wait_for(self.get_workspace_checkin_status, wkspace_name,
+                               timeout, on_progress, cancel, min_interval, max_interval)
+
+    async def wait_for_checkin_async(self, wkspace_name: str, *,
+                                     timeout: Optional[float] = None,
+                                     on_progress: Optional[Callable[[CheckinStatus],
+                                                                    None]] = None,
+                                     min_interval: float = 0.1,
+                                     max_interval: float = 5.0) -> CheckinStatus:
+        """Asynchronous variant of wait_for_checkin()."""
+        return await self.__wait_for_async(self.get_workspace_checkin_status, wkspace_name,
+                                           timeout, on_progress, min_interval, max_interval)
+
     # Repository contents
 
     def get_item(self, repo_name: str, item_path: str) -> Item:
@@ -618,6 +990,33 @@ class Plastic:
         """
         return self.__api.get_item_revision(repo_name, revision_spec)
 
+    def get_item_content(self, repo_name: str, revision_id: int, *,
+                         dest: Union[None, str, Path, bytearray, memoryview] = None,
+                         chunk_size: int = 1024 * 1024) -> Union[memoryview, mmap.mmap]:
+        """Streams the content of a single item's revision.
+
+        The raw content is downloaded in chunks, bypassing the JSON decoder,
+        and is never materialized as a str.
+
+        Args:
+            repo_name:   The name of the repository.
+            revision_id: The id of the item's revision (e.g. Item.revision_id).
+            dest:        Where the content is to be stored:
+                         None - a new in-memory buffer (default),
+                         str or Path - a file, which is then memory-mapped,
+                         writable buffer (e.g. bytearray) - filled in place.
+            chunk_size:  The size of the downloaded chunks (default: 1 MiB).
+
+        Returns:
+            A read-only mmap of the file if dest is a path, otherwise
+            a memoryview of the content.
+
+        Raises:
+            ValueError: If the dest buffer is too small for the content.
+        """
+        return self.__api.get_item_content(repo_name, revision_id,
+                                           dest=dest, chunk_size=chunk_size)
+
     def get_item_revision_history_in_branch(self, repo_name: str, branch_name: str,
                                             item_path: str) -> Tuple[RevisionHistoryItem]:
         """Gets the item's revision history for a given branch.
@@ -663,6 +1062,98 @@ class Plastic:
         """
         return self.__api.get_item_revision_history_in_label(repo_name, label_name, item_path)
 
+    def get_revision_histories(self, repo_name: str,
+                               object_type: ObjectType, object: Union[str, int],  # noqa A002
+                               item_paths: Iterable[str], *,
+                               workers: int = 8, retries: int = 2, retry_delay: float = 0.5,
+                               on_progress: Optional[Callable[[int, int], None]] = None) \
+            -> Iterator[Tuple[str, Tuple[RevisionHistoryItem]]]:
+        """Gets the revision histories of many items, fetching them in parallel.
+
+        Args:
+            repo_name:   The name of the repository.
+            object_type: The type of the point the histories are taken at.
+                         It should be ObjectType.BRANCH, ObjectType.CHANGESET
+                         or ObjectType.LABEL.
+            object:      The branch name, the changeset id or the label name
+                         (according to object_type).
+            item_paths:  The paths of the items.
+            workers:     The maximal number of concurrent requests (default: 8).
+            retries:     How many times a request failed due to a connection
+                         error, a timeout or a server error is repeated (default: 2).
+            retry_delay: The delay before the first retry, doubled on each
+                         next one (default: 0.5 s).
+            on_progress: A callable invoked as on_progress(done, total) after
+                         each fetched history.
+
+        Yields:
+            (item_path, revision history items) pairs in the order
+            of completion.
+        """
+        from .rest import REST
+        ObjectType = self.__model.ObjectType
+        get_history = {
+            ObjectType.BRANCH:    self.get_item_revision_history_in_branch,
+            ObjectType.CHANGESET: self.get_item_revision_history_in_changeset,
+            ObjectType.LABEL:     self.get_item_revision_history_in_label,
+        }[object_type]
+
+        def fetch(item_path):
+            for attempt in itertools.count():
+                try:
+                    return item_path, get_history(repo_name, object, item_path)
+                except Exception as exc:
+                    if attempt >= retries or not REST.is_transient(exc):
+                        raise
+                time.sleep(retry_delay * 2 ** attempt)
+
+        item_paths = list(item_paths)
+        total = len(item_paths)
+        done  = 0
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            pending = set()
+            item_paths = iter(item_paths)
+            while True:
+                for item_path in itertools.islice(item_paths, 2 * workers - len(pending)):
+                    pending.add(executor.submit(fetch, item_path))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+                    done += 1
+                    if on_progress is not None:
+                        on_progress(done, total)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def annotate(self, repo_name: str,
+                 object_type: ObjectType, object: Union[str, int],  # noqa A002
+                 item_path: str, *, encoding: str = "utf-8") -> Tuple[AnnotatedLine]:
+        """Attributes each line of an item to the revision which introduced it.
+
+        Revision contents and line attributions are cached by the client,
+        so annotating a newer revision of the same item is incremental.
+
+        Args:
+            repo_name:   The name of the repository.
+            object_type: The type of the point the item is taken at.
+                         It should be ObjectType.BRANCH, ObjectType.CHANGESET
+                         or ObjectType.LABEL.
+            object:      The branch name, the changeset id or the label name
+                         (according to object_type).
+            item_path:   The path of the item.
+            encoding:    The encoding of the item's content (default: "utf-8").
+
+        Returns:
+            The lines of the item with their revision, changeset and owner.
+        """
+        if self.__annotator is None:
+            self.__annotator = Annotator(self)
+        return self.__annotator.annotate(repo_name, object_type, object, item_path,
+                                         encoding=encoding)
+
     # Diff
 
     def diff_changesets(self, repo_name: str,
@@ -760,3 +1251,254 @@ class Plastic:
             The paths that were affected by the movement operation.
         """
         return self.__api.move_workspace_item(wkspace_name, item_path, dest_item_path)
+
+    def add_workspace_items(self, wkspace_name: str, item_paths: Iterable[str], *,
+                            add_parents: bool = True, checkout_parent: bool = True,
+                            recurse: bool = True, workers: int = 8) -> AffectedPaths:
+        """Add many items to version control.
+
+        The server accepts a single path per request, so the requests are
+        pipelined over a pool of threads.
+
+        Args:
+            wkspace_name:    The name of the workspace.
+            item_paths:      The paths of the items to be added.
+            add_parents:     See add_workspace_item() (default: True).
+            checkout_parent: See add_workspace_item() (default: True).
+            recurse:         See add_workspace_item() (default: True).
+            workers:         The maximal number of concurrent requests (default: 8).
+
+        Returns:
+            The paths that were affected by all the addition operations.
+
+        Raises:
+            PlasticBatchError: If some of the operations failed (with the
+                               paths affected by the other ones).
+        """
+        return self.__batch(partial(self.add_workspace_item, wkspace_name,
+                                    add_parents=add_parents,
+                                    checkout_parent=checkout_parent, recurse=recurse),
+                            [(item_path,) for item_path in item_paths], workers)
+
+    def checkout_workspace_items(self, wkspace_name: str, item_paths: Iterable[str], *,
+                                 workers: int = 8) -> AffectedPaths:
+        """Mark many workspace items as ready to modify.
+
+        Args:
+            wkspace_name: The name of the workspace.
+            item_paths:   The paths of selected items.
+            workers:      The maximal number of concurrent requests (default: 8).
+
+        Returns:
+            The paths that were affected by all the checkout operations.
+
+        Raises:
+            PlasticBatchError: If some of the operations failed (with the
+                               paths affected by the other ones).
+        """
+        return self.__batch(partial(self.checkout_workspace_item, wkspace_name),
+                            [(item_path,) for item_path in item_paths], workers)
+
+    def move_workspace_items(self, wkspace_name: str,
+                             moves: Iterable[Tuple[str, str]], *,
+                             workers: int = 8) -> AffectedPaths:
+        """Move or rename many files or directories in the workspace.
+
+        If the moves are not independent (a path of one of them is equal to
+        or located below a path of another one), they are done one by one
+        in the given order.
+
+        Args:
+            wkspace_name: The name of the workspace.
+            moves:        Pairs of the source and the destination paths.
+            workers:      The maximal number of concurrent requests (default: 8).
+
+        Returns:
+            The paths that were affected by all the movement operations.
+
+        Raises:
+            PlasticBatchError: If some of the operations failed (with the
+                               paths affected by the other ones).
+        """
+        moves = [(item_path, dest_item_path) for item_path, dest_item_path in moves]
+        paths = sorted("/" + path.strip("/") + "/" for move in moves for path in move)
+        if any(path2.startswith(path1) for path1, path2 in zip(paths, paths[1:])):
+            workers = 1
+        return self.__batch(partial(self.move_workspace_item, wkspace_name), moves, workers)
+
+    def __batch(self, func: Callable[..., AffectedPaths], args_list: List[Tuple],
+                workers: int) -> AffectedPaths:
+        results, errors = [], {}
+        if workers <= 1 or len(args_list) <= 1:
+            for args in args_list:
+                try:
+                    results.append(func(*args))
+                except Exception as exc:
+                    errors[args[0]] = exc
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(args_list))) as executor:
+                futures = [executor.submit(func, *args) for args in args_list]
+            for args, future in zip(args_list, futures):
+                exc = future.exception()
+                if exc is None:
+                    results.append(future.result())
+                else:
+                    errors[args[0]] = exc
+        paths = dict.fromkeys(path for result in results for path in result.paths)
+        result = self.__model.AffectedPaths(paths=list(paths))
+        if errors:
+            raise PlasticBatchError("{} of {} operations failed".format(len(errors),
+                                                                        len(args_list)),
+                                    result, errors)
+        return result
+
+    # Export
+
+    def walk_changeset(self, repo_name: str, changeset_id: int,
+                       item_path: str = "/") -> Iterator[Item]:
+        """Walks the tree of items of the desired changeset.
+
+        Directories are listed top-down, one request per directory.
+        XLinked trees are reported but not followed.
+
+        Args:
+            repo_name:    The name of the host repository of the changeset.
+            changeset_id: The id of the changeset.
+            item_path:    The path of the directory to start from (default: "/").
+
+        Yields:
+            All items (files, directories and xlinks) below item_path.
+        """
+        DIRECTORY = self.__model.Item.Type.DIRECTORY
+        dirs = [item_path]
+        while dirs:
+            directory = self.get_item_in_changeset(repo_name, changeset_id, dirs.pop())
+            for item in directory.items or ():
+                yield item
+                if item.type is DIRECTORY:
+                    dirs.append(item.path)
+
+    def export_changeset(self, repo_name: str, changeset_id: int,
+                         dest_dir: Union[str, Path], *, workers: int = 4) -> Tuple[Path]:
+        """Materializes the tree of the desired changeset on disk.
+
+        Files are downloaded in parallel and streamed to disk, so memory usage
+        does not depend on file sizes. Every file is written to a temporary
+        file first and then atomically renamed. Files whose local hash already
+        matches the changeset are not downloaded again.
+
+        Args:
+            repo_name:    The name of the host repository of the changeset.
+            changeset_id: The id of the changeset.
+            dest_dir:     The directory the snapshot is to be stored in.
+            workers:      The maximal number of concurrent downloads (default: 4).
+
+        Returns:
+            The paths of the files which were (re)downloaded.
+        """
+        Item = self.__model.Item
+        dest_dir = Path(dest_dir).resolve()
+        dest_dir.mkdir(parents=True, exist_ok=True)
+
+        def files():
+            for item in self.walk_changeset(repo_name, changeset_id):
+                path = self.__export_path(dest_dir, item.path)
+                if item.type is Item.Type.DIRECTORY:
+                    path.mkdir(parents=True, exist_ok=True)
+                elif item.type is Item.Type.FILE:
+                    yield item.revision_id, item.hash, path
+
+        return tuple(self.__export_files(repo_name, files(), workers))
+
+    def sync_export(self, repo_name: str, from_changeset_id: int, to_changeset_id: int,
+                    dest_dir: Union[str, Path], *, workers: int = 4) -> Tuple[Path]:
+        """Moves a snapshot made by export_changeset() to another changeset.
+
+        Only the differences between both changesets are applied, so the
+        tree is not walked again. Moves and deletions are applied locally,
+        and the content of added and changed files is downloaded in parallel.
+
+        Args:
+            repo_name:         The name of the host repository of the changesets.
+            from_changeset_id: The id of the changeset the snapshot represents.
+            to_changeset_id:   The id of the changeset the snapshot is to be moved to.
+            dest_dir:          The directory the snapshot is stored in.
+            workers:           The maximal number of concurrent downloads (default: 4).
+
+        Returns:
+            The paths which were added, changed, moved or deleted.
+        """
+        Status = self.__model.Diff.Status
+        dest_dir = Path(dest_dir).resolve()
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        diffs = [diff for diff in self.diff_changesets(repo_name, to_changeset_id,
+                                                       from_changeset_id)
+                 if not diff.is_under_xlink]
+        affected = []
+        downloads = []
+        # Moves go first, so that their sources are not deleted nor replaced.
+        for diff in (diff for diff in diffs if diff.status is Status.MOVED):
+            path = self.__export_path(dest_dir, diff.path)
+            source_path = self.__export_path(dest_dir, diff.source_path or diff.path)
+            if source_path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(source_path, path)
+                affected.append(path)
+            if not diff.is_directory and (not path.exists()
+                                          or diff.hash != diff.source_hash):
+                downloads.append((diff.revision_id, diff.hash, path))
+        for diff in (diff for diff in diffs if diff.status is Status.DELETED):
+            path = self.__export_path(dest_dir, diff.path)
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+            affected.append(path)
+        for diff in (diff for diff in diffs
+                     if diff.status in (Status.ADDED, Status.CHANGED)):
+            path = self.__export_path(dest_dir, diff.path)
+            if diff.is_directory:
+                if diff.status is Status.ADDED:
+                    path.mkdir(parents=True, exist_ok=True)
+                    affected.append(path)
+            else:
+                downloads.append((diff.revision_id, diff.hash, path))
+        affected.extend(self.__export_files(repo_name, downloads, workers))
+        return tuple(dict.fromkeys(affected))
+
+    def __export_files(self, repo_name: str, files, workers: int) -> List[Path]:
+        exported = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for revision_id, hash, path in files:  # noqa A001
+                pending.add(executor.submit(self.__export_file, repo_name,
+                                            revision_id, hash, path))
+                if len(pending) >= 2 * workers:  # bound the lookahead
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    exported.extend(future.result() for future in done)
+            exported.extend(future.result() for future in pending)
+        return [path for path in exported if path is not None]
+
+    @staticmethod
+    def __export_path(dest_dir: Path, item_path: str) -> Path:
+        path = (dest_dir/item_path.lstrip("/")).resolve()
+        if path != dest_dir and dest_dir not in path.parents:
+            raise ValueError("Item path '{}' is outside of the export "
+                             "directory".format(item_path))
+        return path
+
+    def __export_file(self, repo_name: str, revision_id: int,
+                      hash: Optional[str], path: Path) -> Optional[Path]:  # noqa A002
+        if hash is not None and path.is_file() and file_hash(path) == hash:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=path.parent)
+        os.close(fd)
+        try:
+            with self.get_item_content(repo_name, revision_id, dest=tmp_path):
+                pass
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
@@ -0,0 +1,164 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Line-level authorship (blame) of repository items."""
+
+from typing   import Dict, List, Tuple, NamedTuple, Optional, Union
+from datetime import datetime
+from collections import OrderedDict
+import threading
+import difflib
+
+from public import public
+
+from .model import ObjectType, RevisionHistoryItem
+
+_ = __doc__
+
+
+@public
+class AnnotatedLine(NamedTuple):
+    """A line of an item with the revision which introduced it."""
+
+    line_number:   int
+    text:          str
+    revision_id:   int
+    changeset_id:  int
+    owner:         Optional[str]
+    creation_date: datetime
+
+
+class _LRUCache:
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+@public
+class Annotator:
+    """Annotates items, attributing each line to the revision which introduced it.
+
+    The revisions of an item are replayed from the oldest one, and lines
+    which survive a line diff keep their attribution. Both the revision
+    contents and the per-revision attributions are cached, so annotating
+    a newer revision of a hot file costs a single diff.
+    """
+
+    def __init__(self, plastic, *, cache_size: int = 256):
+        """Init
+
+        Args:
+            plastic:    The PlasticSCM API wrapper.
+            cache_size: The maximal number of cached revisions (default: 256).
+        """
+        self._plastic = plastic
+        self._contents = _LRUCache(cache_size)   # -> Tuple[str]
+        self._blames   = _LRUCache(cache_size)   # -> Tuple[RevisionHistoryItem]
+
+    def clear_cache(self) -> None:
+        """Drop all cached revisions."""
+        self._contents.clear()
+        self._blames.clear()
+
+    def annotate(self, repo_name: str,
+                 object_type: ObjectType, object: Union[str, int],  # noqa A002
+                 item_path: str, *, encoding: str = "utf-8") -> Tuple[AnnotatedLine]:
+        """Annotate an item.
+
+        Args:
+            repo_name:   The name of the repository.
+            object_type: The type of the point the item is taken at.
+                         It should be ObjectType.BRANCH, ObjectType.CHANGESET
+                         or ObjectType.LABEL.
+            object:      The branch name, the changeset id or the label name
+                         (according to object_type).
+            item_path:   The path of the item.
+            encoding:    The encoding of the item's content (default: "utf-8").
+
+        Returns:
+            The lines of the item's latest revision with their authorship.
+
+        Raises:
+            ValueError: If the item has no revisions or is not a text file.
+        """
+        history = self._history(repo_name, object_type, object, item_path)
+        if not history:
+            raise ValueError("Item '{}' has no revisions".format(item_path))
+        # Find the most recent revision with a known attribution ...
+        start = len(history) - 1
+        while start > 0 and self._blames.get((repo_name, history[start].revision_id)) is None:
+            start -= 1
+        lines = self._lines(repo_name, history[start].revision_id, encoding)
+        blame = self._blames.get((repo_name, history[start].revision_id))
+        if blame is None:
+            blame = (history[start],) * len(lines)
+            self._blames.put((repo_name, history[start].revision_id), blame)
+        # ... and replay the newer ones over it.
+        for rhitem in history[start + 1:]:
+            new_lines = self._lines(repo_name, rhitem.revision_id, encoding)
+            blame = self._diff_blame(lines, blame, new_lines, rhitem)
+            self._blames.put((repo_name, rhitem.revision_id), blame)
+            lines = new_lines
+        return tuple(AnnotatedLine(line_number=line_number, text=text,
+                                   revision_id=rhitem.revision_id,
+                                   changeset_id=rhitem.changeset_id,
+                                   owner=rhitem.owner.name if rhitem.owner else None,
+                                   creation_date=rhitem.creation_date)
+                     for line_number, (text, rhitem) in enumerate(zip(lines, blame), 1))
+
+    def _history(self, repo_name: str,
+                 object_type: ObjectType, object: Union[str, int],  # noqa A002
+                 item_path: str) -> List[RevisionHistoryItem]:
+        plastic = self._plastic
+        ObjectType = plastic.model.ObjectType
+        get_history = {
+            ObjectType.BRANCH:    plastic.get_item_revision_history_in_branch,
+            ObjectType.CHANGESET: plastic.get_item_revision_history_in_changeset,
+            ObjectType.LABEL:     plastic.get_item_revision_history_in_label,
+        }[object_type]
+        history: Dict[int, RevisionHistoryItem] = {
+            rhitem.revision_id: rhitem
+            for rhitem in get_history(repo_name, object, item_path)}
+        return sorted(history.values(), key=lambda rhitem: (rhitem.changeset_id,
+                                                            rhitem.revision_id))
+
+    def _lines(self, repo_name: str, revision_id: int, encoding: str) -> Tuple[str]:
+        key = (repo_name, revision_id)
+        lines = self._contents.get(key)
+        if lines is None:
+            content = self._plastic.get_item_content(repo_name, revision_id).tobytes()
+            if b"\0" in content:
+                raise ValueError("Revision {} is not a text file".format(revision_id))
+            lines = tuple(str(content, encoding, "replace").splitlines())
+            self._contents.put(key, lines)
+        return lines
+
+    @staticmethod
+    def _diff_blame(old_lines: Tuple[str], old_blame: Tuple[RevisionHistoryItem],
+                    new_lines: Tuple[str], rhitem: RevisionHistoryItem) \
+            -> Tuple[RevisionHistoryItem]:
+        blame = [rhitem] * len(new_lines)
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for old_start, new_start, size in matcher.get_matching_blocks():
+            blame[new_start:new_start + size] = old_blame[old_start:old_start + size]
+        return tuple(blame)
@@ -22,16 +22,7 @@ class PlasticConfigParser:
                  config_files: Optional[List[Path]] = None):
         """Init"""
         self.plastic_id = plastic_id
-        config_files = config_files or self._DEFAULT_CONFIG_FILES
-        if all(not file.is_file() for file in config_files):
-            raise PlasticConfigMissingError(
-                "Config file not found.\n"
-                "Please create one in one of the following locations: {}\n"
-                "or specify a config file using the '-c' parameter.".format(
-                ", ".join(str(file) for file in self._DEFAULT_CONFIG_FILES)))
-
-        self._config = configparser.ConfigParser()
-        self._config.read((str(file) for file in config_files), encoding="utf-8")
+        self._config = self._read(config_files)
 
         if self.plastic_id is None:
             try:
@@ -43,11 +34,19 @@ class PlasticConfigParser:
         sections = ("global", self.plastic_id)
 
         try:
-            self.url = self._config.get(self.plastic_id, "url")
+            # The primary url, optionally followed by urls of read replicas.
+            self.url, *self.replica_urls = \
+                self._config.get(self.plastic_id, "url").replace(",", " ").split()
         except Exception:
             raise PlasticDataError("Impossible to get plastic informations from "
                                    "configuration ({})".format(self.plastic_id))
 
+        self.server = None
+        try:
+            self.server = self._config.get(self.plastic_id, "server")
+        except Exception:
+            pass
+
         self.http_username = None
         self.http_password = None
         try:
@@ -114,6 +113,32 @@ class PlasticConfigParser:
         if self.per_page is not None and not 0 <= self.per_page <= 100:
             raise PlasticDataError("Unsupported per_page number: {}".format(self.per_page))
 
+    @classmethod
+    def plastic_ids(cls, config_files: Optional[List[Path]] = None) -> List[str]:
+        """The ids of all configured PlasticSCM servers (sections with an url)."""
+        config = cls._read(config_files)
+        return [section for section in config.sections()
+                if section != "global" and config.has_option(section, "url")]
+
+    @classmethod
+    def default_id(cls, config_files: Optional[List[Path]] = None) -> Optional[str]:
+        """The id of the default PlasticSCM server ([global] default), if any."""
+        config = cls._read(config_files)
+        return config.get("global", "default", fallback=None)
+
+    @classmethod
+    def _read(cls, config_files: Optional[List[Path]]) -> configparser.ConfigParser:
+        config_files = config_files or cls._DEFAULT_CONFIG_FILES
+        if all(not file.is_file() for file in config_files):
+            raise PlasticConfigMissingError(
+                "Config file not found.\n"
+                "Please create one in one of the following locations: {}\n"
+                "or specify a config file using the '-c' parameter.".format(
+                ", ".join(str(file) for file in cls._DEFAULT_CONFIG_FILES)))
+        config = configparser.ConfigParser()
+        config.read((str(file) for file in config_files), encoding="utf-8")
+        return config
+
 
 @public
 class ConfigError(Exception):
@@ -0,0 +1,348 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Generation of the API methods and JSON converters from declarative specs."""
+
+from typing import Any, Dict, List, Tuple, NamedTuple, Iterable, Iterator, Callable, Optional
+from datetime import datetime
+from uuid import UUID
+from pathlib import Path
+import itertools
+import codecs
+import enum
+import json
+import re
+
+from public import public
+
+from .rest import REST
+
+_ = __doc__
+
+REQUIRED = object()  # the default of the required parameters
+
+_is_space = re.compile(r"\s*").match
+
+
+@public
+class Field(NamedTuple):
+    """A field of a JSON object converted to an argument of the model class.
+
+    The kind is None (the JSON value as is), "date", "guid", "path", the
+    name of a schema, an enum class (looked up by value) or a one-element
+    list of one of them (a list of such values). The presence is
+    "required", "get" (None if missing, not converted) or "optional"
+    (converted if present, otherwise None).
+    """
+
+    attr:     str
+    key:      str
+    kind:     Any = None
+    presence: str = "required"
+
+
+@public
+class Schema(NamedTuple):
+    """The conversion of a JSON object to an instance of the model class."""
+
+    model:  type
+    fields: Tuple[Field, ...]
+
+
+@public
+class Param(NamedTuple):
+    """A parameter of an API method.
+
+    The value is sent in the url path (a field of the route), the query,
+    the form data or the JSON body. Parameters with a default are
+    keyword-only and, if the default is None, omitted when None. The encode
+    is a format of the expression sending the value (e.g. "str({})").
+    """
+
+    name:    str
+    kind:    Any = str
+    key:     Optional[str] = None  # The key in the query or body
+    where:   str = "path"          # "path", "query", "data" or "json"
+    default: Any = REQUIRED
+    encode:  str = "{}"
+
+
+@public
+class Endpoint(NamedTuple):
+    """An API method: its route, HTTP method, parameters and response.
+
+    The response is the name of a schema, a one-element list of it (the
+    method returns a tuple of them), "raw" (the bytes of the body) or None.
+    """
+
+    name:     str
+    method:   str
+    route:    str
+    params:   Tuple[Param, ...] = ()
+    response: Any = None
+
+
+def compile_converters(schemas: Dict[str, Schema]) -> Dict[str, Callable[[Dict], Any]]:
+    """Generate the converters of JSON objects to model instances.
+
+    Every converter is a single specialized function: the JSON keys,
+    presence checks, value conversions and enum lookup tables are
+    resolved once here rather than on every call.
+
+    Args:
+        schemas: The schemas by name.
+
+    Returns:
+        The converters by name of the schema.
+    """
+    namespace: Dict[str, Any] = {"parse_date": _parse_date, "UUID": UUID, "Path": Path}
+
+    def convert(kind, value: str) -> str:
+        if isinstance(kind, list):
+            return "[{} for item in {}]".format(convert(kind[0], "item"), value)
+        if kind is None:
+            return value
+        if kind == "date":
+            return "parse_date({})".format(value)
+        if kind == "guid":
+            return "UUID({})".format(value)
+        if kind == "path":
+            return "Path({})".format(value)
+        if isinstance(kind, enum.EnumMeta):
+            table = "_{}_{}".format(kind.__qualname__.replace(".", "_"), id(kind))
+            namespace[table] = {member.value: member for member in kind}
+            return "{}[{}]".format(table, value)
+        if kind in schemas:
+            return "convert_{}({})".format(kind, value)
+        raise ValueError("Unknown type: {!r}".format(kind))
+
+    for name, schema in schemas.items():
+        namespace[schema.model.__name__ + "_"] = schema.model
+        args = []
+        for field in schema.fields:
+            if field.presence == "get":
+                value = "obj.get({!r})".format(field.key)
+            elif field.presence == "optional":
+                value = "({} if {!r} in obj else None)".format(
+                        convert(field.kind, "obj[{!r}]".format(field.key)), field.key)
+            else:
+                value = convert(field.kind, "obj[{!r}]".format(field.key))
+            args.append("{}={}".format(field.attr, value))
+        exec("def convert_{}(obj):\n    return {}_({})\n".format(
+             name, schema.model.__name__, ",\n        ".join(args)), namespace)
+    return {name: namespace["convert_" + name] for name in schemas}
+
+
+def _parse_date(value: str) -> datetime:
+    # datetime.fromisoformat() is much faster, but does not accept every ISO 8601 date.
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        from dateutil.parser import isoparse
+        return isoparse(value)
+
+
+@public
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Decode the elements of a JSON array incrementally.
+
+    Every element is yielded as soon as its whole text was received.
+
+    Args:
+        chunks: The UTF-8 encoded text of the array in chunks.
+
+    Raises:
+        ValueError: If the text is not a (complete) JSON array.
+    """
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    raw_decode = json.JSONDecoder().raw_decode
+    buffer, pos, started = "", 0, False
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buffer = buffer[pos:] + decode(chunk or b"", final)
+        pos = 0
+        while True:
+            pos = _is_space(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Not a JSON array")
+                started = True
+                pos += 1
+            elif buffer[pos] == "]":
+                return
+            elif buffer[pos] == ",":
+                pos += 1
+            else:
+                try:
+                    value, end = raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # an incomplete element
+                # An element is complete when followed by a delimiter (a number
+                # cut by the chunk, e.g. "23." of "23.5", decodes as well).
+                end = _is_space(buffer, end).end()
+                if end >= len(buffer) or buffer[end] not in ",]":
+                    if final:
+                        raise ValueError("Invalid JSON array")
+                    break
+                pos = end
+                yield value
+    raise ValueError("Incomplete JSON array")
+
+
+def install_endpoints(cls: type, endpoints: Iterable[Endpoint],
+                      schemas: Dict[str, Schema]) -> Dict[str, Callable[[Dict], Any]]:
+    """Generate the API methods of the endpoints in an API class.
+
+    For every endpoint these methods are generated:
+
+    - name(...) - the (instrumented) method,
+    - name_async(...) - the coroutine of it (run in a thread),
+    - name_batch(args_list, *, workers=8) - concurrent calls of it for
+      every tuple of positional arguments, returning their results in
+      the order of args_list,
+    - name_iter(...) - for responses of lists only, a generator of the
+      elements converted as soon as they are received (not reported to
+      the metrics and tracing hooks).
+
+    The API class has to have the private _API__api_url, _API__session,
+    _API__ssl_verify and _API__timeout attributes.
+
+    Args:
+        cls:       The API class.
+        endpoints: The endpoints.
+        schemas:   The schemas of the responses by name.
+
+    Returns:
+        The converters of the schemas by name (see compile_converters()).
+    """
+    converters = compile_converters(schemas)
+    for endpoint in endpoints:
+        for func in _compile_endpoint(cls, endpoint, schemas, converters):
+            setattr(cls, func.__name__, func)
+    return converters
+
+
+def _compile_endpoint(cls: type, endpoint: Endpoint, schemas: Dict[str, Schema],
+                      converters: Dict[str, Callable[[Dict], Any]]) -> List[Callable]:
+    response = endpoint.response
+    is_list = isinstance(response, list)
+    namespace: Dict[str, Any] = {"_json_dumps": json.dumps,
+                                 "_iter_json_array": iter_json_array}
+    annotations = {param.name: param.kind for param in endpoint.params}
+    if is_list:
+        namespace["_convert"] = converters[response[0]]
+        annotations["return"] = Tuple[schemas[response[0]].model, ...]
+    elif response not in (None, "raw"):
+        namespace["_convert"] = converters[response]
+        annotations["return"] = schemas[response].model
+    else:
+        annotations["return"] = bytes if response == "raw" else None
+
+    args, kwonly, lines = ["self"], [], []
+    path_args = []
+    bodies: Dict[str, List[Param]] = {"query": [], "data": [], "json": []}
+    local = {"query": "_params", "data": "_data", "json": "_json"}  # no clash with params
+    for index, param in enumerate(endpoint.params):
+        if param.default is REQUIRED:
+            args.append(param.name)
+        else:
+            namespace["_default_{}".format(index)] = param.default
+            kwonly.append((index, param.name))
+        if param.where == "path":
+            path_args.append("{0}={0}".format(param.name))
+        else:
+            bodies[param.where].append(param)
+    for where, params in bodies.items():
+        if not params:
+            continue
+        lines.append("{} = {{{}}}".format(local[where], ", ".join(
+                     "{!r}: {}".format(param.key, param.encode.format(param.name))
+                     for param in params if param.default is not None)))
+        for param in params:
+            if param.default is None:
+                lines.append("if {} is not None: {}[{!r}] = {}".format(
+                             param.name, local[where], param.key,
+                             param.encode.format(param.name)))
+    request = ["self._API__api_url + _build({})".format(", ".join(path_args))]
+    if bodies["query"]:
+        request.append("params=_params or None")
+    if bodies["data"]:
+        request.append("data=_data")
+    if bodies["json"]:
+        request.append("json=_json_dumps(_json)")
+    request.append("session=self._API__session, "
+                   "verify=self._API__ssl_verify, timeout=self._API__timeout")
+    signature = ", ".join(args + (["*"] + ["{}=_default_{}".format(name, index)
+                                           for index, name in kwonly] if kwonly else []))
+    if response is None:
+        result = "_action({})\n    return None".format(", ".join(request))
+    elif response == "raw":
+        result = "return _action({}).content".format(", ".join(request))
+    elif is_list:
+        result = "return tuple(map(_convert, _action({}).json()))".format(", ".join(request))
+    else:
+        result = "return _convert(_action({}).json())".format(", ".join(request))
+    source = "def {}({}):\n{}    {}\n".format(
+             endpoint.name, signature, "".join("    " + line + "\n" for line in lines), result)
+    if is_list:
+        source += ("def {}_iter({}):\n{}"
+                   "    _response = _action({}, stream=True)\n"
+                   "    try:\n"
+                   "        for _item in _iter_json_array(_response.iter_content(64 * 1024)):\n"
+                   "            yield _convert(_item)\n"
+                   "    finally:\n"
+                   "        _response.close()\n").format(
+                   endpoint.name, signature, "".join("    " + line + "\n" for line in lines),
+                   ", ".join(request))
+    exec(source, namespace)
+
+    funcs = []
+    func = namespace[endpoint.name]
+    _set_names(cls, func, annotations)
+    func = getattr(REST, endpoint.method)(endpoint.route)(func)
+    route, action = func.REST
+    namespace["_build"], namespace["_action"] = route.build, action
+    funcs.append(func)
+    if is_list:
+        iterator = namespace[endpoint.name + "_iter"]
+        _set_names(cls, iterator, dict(annotations,
+                                       **{"return": Iterator[schemas[response[0]].model]}))
+        iterator.__doc__ = "Generator of the elements of {}().".format(endpoint.name)
+        funcs.append(iterator)
+
+    async def coroutine(self, *args, **kwargs):
+        import asyncio
+        return await asyncio.to_thread(getattr(self, endpoint.name), *args, **kwargs)
+
+    coroutine.__name__ = endpoint.name + "_async"
+    coroutine.__wrapped__ = func  # the signature
+    _set_names(cls, coroutine, None)
+    coroutine.__doc__ = "Coroutine of {}() (run in a thread).".format(endpoint.name)
+    funcs.append(coroutine)
+
+    def batch(self, args_list: Iterable[Tuple], *, workers: int = 8) -> Tuple:
+        from concurrent.futures import ThreadPoolExecutor
+        args_list = list(args_list)
+        if not args_list:
+            return ()
+        method = getattr(self, endpoint.name)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(args_list)))) as executor:
+            return tuple(executor.map(lambda args: method(*args), args_list))
+
+    batch.__name__ = endpoint.name + "_batch"
+    _set_names(cls, batch, None)
+    batch.__doc__ = ("Concurrent calls of {}() for every tuple of positional arguments "
+                     "(the results in their order).".format(endpoint.name))
+    funcs.append(batch)
+    return funcs
+
+
+def _set_names(cls: type, func: Callable, annotations: Optional[Dict[str, Any]]) -> None:
+    func.__module__   = cls.__module__
+    func.__qualname__ = "{}.{}".format(cls.__qualname__, func.__name__)
+    if annotations is not None:
+        func.__annotations__ = dict(annotations)
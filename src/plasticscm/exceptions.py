@@ -62,6 +62,29 @@ def on_http_error(error: Exception):
 class PlasticHttpError(PlasticError):
     """ """
 
+@public
+class PlasticOperationError(PlasticError):
+    """Failed long-running (update, switch or checkin) operation."""
+
+@public
+class PlasticBatchError(PlasticError):
+    """Some of the operations of a batch failed.
+
+    Attributes:
+        result: The combined result of the succeeded operations.
+        errors: The exceptions of the failed operations by their item paths.
+    """
+
+    def __init__(self, error_message="", result=None, errors=None):
+        """Init"""
+        super().__init__(error_message)
+        self.result = result
+        self.errors = errors if errors is not None else {}
+
+@public
+class PlasticReplayError(PlasticError):
+    """Request not present in the replayed traffic."""
+
 class GitlabAuthenticationError(PlasticError):
     """ """
 
@@ -0,0 +1,198 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Concurrent update/switch of many workspaces."""
+
+from typing   import Dict, Tuple, Iterable, NamedTuple, Callable, Optional, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from public import public
+import requests
+
+from .model      import ObjectType, OperationStatus
+from .rest       import REST
+from .exceptions import PlasticOperationError
+from ._plastic   import _Poller
+
+_ = __doc__
+
+
+@public
+class FleetReport(NamedTuple):
+    """The (partial or final) outcome of a fleet operation."""
+
+    statuses: Dict[str, OperationStatus]  # the last statuses of the workspaces
+    errors:   Dict[str, Exception]        # the workspaces which finally failed
+    attempts: Dict[str, int]              # the numbers of started operations
+    elapsed:  float                       # in seconds
+
+    @property
+    def succeeded(self) -> Tuple[str]:
+        """The names of the workspaces whose operation finished."""
+        return tuple(name for name, status in self.statuses.items()
+                     if status.status in _Poller.FINISHED and name not in self.errors)
+
+    @property
+    def updated_files(self) -> int:
+        """The number of files updated across the fleet."""
+        return sum(status.updated_files for status in self.statuses.values())
+
+    @property
+    def updated_bytes(self) -> int:
+        """The number of bytes updated across the fleet."""
+        return sum(status.updated_bytes for status in self.statuses.values())
+
+    @property
+    def files_per_second(self) -> float:
+        """The aggregate throughput in files per second."""
+        return self.updated_files / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """The aggregate throughput in bytes per second."""
+        return self.updated_bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@public
+class WorkspaceFleet:
+    """Updates or switches many workspaces concurrently.
+
+    At most max_concurrent operations run at a time. A single scheduler
+    loop starts the queued operations and polls the statuses of all the
+    running ones (the requests of a round are issued in parallel).
+    Failed operations and transient errors of the start requests are
+    retried, transient errors of the status polls only repeat the poll;
+    workspaces which still fail are reported instead of raising.
+    """
+
+    def __init__(self, plastic, wkspace_names: Iterable[str], *,
+                 max_concurrent: int = 8, retries: int = 2, poll_interval: float = 1.0):
+        """Init
+
+        Args:
+            plastic:        The PlasticSCM API wrapper.
+            wkspace_names:  The names of the workspaces.
+            max_concurrent: The maximal number of running operations (default: 8).
+            retries:        The number of retries of a failed operation (default: 2).
+            poll_interval:  The interval between status polls in seconds (default: 1).
+        """
+        self._plastic = plastic
+        self._wkspace_names = tuple(dict.fromkeys(wkspace_names))
+        self._max_concurrent = max(1, max_concurrent)
+        self._retries = retries
+        self._poll_interval = poll_interval
+
+    @property
+    def wkspace_names(self) -> Tuple[str]:
+        """The names of the workspaces of the fleet."""
+        return self._wkspace_names
+
+    def update(self, *, timeout: Optional[float] = None,
+               on_progress: Optional[Callable[[FleetReport], None]] = None) -> FleetReport:
+        """Update all workspaces of the fleet.
+
+        Args:
+            timeout:     The maximal time of the whole operation in seconds
+                         (default: no limit).
+            on_progress: A callable invoked with the partial report after
+                         every scheduler round.
+
+        Returns:
+            The final report of the operation.
+        """
+        plastic = self._plastic
+        return self._run(plastic.update_workspace, plastic.get_workspace_update_status,
+                         timeout, on_progress)
+
+    def switch(self, object_type: ObjectType, object: Union[str, int], *,  # noqa A002
+               timeout: Optional[float] = None,
+               on_progress: Optional[Callable[[FleetReport], None]] = None) -> FleetReport:
+        """Switch all workspaces of the fleet to a branch, changeset or label.
+
+        Args:
+            object_type: The type of switch destination.
+                         It should be ObjectType.CHANGESET, ObjectType.LABEL
+                         or ObjectType.BRANCH.
+            object:      The changeset id, the label name or the branch name
+                         (according to object_type).
+            timeout:     The maximal time of the whole operation in seconds
+                         (default: no limit).
+            on_progress: A callable invoked with the partial report after
+                         every scheduler round.
+
+        Returns:
+            The final report of the operation.
+        """
+        plastic = self._plastic
+        return self._run(lambda wkspace_name: plastic.switch_workspace(wkspace_name,
+                                                                       object_type, object),
+                         plastic.get_workspace_switch_status, timeout, on_progress)
+
+    def _run(self, start: Callable[[str], OperationStatus],
+             get_status: Callable[[str], OperationStatus],
+             timeout: Optional[float],
+             on_progress: Optional[Callable[[FleetReport], None]]) -> FleetReport:
+        queued   = deque(self._wkspace_names)
+        running  = set()
+        statuses: Dict[str, OperationStatus] = {}
+        errors:   Dict[str, Exception] = {}
+        attempts: Dict[str, int] = dict.fromkeys(self._wkspace_names, 0)
+        start_time = time.monotonic()
+
+        def call(func, wkspace_name):
+            try:
+                return func(wkspace_name), None
+            except requests.RequestException as exc:
+                return None, exc
+
+        def report():
+            return FleetReport(dict(statuses), dict(errors), dict(attempts),
+                               time.monotonic() - start_time)
+
+        def process(wkspace_name, status, exc, polled):
+            errors.pop(wkspace_name, None)
+            if status is not None:
+                statuses[wkspace_name] = status
+                if status.status in _Poller.FINISHED:
+                    running.discard(wkspace_name)
+                    return
+                if status.status not in _Poller.FAILED:
+                    running.add(wkspace_name)
+                    return
+                exc = PlasticOperationError(status.message or status.status)
+            elif polled:
+                # The operation may still be running: it is not started
+                # again, only its status is polled in the next round.
+                errors[wkspace_name] = exc
+                if not REST.is_transient(exc):
+                    running.discard(wkspace_name)
+                return
+            running.discard(wkspace_name)
+            errors[wkspace_name] = exc
+            retriable = not isinstance(exc, requests.RequestException) or REST.is_transient(exc)
+            if retriable and attempts[wkspace_name] <= self._retries:
+                queued.append(wkspace_name)
+
+        with ThreadPoolExecutor(max_workers=self._max_concurrent) as executor:
+            while queued or running:
+                started = []
+                while queued and len(running) + len(started) < self._max_concurrent:
+                    wkspace_name = queued.popleft()
+                    attempts[wkspace_name] += 1
+                    started.append(wkspace_name)
+                calls = ([(start, wkspace_name) for wkspace_name in started]
+                         + [(get_status, wkspace_name) for wkspace_name in sorted(running)])
+                for (func, wkspace_name), (status, exc) in zip(calls, executor.map(
+                        lambda args: call(*args), calls)):
+                    process(wkspace_name, status, exc, func is get_status)
+                if on_progress is not None:
+                    on_progress(report())
+                if timeout is not None and time.monotonic() - start_time >= timeout:
+                    for wkspace_name in (*running, *queued):
+                        errors[wkspace_name] = TimeoutError("Workspace operation timed out")
+                    break
+                if running:
+                    time.sleep(self._poll_interval)
+        return report()
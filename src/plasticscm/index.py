@@ -0,0 +1,731 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""In-memory indexes over repository metadata."""
+
+from typing   import Dict, List, Tuple, Iterable, Iterator, Optional, Union
+from pathlib  import Path
+from datetime import datetime
+import bisect
+import heapq
+import json
+
+from public import public
+
+from .model import Branch, Label
+from .query import Field
+
+_ = __doc__
+
+
+def _date_query(field: str, since: datetime) -> str:
+    # Inclusive, since dates have second resolution only; duplicates
+    # are recognized by the object ids.
+    return str(Field(field) >= since)
+
+
+@public
+class ChangesetGraph:
+    """Changeset DAG index of a single repository.
+
+    Changesets are linked with their first parent (Changeset.parent_id)
+    and with their merge sources (Merge.source_changeset of Diff.merges).
+
+    The first-parent tree is indexed with skip (jump) pointers, so
+    first-parent ancestry is answered in O(log n) and new changesets are
+    indexed in O(1). Generation numbers prune the searches across merge
+    edges.
+
+    Changeset ids grow monotonically in PlasticSCM, so changesets have to
+    be added in ascending id order (which is a topological order).
+    """
+
+    _FORMAT_VERSION = 1
+
+    def __init__(self):
+        """Init"""
+        self._parent:  Dict[int, Optional[int]] = {}
+        self._branch:  Dict[int, Optional[str]] = {}
+        self._merges:  Dict[int, Tuple[int, ...]] = {}
+        self._depth:   Dict[int, int] = {}  # depth in the first-parent tree
+        self._jump:    Dict[int, int] = {}  # skip pointer in the first-parent tree
+        self._gen:     Dict[int, int] = {}  # generation number in the DAG
+        # nearest first-parent ancestor (or self) having merge sources
+        self._merge_up: Dict[int, Optional[int]] = {}
+        self._last_id: Optional[int] = None
+
+    @classmethod
+    def from_plastic(cls, plastic, repo_name: str, *,
+                     merges: bool = False) -> 'ChangesetGraph':
+        """Build the index from all changesets of a repository.
+
+        Args:
+            plastic:   The PlasticSCM API wrapper.
+            repo_name: The name of the repository.
+            merges:    If True, the merge sources of every changeset are fetched
+                       (one diff_changeset() call per changeset) (default: False).
+
+        Returns:
+            The changeset graph.
+        """
+        self = cls()
+        self.update(plastic, repo_name, merges=merges)
+        return self
+
+    def update(self, plastic, repo_name: str, *, merges: bool = False) -> Tuple[int]:
+        """Add the changesets created since the last update.
+
+        Args:
+            plastic:   The PlasticSCM API wrapper.
+            repo_name: The name of the repository.
+            merges:    If True, the merge sources of the new changesets
+                       are fetched as well (default: False).
+
+        Returns:
+            The ids of the added changesets.
+        """
+        query = "id > {}".format(self._last_id) if self._last_id is not None else None
+        changesets = sorted(plastic.get_changesets(repo_name, query=query),
+                            key=lambda chset: chset.id)
+        added = []
+        for chset in changesets:
+            if chset.id in self._parent:
+                continue
+            sources = ()
+            if merges:
+                sources = {merge.source_changeset.id
+                           for diff in plastic.diff_changeset(repo_name, chset.id)
+                           for merge in diff.merges or ()}
+                sources.discard(chset.parent_id)
+            self.add(chset.id, chset.parent_id,
+                     branch_name=chset.branch.name, merge_sources=sorted(sources))
+            added.append(chset.id)
+        return tuple(added)
+
+    def add(self, changeset_id: int, parent_id: Optional[int], *,
+            branch_name: Optional[str] = None,
+            merge_sources: Iterable[int] = ()) -> None:
+        """Add a single changeset to the index.
+
+        Args:
+            changeset_id:  The id of the changeset.
+            parent_id:     The id of its (first) parent changeset.
+                           Unknown parents (e.g. -1) make it a root.
+            branch_name:   The name of the branch of the changeset.
+            merge_sources: The ids of the changesets merged into the changeset.
+
+        Raises:
+            ValueError: If the changeset is already indexed or is older
+                        than the last indexed changeset.
+        """
+        if changeset_id in self._parent:
+            raise ValueError("Changeset {} is already indexed".format(changeset_id))
+        if self._last_id is not None and changeset_id < self._last_id:
+            raise ValueError("Changesets have to be added in ascending id order")
+        parent = parent_id if parent_id in self._parent else None
+        sources = tuple(source for source in merge_sources if source in self._parent)
+        self._parent[changeset_id] = parent
+        self._branch[changeset_id] = branch_name
+        self._merges[changeset_id] = sources
+        if parent is None:
+            self._depth[changeset_id] = 0
+            self._jump[changeset_id]  = changeset_id
+        else:
+            depth, jump = self._depth, self._jump
+            depth[changeset_id] = depth[parent] + 1
+            jump1 = jump[parent]
+            jump2 = jump[jump1]
+            jump[changeset_id] = (jump2 if (depth[parent] - depth[jump1]
+                                            == depth[jump1] - depth[jump2]) else parent)
+        self._gen[changeset_id] = 1 + max((self._gen[node] for node in (parent, *sources)
+                                           if node is not None), default=-1)
+        self._merge_up[changeset_id] = (changeset_id if sources else
+                                        self._merge_up[parent] if parent is not None else None)
+        self._last_id = changeset_id
+
+    def __len__(self) -> int:
+        """Number of the indexed changesets."""
+        return len(self._parent)
+
+    def __contains__(self, changeset_id: int) -> bool:
+        """Whether the changeset is indexed."""
+        return changeset_id in self._parent
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the ids of the indexed changesets (in ascending order)."""
+        return iter(self._parent)
+
+    @property
+    def last_id(self) -> Optional[int]:
+        """The id of the most recent indexed changeset."""
+        return self._last_id
+
+    def parent(self, changeset_id: int) -> Optional[int]:
+        """The id of the first parent of the changeset (None for a root)."""
+        return self._parent[changeset_id]
+
+    def merge_sources(self, changeset_id: int) -> Tuple[int, ...]:
+        """The ids of the changesets merged into the changeset."""
+        return self._merges[changeset_id]
+
+    def branch(self, changeset_id: int) -> Optional[str]:
+        """The name of the branch of the changeset."""
+        return self._branch[changeset_id]
+
+    def first_parent_walk(self, changeset_id: int) -> Iterator[int]:
+        """Iterate over the changeset and its first-parent ancestors.
+
+        Args:
+            changeset_id: The id of the changeset to start from.
+
+        Yields:
+            Changeset ids, from the changeset down to the root.
+        """
+        node = changeset_id
+        self._check(node)
+        while node is not None:
+            yield node
+            node = self._parent[node]
+
+    def is_ancestor(self, ancestor_id: int, changeset_id: int) -> bool:
+        """Whether a changeset is reachable from another one.
+
+        Args:
+            ancestor_id:  The id of the possible ancestor.
+            changeset_id: The id of the possible descendant.
+
+        Returns:
+            True if ancestor_id is changeset_id or one of its (first-parent
+            or merged) ancestors.
+        """
+        self._check(ancestor_id, changeset_id)
+        if self._is_tree_ancestor(ancestor_id, changeset_id):
+            return True
+        gen, parent, merges, merge_up = self._gen, self._parent, self._merges, self._merge_up
+        ancestor_gen = gen[ancestor_id]
+        if ancestor_gen >= gen[changeset_id]:
+            return False
+        stack = [changeset_id]
+        seen  = {changeset_id}
+        while stack:
+            node = merge_up[stack.pop()]
+            # Walk the merge nodes on the first-parent chain.
+            while node is not None and gen[node] > ancestor_gen:
+                for source in merges[node]:
+                    if source in seen or gen[source] < ancestor_gen:
+                        continue
+                    if self._is_tree_ancestor(ancestor_id, source):
+                        return True
+                    seen.add(source)
+                    stack.append(source)
+                node = parent[node]
+                node = merge_up[node] if node is not None else None
+        return False
+
+    def merge_base(self, changeset_id1: int, changeset_id2: int) -> Optional[int]:
+        """Find the best common ancestor of two changesets.
+
+        Args:
+            changeset_id1: The id of the first changeset.
+            changeset_id2: The id of the second changeset.
+
+        Returns:
+            The id of the most recent common ancestor or None if the
+            changesets have no common ancestor.
+        """
+        self._check(changeset_id1, changeset_id2)
+        if self.is_ancestor(changeset_id1, changeset_id2):
+            return changeset_id1
+        if self.is_ancestor(changeset_id2, changeset_id1):
+            return changeset_id2
+        if not self._merge_up[changeset_id1] and not self._merge_up[changeset_id2]:
+            return self._tree_lca(changeset_id1, changeset_id2)
+        # Paint down both sides in topological (descending id) order;
+        # the first changeset reached from both sides is the best one.
+        flags = {changeset_id1: 1, changeset_id2: 2}
+        heap = [-changeset_id1, -changeset_id2]
+        heapq.heapify(heap)
+        while heap:
+            node = -heapq.heappop(heap)
+            if flags[node] == 3:
+                return node
+            for pred in self._predecessors(node):
+                if pred not in flags:
+                    flags[pred] = 0
+                    heapq.heappush(heap, -pred)
+                flags[pred] |= flags[node]
+        return None
+
+    def changesets_between(self, from_id: int, to_id: int) -> Tuple[int]:
+        """Find the changesets reachable from one changeset but not from another.
+
+        This is the equivalent of git's "from..to" range.
+
+        Args:
+            from_id: The id of the excluded changeset.
+            to_id:   The id of the included changeset.
+
+        Returns:
+            The ids of the changesets that are ancestors of to_id (inclusive)
+            but not of from_id, in ascending order.
+        """
+        self._check(from_id, to_id)
+        if not self._merge_up[to_id] and self._is_tree_ancestor(from_id, to_id):
+            result = []
+            node = to_id
+            while node != from_id:
+                result.append(node)
+                node = self._parent[node]
+            return tuple(reversed(result))
+        INCLUDED, EXCLUDED = 1, 2
+        flags = {to_id: INCLUDED, from_id: EXCLUDED}
+        heap = [-to_id, -from_id]
+        heapq.heapify(heap)
+        included = 1 if to_id != from_id else 0  # included entries in the heap
+        result = []
+        while included:
+            node = -heapq.heappop(heap)
+            node_flags = flags[node]
+            if node_flags == INCLUDED:
+                included -= 1
+                result.append(node)
+            for pred in self._predecessors(node):
+                pred_flags = flags.get(pred)
+                if pred_flags is None:
+                    flags[pred] = node_flags
+                    heapq.heappush(heap, -pred)
+                    if node_flags == INCLUDED:
+                        included += 1
+                elif pred_flags == INCLUDED and node_flags & EXCLUDED:
+                    flags[pred] = pred_flags | EXCLUDED
+                    included -= 1
+        return tuple(sorted(result))
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Persist the index to a file.
+
+        Args:
+            path: The path of the file.
+        """
+        data = {
+            "version": self._FORMAT_VERSION,
+            "changesets": [[node, self._parent[node], self._branch[node],
+                            list(self._merges[node])] for node in self._parent],
+        }
+        Path(path).write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'ChangesetGraph':
+        """Load an index persisted with save().
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The changeset graph.
+        """
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("version") != cls._FORMAT_VERSION:
+            raise ValueError("Unsupported changeset graph format: {}".format(
+                             data.get("version")))
+        self = cls()
+        for node, parent, branch_name, sources in data["changesets"]:
+            self.add(node, parent, branch_name=branch_name, merge_sources=sources)
+        return self
+
+    def _check(self, *changeset_ids: int) -> None:
+        for changeset_id in changeset_ids:
+            if changeset_id not in self._parent:
+                raise KeyError("Changeset {} is not indexed".format(changeset_id))
+
+    def _predecessors(self, node: int) -> List[int]:
+        parent = self._parent[node]
+        return ([parent] if parent is not None else []) + list(self._merges[node])
+
+    def _level_ancestor(self, node: int, depth: int) -> int:
+        depths, jump, parent = self._depth, self._jump, self._parent
+        while depths[node] > depth:
+            node = jump[node] if depths[jump[node]] >= depth else parent[node]
+        return node
+
+    def _is_tree_ancestor(self, ancestor_id: int, changeset_id: int) -> bool:
+        depth = self._depth[ancestor_id]
+        return (depth <= self._depth[changeset_id]
+                and self._level_ancestor(changeset_id, depth) == ancestor_id)
+
+    def _tree_lca(self, node1: int, node2: int) -> Optional[int]:
+        depth, jump, parent = self._depth, self._jump, self._parent
+        if depth[node1] > depth[node2]:
+            node1 = self._level_ancestor(node1, depth[node2])
+        else:
+            node2 = self._level_ancestor(node2, depth[node1])
+        # Nodes of equal depth have skip pointers of equal depth.
+        while node1 != node2:
+            if depth[node1] == 0:  # distinct roots
+                return None
+            if jump[node1] != jump[node2]:
+                node1, node2 = jump[node1], jump[node2]
+            else:
+                node1, node2 = parent[node1], parent[node2]
+        return node1
+
+
+@public
+class BranchTree:
+    """Branch hierarchy index of a single repository.
+
+    Branches are indexed by id and by name, and linked into a tree
+    according to their hierarchical names (e.g. "/main/task001" is a child
+    of "/main"). All lookups are O(1) and prefix queries are O(log n + k).
+    """
+
+    def __init__(self, branches: Iterable[Branch] = ()):
+        """Init"""
+        self._reset(branches)
+
+    @classmethod
+    def from_plastic(cls, plastic, repo_name: str) -> 'BranchTree':
+        """Build the index with a single get_branches() call.
+
+        Args:
+            plastic:   The PlasticSCM API wrapper.
+            repo_name: The name of the repository.
+
+        Returns:
+            The branch tree.
+        """
+        return cls(plastic.get_branches(repo_name))
+
+    def refresh(self, plastic, repo_name: str, *, full: bool = False) -> Tuple[Branch]:
+        """Add the branches created since the last refresh.
+
+        Renamed and deleted branches are detected by a full refresh only.
+
+        Args:
+            plastic:   The PlasticSCM API wrapper.
+            repo_name: The name of the repository.
+            full:      If True, all branches are fetched and the index
+                       is rebuilt (default: False).
+
+        Returns:
+            The branches which were added (or updated).
+        """
+        if full or self._last_date is None:
+            branches = plastic.get_branches(repo_name)
+            self._reset(branches)
+            return tuple(branches)
+        query = _date_query("date", self._last_date)
+        added = []
+        for branch in plastic.get_branches(repo_name, query=query):
+            known = self._by_id.get(branch.id)
+            if known is None or known.name != branch.name:
+                self.add(branch)
+                added.append(branch)
+        return tuple(added)
+
+    def add(self, branch: Branch) -> None:
+        """Add (or replace) a single branch.
+
+        Args:
+            branch: The branch.
+        """
+        name = self._norm_name(branch.name)
+        # The same id (e.g. renamed) or the same name (e.g. deleted and
+        # recreated) replaces the indexed branch.
+        for known in (self._by_id.get(branch.id), self._by_name.get(name)):
+            if known is not None and known.id in self._by_id:
+                self.remove(known.id)
+        self._by_id[branch.id] = branch
+        self._by_name[name] = branch
+        bisect.insort(self._names, name)
+        parent = self._nearest_ancestor(name)
+        self._link(name, parent)
+        self._children[name] = []
+        # Adopt the descendants which were linked to a farther ancestor.
+        for child in self._descendant_names(name):
+            if self._parent[child] == parent:
+                self._unlink(child)
+                self._link(child, name)
+        if self._last_date is None or branch.creation_date > self._last_date:
+            self._last_date = branch.creation_date
+
+    def remove(self, branch_id: int) -> Branch:
+        """Remove a single branch; its children are moved up to its parent.
+
+        Args:
+            branch_id: The id of the branch.
+
+        Returns:
+            The removed branch.
+        """
+        branch = self._by_id.pop(branch_id)
+        name = self._norm_name(branch.name)
+        del self._by_name[name]
+        del self._names[bisect.bisect_left(self._names, name)]
+        parent = self._parent[name]
+        self._unlink(name)
+        for child in self._children.pop(name):
+            self._link(child, parent)
+        return branch
+
+    def __len__(self) -> int:
+        """Number of the indexed branches."""
+        return len(self._by_id)
+
+    def __contains__(self, key: Union[int, str]) -> bool:
+        """Whether the branch (by id or by name) is indexed."""
+        if isinstance(key, str):
+            return self._norm_name(key) in self._by_name
+        return key in self._by_id
+
+    def __getitem__(self, key: Union[int, str]) -> Branch:
+        """The branch of the given id or name."""
+        if isinstance(key, str):
+            return self._by_name[self._norm_name(key)]
+        return self._by_id[key]
+
+    def __iter__(self) -> Iterator[Branch]:
+        """Iterate over all branches in depth-first order."""
+        return self.walk()
+
+    @property
+    def last_date(self) -> Optional[datetime]:
+        """The creation date of the most recent indexed branch."""
+        return self._last_date
+
+    def roots(self) -> Tuple[Branch]:
+        """The top-level branches."""
+        return tuple(self._by_name[name] for name in self._children[None])
+
+    def parent(self, key: Union[int, str]) -> Optional[Branch]:
+        """The parent of the branch of the given id or name (None for top-level)."""
+        parent = self._parent[self._norm_name(self[key].name)]
+        return self._by_name[parent] if parent is not None else None
+
+    def children(self, key: Union[int, str]) -> Tuple[Branch]:
+        """The child branches of the branch of the given id or name."""
+        return tuple(self._by_name[name]
+                     for name in self._children[self._norm_name(self[key].name)])
+
+    def with_prefix(self, prefix: str) -> Tuple[Branch]:
+        """The branches whose names start with a prefix, sorted by name.
+
+        Args:
+            prefix: The prefix of the names (e.g. "/main/task").
+        """
+        prefix = "/" + prefix.lstrip("/")
+        names = self._names
+        start = bisect.bisect_left(names, prefix)
+        end   = bisect.bisect_left(names, prefix + "\U0010ffff", start)
+        return tuple(self._by_name[name] for name in names[start:end])
+
+    def walk(self, key: Union[None, int, str] = None) -> Iterator[Branch]:
+        """Iterate over a branch subtree in depth-first (pre-)order.
+
+        Args:
+            key: The id or name of the subtree's root branch
+                 (default: all branches).
+
+        Yields:
+            The branches; siblings are ordered by name.
+        """
+        if key is None:
+            stack = list(reversed(self._children[None]))
+        else:
+            stack = [self._norm_name(self[key].name)]
+        while stack:
+            name = stack.pop()
+            yield self._by_name[name]
+            stack.extend(reversed(self._children[name]))
+
+    def _reset(self, branches: Iterable[Branch] = ()) -> None:
+        self._by_id:    Dict[int, Branch] = {}
+        self._by_name:  Dict[str, Branch] = {}
+        self._parent:   Dict[str, Optional[str]] = {}
+        self._children: Dict[Optional[str], List[str]] = {None: []}
+        self._names:    List[str] = []  # sorted
+        self._last_date: Optional[datetime] = None
+        for branch in branches:
+            self.add(branch)
+
+    @staticmethod
+    def _norm_name(name: str) -> str:
+        return "/" + name.strip("/")
+
+    def _nearest_ancestor(self, name: str) -> Optional[str]:
+        while True:
+            name = name.rpartition("/")[0]
+            if not name:
+                return None
+            if name in self._by_name:
+                return name
+
+    def _descendant_names(self, name: str) -> List[str]:
+        names = self._names
+        prefix = name + "/"
+        start = bisect.bisect_left(names, prefix)
+        end   = bisect.bisect_left(names, prefix + "\U0010ffff", start)
+        return names[start:end]
+
+    def _link(self, name: str, parent: Optional[str]) -> None:
+        self._parent[name] = parent
+        bisect.insort(self._children[parent], name)
+
+    def _unlink(self, name: str) -> None:
+        siblings = self._children[self._parent.pop(name)]
+        del siblings[bisect.bisect_left(siblings, name)]
+
+
+@public
+class LabelIndex:
+    """Label index of a single repository, ordered by labelled changesets.
+
+    Labels are kept sorted by (Label.changeset_id, Label.id), so the labels
+    at, below or between changesets are found by bisection.
+    """
+
+    def __init__(self, labels: Iterable[Label] = ()):
+        """Init"""
+        self._by_id:   Dict[int, Label] = {}
+        self._by_name: Dict[str, Label] = {}
+        self._keys: List[Tuple[int, int]] = []  # sorted (changeset_id, label_id)
+        self._last_id: Optional[int] = None
+        for label in labels:
+            self.add(label)
+
+    @classmethod
+    def from_plastic(cls, plastic, repo_name: str) -> 'LabelIndex':
+        """Build the index with a single get_labels() call.
+
+        Args:
+            plastic:   The PlasticSCM API wrapper.
+            repo_name: The name of the repository.
+
+        Returns:
+            The label index.
+        """
+        return cls(plastic.get_labels(repo_name))
+
+    def refresh(self, plastic, repo_name: str) -> Tuple[Label]:
+        """Add the labels created since the last refresh.
+
+        Args:
+            plastic:   The PlasticSCM API wrapper.
+            repo_name: The name of the repository.
+
+        Returns:
+            The added labels.
+        """
+        query = "id > {}".format(self._last_id) if self._last_id is not None else None
+        added = tuple(label for label in plastic.get_labels(repo_name, query=query)
+                      if label.id not in self._by_id)
+        for label in added:
+            self.add(label)
+        return added
+
+    def add(self, label: Label) -> None:
+        """Add (or replace) a single label.
+
+        Args:
+            label: The label.
+        """
+        # The same id or the same name (e.g. deleted and recreated)
+        # replaces the indexed label.
+        for known in (self._by_id.get(label.id), self._by_name.get(label.name)):
+            if known is not None and known.id in self._by_id:
+                self.remove(known.id)
+        self._by_id[label.id] = label
+        self._by_name[label.name] = label
+        bisect.insort(self._keys, (label.changeset_id, label.id))
+        if self._last_id is None or label.id > self._last_id:
+            self._last_id = label.id
+
+    def remove(self, label_id: int) -> Label:
+        """Remove a single label.
+
+        Args:
+            label_id: The id of the label.
+
+        Returns:
+            The removed label.
+        """
+        label = self._by_id.pop(label_id)
+        if self._by_name.get(label.name) is label:
+            del self._by_name[label.name]
+        del self._keys[bisect.bisect_left(self._keys, (label.changeset_id, label.id))]
+        return label
+
+    def __len__(self) -> int:
+        """Number of the indexed labels."""
+        return len(self._by_id)
+
+    def __contains__(self, key: Union[int, str]) -> bool:
+        """Whether the label (by id or by name) is indexed."""
+        return key in (self._by_name if isinstance(key, str) else self._by_id)
+
+    def __getitem__(self, key: Union[int, str]) -> Label:
+        """The label of the given id or name."""
+        return (self._by_name if isinstance(key, str) else self._by_id)[key]
+
+    def __iter__(self) -> Iterator[Label]:
+        """Iterate over the labels ordered by their changesets."""
+        return (self._by_id[label_id] for _, label_id in self._keys)
+
+    @property
+    def last_id(self) -> Optional[int]:
+        """The id of the most recent indexed label."""
+        return self._last_id
+
+    def at(self, changeset_id: int) -> Tuple[Label]:
+        """The labels applied to the changeset."""
+        return self.between(changeset_id, changeset_id)
+
+    def nearest(self, changeset_id: int) -> Optional[Label]:
+        """The label applied to the highest changeset at or below a changeset.
+
+        Args:
+            changeset_id: The id of the changeset.
+
+        Returns:
+            The nearest label (the most recent one, if the changeset
+            has several) or None if there is no such label.
+        """
+        index = bisect.bisect_right(self._keys, (changeset_id, float("inf")))
+        return self._by_id[self._keys[index - 1][1]] if index else None
+
+    def between(self, low_changeset_id: int, high_changeset_id: int) -> Tuple[Label]:
+        """The labels applied to the changesets of an id range.
+
+        Args:
+            low_changeset_id:  The lowest changeset id (inclusive).
+            high_changeset_id: The highest changeset id (inclusive).
+
+        Returns:
+            The labels, ordered by their changesets.
+        """
+        keys = self._keys
+        start = bisect.bisect_left(keys,  (low_changeset_id, float("-inf")))
+        end   = bisect.bisect_right(keys, (high_changeset_id, float("inf")), start)
+        return tuple(self._by_id[label_id] for _, label_id in keys[start:end])
+
+    def containing(self, changeset_id: int,
+                   graph: Optional[ChangesetGraph] = None) -> Tuple[Label]:
+        """The labels whose changesets include a changeset.
+
+        Args:
+            changeset_id: The id of the changeset (e.g. the one of a fix).
+            graph:        The changeset graph of the repository. If None,
+                          every label applied at or above the changeset
+                          is reported, otherwise only the labels of its
+                          descendants (the labels of the changesets which
+                          are not in the graph yet are skipped).
+
+        Returns:
+            The labels, ordered by their changesets, so the first one is
+            the first release containing the changeset.
+        """
+        keys = self._keys
+        start = bisect.bisect_left(keys, (changeset_id, float("-inf")))
+        return tuple(self._by_id[label_id] for label_cs_id, label_id in keys[start:]
+                     if graph is None or (label_cs_id in graph
+                                          and graph.is_ancestor(changeset_id, label_cs_id)))
@@ -0,0 +1,178 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Per-endpoint metrics of the API calls."""
+
+from typing import Any, Dict, Tuple, Optional
+import bisect
+import threading
+
+from public import public
+
+_ = __doc__
+
+#: The upper bounds (in seconds) of the latency histograms' buckets.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+PHASES = ("network", "decode", "convert")
+
+
+@public
+class Histogram:
+    """Latency histogram with fixed buckets."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Init"""
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count  = 0
+        self.sum    = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum   += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+@public
+class EndpointMetrics:
+    """Counters and latency histograms of a route."""
+
+    __slots__ = ("requests", "errors", "bytes_in", "bytes_out", "latency")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Init"""
+        self.requests  = 0
+        self.errors    = 0
+        self.bytes_in  = 0
+        self.bytes_out = 0
+        self.latency   = {phase: Histogram(bounds) for phase in PHASES}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"requests":  self.requests,
+                "errors":    self.errors,
+                "bytes_in":  self.bytes_in,
+                "bytes_out": self.bytes_out,
+                **{phase: histogram.snapshot() for phase, histogram in self.latency.items()}}
+
+
+@public
+class Metrics:
+    """Registry of the metrics of the API calls, by HTTP method and route template.
+
+    The latency of a call is split into network time (the HTTP request),
+    JSON decode time and model conversion time (the rest of the call).
+    Recording is opt-in (set enabled to True), so the calls cost nothing
+    extra unless metrics or tracing hooks are used.
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Init
+
+        Args:
+            bounds: The upper bounds (in seconds) of the histograms' buckets.
+        """
+        self.enabled = False
+        self._bounds = bounds
+        self._endpoints: Dict[Tuple[str, str], EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, *,
+               network: float, decode: float, convert: float,
+               bytes_in: int = 0, bytes_out: int = 0, error: bool = False) -> None:
+        """Record a call.
+
+        Args:
+            method:    The HTTP method.
+            route:     The route template (e.g. "/repos/{repo_name}").
+            network:   The network time in seconds.
+            decode:    The JSON decode time in seconds.
+            convert:   The model conversion time in seconds.
+            bytes_in:  The size of the response body.
+            bytes_out: The size of the request body.
+            error:     Whether the call failed.
+        """
+        key = (method, route)
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = EndpointMetrics(self._bounds)
+            endpoint.requests  += 1
+            endpoint.errors    += error
+            endpoint.bytes_in  += bytes_in
+            endpoint.bytes_out += bytes_out
+            latency = endpoint.latency
+            latency["network"].observe(network)
+            latency["decode"].observe(decode)
+            latency["convert"].observe(convert)
+
+    def reset(self) -> None:
+        """Forget all the recorded calls."""
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """The current metrics by "METHOD route"."""
+        with self._lock:
+            return {"{} {}".format(method, route): endpoint.snapshot()
+                    for (method, route), endpoint in sorted(self._endpoints.items())}
+
+    def to_prometheus(self, prefix: str = "plasticscm") -> str:
+        """The current metrics in the Prometheus text exposition format."""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+        lines = []
+        for name, kind, description, value in (
+                ("requests_total",       "counter", "Number of API calls.",
+                 lambda endpoint: endpoint.requests),
+                ("errors_total",         "counter", "Number of failed API calls.",
+                 lambda endpoint: endpoint.errors),
+                ("received_bytes_total", "counter", "Size of the response bodies.",
+                 lambda endpoint: endpoint.bytes_in),
+                ("sent_bytes_total",     "counter", "Size of the request bodies.",
+                 lambda endpoint: endpoint.bytes_out)):
+            lines.append("# HELP {}_{} {}".format(prefix, name, description))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for (method, route), endpoint in endpoints:
+                lines.append("{}_{}{{{}}} {}".format(prefix, name,
+                                                     self._labels(method, route),
+                                                     value(endpoint)))
+        name = "{}_call_duration_seconds".format(prefix)
+        lines.append("# HELP {} Duration of the API calls by phase.".format(name))
+        lines.append("# TYPE {} histogram".format(name))
+        for (method, route), endpoint in endpoints:
+            for phase, histogram in endpoint.latency.items():
+                labels = self._labels(method, route, phase=phase)
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                                 name, labels, "+Inf" if bound == float("inf") else bound,
+                                 cumulative))
+                lines.append("{}_sum{{{}}} {}".format(name, labels, histogram.sum))
+                lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(method: str, route: str, phase: Optional[str] = None) -> str:
+        labels = [("method", method), ("route", route)]
+        if phase is not None:
+            labels.append(("phase", phase))
+        return ",".join('{}="{}"'.format(label, value.replace("\\", "\\\\")
+                                                      .replace('"', '\\"')
+                                                      .replace("\n", "\\n"))
+                        for label, value in labels)
+
+
+#: The registry of the metrics of all the API calls.
+metrics = Metrics()
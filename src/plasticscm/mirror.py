@@ -0,0 +1,256 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Local SQLite mirror of repository metadata."""
+
+from typing   import Dict, Iterable, Optional, Union
+from pathlib  import Path
+from datetime import datetime
+import sqlite3
+
+from public import public
+
+from .index import _date_query
+
+_ = __doc__
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS branches (
+    repo              TEXT    NOT NULL,
+    id                INTEGER NOT NULL,
+    name              TEXT    NOT NULL,
+    parent_id         INTEGER,
+    last_changeset_id INTEGER,
+    comment           TEXT,
+    creation_date     TEXT,
+    guid              TEXT,
+    owner             TEXT,
+    PRIMARY KEY (repo, id)
+);
+CREATE INDEX IF NOT EXISTS branches_name ON branches (repo, name);
+CREATE INDEX IF NOT EXISTS branches_date ON branches (repo, creation_date);
+
+CREATE TABLE IF NOT EXISTS labels (
+    repo              TEXT    NOT NULL,
+    id                INTEGER NOT NULL,
+    name              TEXT    NOT NULL,
+    changeset_id      INTEGER NOT NULL,
+    comment           TEXT,
+    creation_date     TEXT,
+    branch_id         INTEGER,
+    owner             TEXT,
+    PRIMARY KEY (repo, id)
+);
+CREATE INDEX IF NOT EXISTS labels_name      ON labels (repo, name);
+CREATE INDEX IF NOT EXISTS labels_changeset ON labels (repo, changeset_id);
+
+CREATE TABLE IF NOT EXISTS changesets (
+    repo              TEXT    NOT NULL,
+    id                INTEGER NOT NULL,
+    parent_id         INTEGER,
+    comment           TEXT,
+    creation_date     TEXT,
+    guid              TEXT,
+    branch_id         INTEGER,
+    branch_name       TEXT,
+    owner             TEXT,
+    PRIMARY KEY (repo, id)
+);
+CREATE INDEX IF NOT EXISTS changesets_branch ON changesets (repo, branch_name);
+CREATE INDEX IF NOT EXISTS changesets_date   ON changesets (repo, creation_date);
+CREATE INDEX IF NOT EXISTS changesets_owner  ON changesets (repo, owner);
+
+CREATE TABLE IF NOT EXISTS revisions (
+    repo              TEXT    NOT NULL,
+    item_path         TEXT    NOT NULL,
+    revision_id       INTEGER NOT NULL,
+    type              TEXT,
+    changeset_id      INTEGER,
+    branch_name       TEXT,
+    comment           TEXT,
+    creation_date     TEXT,
+    owner             TEXT,
+    PRIMARY KEY (repo, item_path, revision_id)
+);
+CREATE INDEX IF NOT EXISTS revisions_changeset ON revisions (repo, changeset_id);
+CREATE INDEX IF NOT EXISTS revisions_owner     ON revisions (repo, owner);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    repo              TEXT    NOT NULL,
+    kind              TEXT    NOT NULL,
+    watermark         TEXT    NOT NULL,
+    PRIMARY KEY (repo, kind)
+);
+"""
+
+
+@public
+class Mirror:
+    """Local SQLite mirror of branches, labels, changesets and revision history.
+
+    Every sync asks the server only for the objects newer than the
+    watermark stored by the previous one (with the 'cm find' query syntax),
+    so analytical queries run locally against an up-to-date database.
+    Dates are stored as ISO 8601 strings.
+    """
+
+    def __init__(self, plastic, db_path: Union[str, Path] = ":memory:"):
+        """Init
+
+        Args:
+            plastic: The PlasticSCM API wrapper.
+            db_path: The path of the SQLite database (default: in-memory).
+        """
+        self._plastic = plastic
+        self._db = sqlite3.connect(str(db_path))
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def __enter__(self):
+        """Enter the runtime context (the mirror itself)."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the database on exit."""
+        self.close()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The underlying database connection."""
+        return self._db
+
+    def execute(self, sql: str, parameters: Iterable = ()) -> sqlite3.Cursor:
+        """Run an (analytical) SQL query against the mirror.
+
+        Args:
+            sql:        The SQL statement.
+            parameters: The parameters of the statement.
+
+        Returns:
+            The cursor of the results.
+        """
+        return self._db.execute(sql, tuple(parameters))
+
+    def sync(self, repo_name: str) -> Dict[str, int]:
+        """Fetch the branches, labels and changesets created since the last sync.
+
+        Args:
+            repo_name: The name of the repository.
+
+        Returns:
+            The numbers of the fetched objects per kind
+            ("branches", "labels", "changesets").
+        """
+        with self._db:
+            return {
+                "branches":   self._sync_branches(repo_name),
+                "labels":     self._sync_labels(repo_name),
+                "changesets": self._sync_changesets(repo_name),
+            }
+
+    def sync_history(self, repo_name: str, item_paths: Iterable[str], *,
+                     branch_name: str = "/main") -> int:
+        """Fetch (and replace) the revision history of items in a branch.
+
+        Args:
+            repo_name:   The name of the repository.
+            item_paths:  The paths of the items.
+            branch_name: The name of the branch (default: "/main").
+
+        Returns:
+            The number of the fetched revision history items.
+        """
+        plastic = self._plastic
+        count = 0
+        with self._db:
+            for item_path in item_paths:
+                history = plastic.get_item_revision_history_in_branch(repo_name,
+                                                                      branch_name, item_path)
+                self._db.execute("DELETE FROM revisions WHERE repo = ? AND item_path = ?",
+                                 (repo_name, item_path))
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO revisions VALUES (?,?,?,?,?,?,?,?,?)",
+                    ((repo_name, item_path, rhitem.revision_id, rhitem.type,
+                      rhitem.changeset_id, rhitem.branch_name, rhitem.comment,
+                      self._date(rhitem.creation_date), self._owner(rhitem.owner))
+                     for rhitem in history))
+                count += len(history)
+        return count
+
+    def watermark(self, repo_name: str, kind: str) -> Optional[str]:
+        """The watermark of the last sync of a kind of objects.
+
+        Args:
+            repo_name: The name of the repository.
+            kind:      "branches", "labels" or "changesets".
+        """
+        row = self._db.execute("SELECT watermark FROM sync_state WHERE repo = ? AND kind = ?",
+                               (repo_name, kind)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_watermark(self, repo_name: str, kind: str, watermark: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO sync_state VALUES (?,?,?)",
+                         (repo_name, kind, watermark))
+
+    def _sync_branches(self, repo_name: str) -> int:
+        watermark = self.watermark(repo_name, "branches")
+        query = (_date_query("date", datetime.fromisoformat(watermark))
+                 if watermark is not None else None)
+        branches = self._plastic.get_branches(repo_name, query=query)
+        self._db.executemany(
+            "INSERT OR REPLACE INTO branches VALUES (?,?,?,?,?,?,?,?,?)",
+            ((repo_name, branch.id, branch.name, branch.parent_id,
+              branch.last_changeset_id, branch.comment, self._date(branch.creation_date),
+              str(branch.guid), self._owner(branch.owner))
+             for branch in branches))
+        last_date = max((self._date(branch.creation_date) for branch in branches
+                         if branch.creation_date is not None), default=None)
+        if last_date is not None:
+            self._set_watermark(repo_name, "branches", last_date)
+        return len(branches)
+
+    def _sync_labels(self, repo_name: str) -> int:
+        watermark = self.watermark(repo_name, "labels")
+        query = "id > {}".format(watermark) if watermark is not None else None
+        labels = self._plastic.get_labels(repo_name, query=query)
+        self._db.executemany(
+            "INSERT OR REPLACE INTO labels VALUES (?,?,?,?,?,?,?,?)",
+            ((repo_name, label.id, label.name, label.changeset_id, label.comment,
+              self._date(label.creation_date), label.branch.id, self._owner(label.owner))
+             for label in labels))
+        if labels:
+            self._set_watermark(repo_name, "labels", str(max(label.id for label in labels)))
+        return len(labels)
+
+    def _sync_changesets(self, repo_name: str) -> int:
+        watermark = self.watermark(repo_name, "changesets")
+        query = "id > {}".format(watermark) if watermark is not None else None
+        changesets = self._plastic.get_changesets(repo_name, query=query)
+        self._db.executemany(
+            "INSERT OR REPLACE INTO changesets VALUES (?,?,?,?,?,?,?,?,?)",
+            ((repo_name, chset.id, chset.parent_id, chset.comment,
+              self._date(chset.creation_date), str(chset.guid), chset.branch.id,
+              chset.branch.name, self._owner(chset.owner))
+             for chset in changesets))
+        if changesets:
+            # Branch heads move without the branches being re-fetched.
+            self._db.execute(
+                "UPDATE branches SET last_changeset_id = (SELECT MAX(id) FROM changesets "
+                "WHERE changesets.repo = branches.repo AND changesets.branch_id = branches.id) "
+                "WHERE repo = ? AND id IN (SELECT DISTINCT branch_id FROM changesets "
+                "WHERE repo = ? AND id > ?)",
+                (repo_name, repo_name, int(watermark) if watermark is not None else -1))
+            self._set_watermark(repo_name, "changesets",
+                                str(max(chset.id for chset in changesets)))
+        return len(changesets)
+
+    @staticmethod
+    def _date(date: Optional[datetime]) -> Optional[str]:
+        return date.isoformat() if date is not None else None
+
+    @staticmethod
+    def _owner(owner) -> Optional[str]:
+        return owner.name if owner is not None else None
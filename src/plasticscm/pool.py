@@ -0,0 +1,198 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Clients of many PlasticSCM servers."""
+
+from typing  import Any, Dict, List, Tuple, Iterator, Optional
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from public import public
+
+from ._plastic import Plastic
+from . import config
+
+_ = __doc__
+
+
+@public
+class PlasticPool:
+    """Clients of all configured PlasticSCM servers.
+
+    Calls for a repository are dispatched by its full name ("repo@server",
+    as in Repository.full_name) and queries can be fanned out to all the
+    servers concurrently. Clients of the same host share one pool of
+    connections.
+    """
+
+    @classmethod
+    def from_config(cls,
+                    plastic_ids: Optional[List[str]] = None,
+                    config_files: Optional[List[str]] = None, *,
+                    workers: int = 8) -> 'PlasticPool':
+        """Create a pool of clients from configuration files.
+
+        Besides 'url', a section can specify the 'server' option: the name
+        of the PlasticSCM server (as in Repository.server) it serves.
+        Sections with the same connection settings share one client. The
+        repositories without a server are served by the [global] default
+        section (if it is selected, otherwise by the first one).
+
+        Args:
+            plastic_ids:  IDs of the configuration sections (default: all
+                          sections with an url).
+            config_files: List of paths to configuration files.
+            workers:      The maximal number of concurrent requests of a
+                          fan-out (default: 8).
+
+        Returns:
+            A pool of PlasticSCM API wrappers.
+
+        Raises:
+            plasticscm.config.PlasticDataError: If the configuration is not correct.
+        """
+        if config_files is not None:
+            config_files = [Path(file) for file in config_files]
+        if plastic_ids is None:
+            plastic_ids = config.PlasticConfigParser.plastic_ids(config_files)
+        clients, servers, shared = {}, {}, {}
+        for plastic_id in plastic_ids:
+            config_parser = config.PlasticConfigParser(plastic_id=plastic_id,
+                                                       config_files=config_files)
+            args = (config_parser.url, config_parser.http_username,
+                    config_parser.http_password, config_parser.ssl_verify,
+                    config_parser.timeout, config_parser.api_version,
+                    tuple(config_parser.replica_urls))
+            client = shared.get(args)
+            if client is None:
+                client = shared[args] = Plastic(config_parser.url,
+                                                http_username=config_parser.http_username,
+                                                http_password=config_parser.http_password,
+                                                ssl_verify=config_parser.ssl_verify,
+                                                timeout=config_parser.timeout,
+                                                api_version=config_parser.api_version,
+                                                replica_urls=config_parser.replica_urls)
+            clients[plastic_id] = client
+            if config_parser.server is not None:
+                servers[config_parser.server] = plastic_id
+        default = config.PlasticConfigParser.default_id(config_files)
+        return cls(clients, servers=servers,
+                   default=default if default in clients else None, workers=workers)
+
+    def __init__(self, clients: Dict[str, Plastic], *,
+                 servers: Optional[Dict[str, str]] = None,
+                 default: Optional[str] = None, workers: int = 8):
+        """Init
+
+        Args:
+            clients: The clients by their IDs (the same client can serve
+                     many IDs).
+            servers: The IDs of the clients by the names of the PlasticSCM
+                     servers they serve.
+            default: The ID of the client of repositories without a server
+                     (default: the first one).
+            workers: The maximal number of concurrent requests of a fan-out
+                     (default: 8).
+        """
+        if not clients:
+            raise ValueError("The pool needs at least one client")
+        self._clients = dict(clients)
+        self._servers = {server.lower(): plastic_id
+                         for server, plastic_id in (servers or {}).items()}
+        self._default = default if default is not None else next(iter(self._clients))
+        self._workers = workers
+
+    def __len__(self) -> int:
+        """Number of the clients' IDs."""
+        return len(self._clients)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the clients' IDs."""
+        return iter(self._clients)
+
+    def __getitem__(self, plastic_id: str) -> Plastic:
+        """The client of an ID."""
+        return self._clients[plastic_id]
+
+    def client(self, repo_name: str) -> Tuple[Plastic, str]:
+        """The client serving a repository.
+
+        Args:
+            repo_name: The name of the repository, either full
+                       ("repo@server") or short (served by the default client).
+
+        Returns:
+            The client and the short name of the repository.
+
+        Raises:
+            KeyError: If no client serves the server of the repository.
+        """
+        name, _, server = repo_name.partition("@")
+        if not server:
+            return self._clients[self._default], name
+        server = server.lower()
+        plastic_id = self._servers.get(server)
+        if plastic_id is None:
+            hostname = server.rpartition(":")[0] or server
+            plastic_id = next((plastic_id for plastic_id in self._clients
+                               if plastic_id.lower() in (server, hostname)), None)
+        if plastic_id is None:
+            raise KeyError("No client for the server '{}'".format(server))
+        return self._clients[plastic_id], name
+
+    def dispatch(self, method: str, repo_name: str, *args, **kwargs) -> Any:
+        """Call a repository method on the client serving the repository.
+
+        Args:
+            method:    The name of the Plastic method
+                       (e.g. "get_branches").
+            repo_name: The full name of the repository ("repo@server").
+            args:      The remaining positional arguments of the method.
+            kwargs:    The keyword arguments of the method.
+
+        Returns:
+            The result of the method.
+        """
+        client, repo_name = self.client(repo_name)
+        return getattr(client, method)(repo_name, *args, **kwargs)
+
+    def fan_out(self, method: str, *args, **kwargs) -> Dict[str, Any]:
+        """Call a method on all the clients concurrently.
+
+        Args:
+            method: The name of the Plastic method (e.g. "get_repositories").
+            args:   The positional arguments of the method.
+            kwargs: The keyword arguments of the method.
+
+        Returns:
+            The results of the method by the clients' IDs (a client serving
+            many IDs is called once).
+        """
+        futures = self.__fan_out(method, *args, **kwargs)
+        return {plastic_id: futures[id(client)].result()
+                for plastic_id, client in self._clients.items()}
+
+    def query(self, method: str, *args, **kwargs) -> Tuple:
+        """Call a query method on all the clients concurrently and merge the results.
+
+        Args:
+            method: The name of a Plastic method returning a tuple
+                    (e.g. "get_repositories").
+            args:   The positional arguments of the method.
+            kwargs: The keyword arguments of the method.
+
+        Returns:
+            The concatenated results of the method (in the clients' order,
+            once per client).
+        """
+        return tuple(item for future in self.__fan_out(method, *args, **kwargs).values()
+                     for item in future.result())
+
+    def __fan_out(self, method: str, *args, **kwargs) -> Dict[int, Future]:
+        # The calls of the distinct clients by their id().
+        clients = {id(client): client for client in self._clients.values()}
+        with ThreadPoolExecutor(max_workers=max(1, min(self._workers,
+                                                       len(clients)))) as executor:
+            futures = {key: executor.submit(getattr(client, method), *args, **kwargs)
+                       for key, client in clients.items()}
+        return futures
@@ -0,0 +1,350 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Typed builder of the 'cm find' queries with server-side filtering."""
+
+from typing   import Any, Callable, Iterator, Tuple, Optional, Union
+from datetime import datetime, date, timezone
+from uuid     import UUID
+import functools
+import abc
+import re
+
+from public import public
+
+_ = __doc__
+
+# Date format of the 'cm find' query syntax (of UTC times, as the dates
+# of the model; naive dates and datetimes are taken as UTC).
+DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+# The attributes of the model objects of the query fields (for local evaluation).
+_ATTRIBUTES = {
+    "id":        lambda obj: obj.id,
+    "name":      lambda obj: obj.name,
+    "date":      lambda obj: obj.creation_date,
+    "owner":     lambda obj: obj.owner.name if obj.owner is not None else None,
+    "comment":   lambda obj: obj.comment,
+    "guid":      lambda obj: obj.guid,
+    "parent":    lambda obj: obj.parent_id,
+    "branch":    lambda obj: obj.branch.name,
+    "changeset": lambda obj: obj.changeset_id,
+}
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, bool):
+        raise TypeError("Not a query value: {!r}".format(value))
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, datetime):
+        return "'{}'".format(_utc(value).strftime(DATE_FORMAT))
+    if isinstance(value, date):
+        return "'{}'".format(value.strftime("%Y/%m/%d"))
+    if isinstance(value, UUID):
+        return "'{}'".format(value)
+    if isinstance(value, str):
+        if "'" in value:
+            raise ValueError("Quotes are not supported in query strings: {!r}".format(value))
+        return "'{}'".format(value)
+    raise TypeError("Not a query value: {!r}".format(value))
+
+
+def _utc(value: datetime) -> datetime:
+    # The (aware) UTC time of a datetime.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@functools.lru_cache(maxsize=256)
+def _like(pattern: str) -> re.Pattern:
+    # SQL-like wildcards: % matches any text, _ any character.
+    return re.compile("".join(".*" if char == "%" else "." if char == "_" else re.escape(char)
+                              for char in pattern), re.IGNORECASE | re.DOTALL)
+
+
+@public
+class Query(abc.ABC):
+    """A condition of a 'cm find' query.
+
+    Conditions are combined with & (and) and | (or); str() compiles them
+    to the query syntax. A query is also a predicate of the returned
+    objects: query(obj) evaluates it locally. Python predicates
+    (callables) can be combined with the conditions as well; such
+    queries are split by pushdown() (see also Plastic.find()).
+    """
+
+    __slots__ = ()
+
+    def __and__(self, other: Union["Query", Callable[[Any], bool]]) -> "Query":
+        """Both conditions."""
+        return _And((self, _query(other)))
+
+    def __rand__(self, other: Callable[[Any], bool]) -> "Query":
+        """Both conditions (a predicate & a query)."""
+        return _And((_query(other), self))
+
+    def __or__(self, other: Union["Query", Callable[[Any], bool]]) -> "Query":
+        """Any of the conditions."""
+        return _Or((self, _query(other)))
+
+    def __ror__(self, other: Callable[[Any], bool]) -> "Query":
+        """Any of the conditions (a predicate | a query)."""
+        return _Or((_query(other), self))
+
+    def __bool__(self):
+        """Queries have no truth value."""
+        raise TypeError("Queries are combined with & and |, not with 'and', 'or' "
+                        "or chained comparisons")
+
+    @abc.abstractmethod
+    def __call__(self, obj: Any) -> bool:
+        """Evaluate the query locally for a returned object."""
+
+    def __repr__(self):
+        """Convert to string (including the Python predicates)"""
+        return "<{} {}>".format(type(self).__name__, self._text(True))
+
+    def __str__(self):
+        """Compile to the query syntax"""
+        return self._text(False)
+
+    @abc.abstractmethod
+    def _text(self, local: bool) -> str:
+        """The text of the query (with the Python predicates if local)."""
+
+
+class _Comparison(Query):
+
+    __slots__ = ("field", "operator", "value")
+
+    _operators = {
+        "=":    lambda actual, value: actual == value,
+        "!=":   lambda actual, value: actual != value,
+        "<":    lambda actual, value: actual is not None and actual < value,
+        "<=":   lambda actual, value: actual is not None and actual <= value,
+        ">":    lambda actual, value: actual is not None and actual > value,
+        ">=":   lambda actual, value: actual is not None and actual >= value,
+        "like": lambda actual, value: (actual is not None
+                                       and _like(value).fullmatch(str(actual)) is not None),
+    }
+
+    def __init__(self, field: str, operator: str, value: Any):
+        _literal(value)  # validated early
+        self.field, self.operator, self.value = field, operator, value
+
+    def __call__(self, obj: Any) -> bool:
+        attribute = _ATTRIBUTES.get(self.field)
+        if attribute is None:
+            raise ValueError("The field {!r} can not be evaluated locally".format(self.field))
+        actual, value = attribute(obj), self.value
+        if isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)  # as by the server
+        if isinstance(value, datetime) and isinstance(actual, datetime):
+            actual, value = _utc(actual), _utc(value)
+        if isinstance(actual, UUID) and isinstance(value, str):
+            value = UUID(value)
+        return self._operators[self.operator](actual, value)
+
+    def _text(self, local: bool) -> str:
+        return "{} {} {}".format(self.field, self.operator, _literal(self.value))
+
+
+class _And(Query):
+
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: Tuple[Query, ...]):
+        self.parts = tuple(part for query in parts
+                           for part in (query.parts if isinstance(query, _And) else (query,)))
+
+    def __call__(self, obj: Any) -> bool:
+        return all(part(obj) for part in self.parts)
+
+    def _text(self, local: bool) -> str:
+        return " and ".join("({})".format(part._text(local)) if isinstance(part, _Or)
+                            else part._text(local) for part in self.parts)
+
+
+class _Or(Query):
+
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: Tuple[Query, ...]):
+        self.parts = tuple(part for query in parts
+                           for part in (query.parts if isinstance(query, _Or) else (query,)))
+
+    def __call__(self, obj: Any) -> bool:
+        return any(part(obj) for part in self.parts)
+
+    def _text(self, local: bool) -> str:
+        return " or ".join(part._text(local) for part in self.parts)
+
+
+class _Local(Query):
+
+    __slots__ = ("predicate",)
+
+    def __init__(self, predicate: Callable[[Any], bool]):
+        self.predicate = predicate
+
+    def __call__(self, obj: Any) -> bool:
+        return bool(self.predicate(obj))
+
+    def _text(self, local: bool) -> str:
+        if not local:
+            raise ValueError("Python predicates can not be sent to the server "
+                             "(see pushdown())")
+        return "<{}>".format(getattr(self.predicate, "__name__", "predicate"))
+
+
+def _query(other: Union[Query, Callable[[Any], bool]]) -> Query:
+    if isinstance(other, Query):
+        return other
+    if callable(other):
+        return _Local(other)
+    raise TypeError("Not a query or a predicate: {!r}".format(other))
+
+
+@public
+class Field:
+    """A field of the 'cm find' queries (see Q)."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        """Init"""
+        self.name = name
+
+    def __eq__(self, value: Any) -> Query:  # type: ignore[override]
+        """The field is equal to the value."""
+        return _Comparison(self.name, "=", value)
+
+    def __ne__(self, value: Any) -> Query:  # type: ignore[override]
+        """The field is not equal to the value."""
+        return _Comparison(self.name, "!=", value)
+
+    def __lt__(self, value: Any) -> Query:
+        """The field is less than the value."""
+        return _Comparison(self.name, "<", value)
+
+    def __le__(self, value: Any) -> Query:
+        """The field is less than or equal to the value."""
+        return _Comparison(self.name, "<=", value)
+
+    def __gt__(self, value: Any) -> Query:
+        """The field is greater than the value."""
+        return _Comparison(self.name, ">", value)
+
+    def __ge__(self, value: Any) -> Query:
+        """The field is greater than or equal to the value."""
+        return _Comparison(self.name, ">=", value)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def like(self, pattern: str) -> Query:
+        """The field matches the pattern (% matches any text, _ any character)."""
+        return _Comparison(self.name, "like", pattern)
+
+    def between(self, low: Any, high: Any) -> Query:
+        """The field is in the (inclusive) range, e.g. of dates."""
+        return _And((self >= low, self <= high))
+
+    def __repr__(self):
+        """Convert to string"""
+        return "Q.{}".format(self.name)
+
+
+class _Fields:
+    """The fields of the 'cm find' queries: Q.id, Q.name, Q.date, Q.owner, ..."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Field:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return Field(name)
+
+    def __getitem__(self, name: str) -> Field:
+        return Field(name)
+
+
+public(Q=_Fields())
+
+
+@public
+def predicate(func: Callable[[Any], bool]) -> Query:
+    """A Python predicate of the returned objects as a (local only) query."""
+    return _Local(func)
+
+
+@public
+def pushdown(query: Union[Query, Callable[[Any], bool]]) \
+        -> Tuple[Optional[Query], Optional[Query]]:
+    """Split a query into its server-side and local parts.
+
+    For every object: query(obj) == server(obj) and local(obj). Python
+    predicates are evaluated locally; the conditions of the 'cm find'
+    syntax are sent to the server whenever they narrow the results down
+    (all the parts of an and, an or if all its parts do), so only the
+    necessary objects are downloaded.
+
+    Args:
+        query: The query (or a Python predicate).
+
+    Returns:
+        The server-side part (None if nothing can be sent to the server)
+        and the local part (None if all was sent to the server).
+
+    Raises:
+        ValueError: If the local part would need a field which can not be
+                    evaluated locally (e.g. an or of such a condition and
+                    a Python predicate).
+    """
+    query = _query(query)
+    if isinstance(query, _Local):
+        return None, query
+    if isinstance(query, _And):
+        servers, locals_ = [], []
+        for part in query.parts:
+            server, local = pushdown(part)
+            if server is not None:
+                servers.append(server)
+            if local is not None:
+                locals_.append(local)
+        return (_And(tuple(servers)) if len(servers) > 1 else servers[0] if servers else None,
+                _And(tuple(locals_)) if len(locals_) > 1 else locals_[0] if locals_ else None)
+    if isinstance(query, _Or):
+        splits = [pushdown(part) for part in query.parts]
+        if any(server is None for server, _ in splits):
+            return None, _local_only(query)
+        if all(local is None for _, local in splits):
+            return query, None
+        # Every part narrows the results down on the server. If only one
+        # part is not fully sent, an object returned by the server which
+        # does not match the other parts matches its server-side part, so
+        # only its local part is checked; otherwise the whole condition is.
+        partial = [part for part, (_, local) in zip(query.parts, splits) if local is not None]
+        local = (_Or(tuple(part if local is None else local
+                           for part, (_, local) in zip(query.parts, splits)))
+                 if len(partial) == 1 else query)
+        return _Or(tuple(server for server, _ in splits)), _local_only(local)
+    return query, None
+
+
+def _local_only(query: Query) -> Query:
+    # The query if it can be evaluated locally.
+    for field in _fields(query):
+        if field not in _ATTRIBUTES:
+            raise ValueError("The field {!r} can not be evaluated locally, "
+                             "so {!r} can not be split".format(field, query))
+    return query
+
+
+def _fields(query: Query) -> Iterator[str]:
+    if isinstance(query, _Comparison):
+        yield query.field
+    elif isinstance(query, (_And, _Or)):
+        for part in query.parts:
+            yield from _fields(part)
@@ -1,121 +1,558 @@
 # Copyright (c) 2019 Adam Karpierz
 # SPDX-License-Identifier: Zlib
 
+from typing import Any, Dict, List, Tuple, Optional, Pattern
+from urllib.parse import urlsplit, quote, unquote
+import string
+import functools
+import inspect
+import logging
+import threading
+import time
+import re
+
 from public import public
 import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from .metrics import metrics
+from .tracing import Span
+
+_local = threading.local()  # the span of the current API call (of the thread)
+_log = logging.getLogger(__name__)
+
+# The characters of a path segment not needing percent-encoding (RFC 3986 pchar).
+_PCHAR = "!$&'()*+,;=:@"
+_is_safe_segment = re.compile(r"[\w.~!$&'()*+,;=:@-]*", re.ASCII).fullmatch
+_is_safe_path    = re.compile(r"[\w.~!$&'()*+,;=:@/-]*", re.ASCII).fullmatch
+
+
+@functools.lru_cache(maxsize=4096, typed=True)  # names repeat a lot
+def _segment(value: Any) -> str:
+    # A percent-encoded path segment.
+    value = str(value)
+    return value if _is_safe_segment(value) else quote(value, safe=_PCHAR)
+
+
+@functools.lru_cache(maxsize=4096, typed=True)
+def _path(value: Any) -> str:
+    # A percent-encoded path (without leading and trailing slashes).
+    value = str(value).strip("/")
+    return value if _is_safe_path(value) else quote(value, safe=_PCHAR + "/")
+
+
+@public
+class Route(str):
+    """A route template of the API, e.g. "/repos/{repo_name}/branches/{branch_name}".
+
+    A route is equal to its template. The template is compiled once into
+    build(**fields), which makes the url path of the values of the fields.
+    The values are percent-encoded; those of the PATH_FIELDS are stripped of
+    the leading and trailing slashes and keep the inner ones.
+    """
+
+    PATH_FIELDS = frozenset(("branch_name", "item_path", "revision_spec"))
+
+    def __new__(cls, template: str, method: str = "GET", endpoint: Optional[str] = None):
+        """Init
+
+        Args:
+            template: The route template.
+            method:   The HTTP method.
+            endpoint: The qualified name of the API method.
+        """
+        self = super().__new__(cls, template)
+        self.template = template
+        self.method   = method
+        self.endpoint = endpoint
+        parts = list(string.Formatter().parse(template))
+        self.fields: Tuple[str, ...] = tuple(field for _, field, _, _ in parts
+                                             if field is not None)
+        if not all(field.isidentifier() for field in self.fields):
+            raise ValueError("Invalid route template: {!r}".format(template))
+        terms = []
+        for literal, field, _, _ in parts:
+            if literal:
+                terms.append(repr(literal))
+            if field is not None:
+                encode = "_path" if field in self.PATH_FIELDS else "_segment"
+                terms.append("{}({})".format(encode, field))
+        source = "def build({}):\n    return {}\n".format(
+                 "*, " + ", ".join(self.fields) if self.fields else "",
+                 " + ".join(terms) or "''")
+        namespace = {"_path": _path, "_segment": _segment}
+        exec(source, namespace)
+        self.build = namespace["build"]  # the compiled url path builder
+        self.__pattern: Optional[Pattern] = None
+        return self
+
+    def match(self, path: str) -> Optional[Dict[str, str]]:
+        """The (decoded) values of the fields of a url path of the route.
+
+        Args:
+            path: The url path relative to the API endpoint.
+
+        Returns:
+            The values by the field names or None if the path does not
+            match the route.
+        """
+        if self.__pattern is None:
+            regex = ""
+            for literal, field, _, _ in string.Formatter().parse(self.template):
+                regex += re.escape(literal)
+                if field is not None:
+                    regex += "(?P<{}>{})".format(field, ".+?" if field in self.PATH_FIELDS
+                                                 else "[^/]+")
+            self.__pattern = re.compile(regex + "$")
+        match = self.__pattern.match(path)
+        if match is None:
+            return None
+        return {field: unquote(value) for field, value in match.groupdict().items()}
+
+    def __repr__(self):
+        """Convert to string"""
+        return "<Route {} {}>".format(self.method, self.template)
 
 
 @public
 class REST:
 
+    __host_sessions: Dict[Tuple[str, str], requests.Session] = {}
+    __host_sessions_lock = threading.Lock()
+    __mounted: List[Tuple[str, BaseAdapter]] = []
+    __routes:  List[Route] = []
+
+    @classmethod
+    def routes(cls) -> Tuple[Route, ...]:
+        """All the routes of the API methods (in the order of definition)."""
+        return tuple(cls.__routes)
+
+    @classmethod
+    def resolve(cls, method: str, path: str) -> Optional[Tuple[Route, Dict[str, str]]]:
+        """The route of a request and the values of its fields.
+
+        Args:
+            method: The HTTP method.
+            path:   The url path relative to the API endpoint (e.g. "/repos/foo").
+
+        Returns:
+            The (route, fields) or None if no route matches.
+        """
+        method = method.upper()
+        # The most specific (with the longest literal parts) routes first.
+        routes = sorted((route for route in cls.__routes if route.method == method),
+                        key=lambda route: len(re.sub(r"\{\w+\}", "", route)), reverse=True)
+        for route in routes:
+            fields = route.match(path)
+            if fields is not None:
+                return route, fields
+        return None
+
+    @classmethod
+    def __route(cls, func, method: str, url: str) -> Route:
+        route = Route(url, method, "{}.{}".format(func.__module__, func.__qualname__))
+        cls.__routes.append(route)
+        return route
+
+    @staticmethod
+    def session(pool_maxsize: int = 32) -> requests.Session:
+        """Create a session with a pool of reusable (thread-safe) connections."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        session.mount("http://",  adapter)
+        session.mount("https://", adapter)
+        for prefix, mounted in REST.__mounted:
+            session.mount(prefix, mounted)
+        return session
+
+    @classmethod
+    def mount(cls, prefix: str, adapter: BaseAdapter) -> None:
+        """Mount a transport adapter on all (current and future) host sessions.
+
+        Args:
+            prefix:  The url prefix handled by the adapter (e.g. "http://").
+            adapter: The transport adapter.
+        """
+        with cls.__host_sessions_lock:
+            cls.__mounted.append((prefix, adapter))
+            for session in cls.__host_sessions.values():
+                session.mount(prefix, adapter)
+
+    @classmethod
+    def unmount(cls, adapter: BaseAdapter) -> None:
+        """Unmount a transport adapter mounted by mount()."""
+        with cls.__host_sessions_lock:
+            prefixes = [prefix for prefix, mounted in cls.__mounted if mounted is adapter]
+            cls.__mounted[:] = [(prefix, mounted) for prefix, mounted in cls.__mounted
+                                if mounted is not adapter]
+            # The default (pooled) transport and the still mounted adapters.
+            default = cls.session()
+            for session in cls.__host_sessions.values():
+                for prefix in prefixes:
+                    if session.adapters.get(prefix) is adapter:
+                        del session.adapters[prefix]
+                for prefix, mounted in default.adapters.items():
+                    if prefix not in session.adapters:
+                        session.mount(prefix, mounted)
+
+    @classmethod
+    def host_session(cls, url: str) -> requests.Session:
+        """The session (pool of connections) shared by all clients of a host."""
+        parts = urlsplit(url)
+        key = (parts.scheme.lower(), parts.netloc.lower())
+        with cls.__host_sessions_lock:
+            session = cls.__host_sessions.get(key)
+            if session is None:
+                session = cls.__host_sessions[key] = cls.session()
+            return session
+
+    @staticmethod
+    def is_transient(exc: Exception) -> bool:
+        """Whether a failed request is worth retrying."""
+        if isinstance(exc, requests.HTTPError):
+            return exc.response is not None and exc.response.status_code >= 500
+        return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
     @staticmethod
-    def __request(method: str, url: str, **kwargs):
+    def __request(method: str, url: str, *, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.request(method, url, **kwargs)
+        response = (session or requests).request(method, url, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __get(url: str, *args, **kwargs):
+    def __get(url: str, *args, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.get(url, *args, **kwargs)
+        response = (session or requests).get(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __options(url: str, *args, **kwargs):
+    def __options(url: str, *args, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.options(url, *args, **kwargs)
+        response = (session or requests).options(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __head(url: str, *args, **kwargs):
+    def __head(url: str, *args, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.head(url, *args, **kwargs)
+        response = (session or requests).head(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __put(url: str, *args, **kwargs):
+    def __put(url: str, *args, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.put(url, *args, **kwargs)
+        response = (session or requests).put(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __post(url: str, *args, **kwargs):
+    def __post(url: str, *args, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.post(url, *args, **kwargs)
+        response = (session or requests).post(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __patch(url: str, *args, **kwargs):
+    def __patch(url: str, *args, session=None, **kwargs):
         # response.status_code == 200
-        response = requests.patch(url, *args, **kwargs)
+        response = (session or requests).patch(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
     @staticmethod
-    def __delete(url: str, *args, **kwargs):
+    def __delete(url: str, *args, session=None, **kwargs):
         # response.status_code == 204
-        response = requests.delete(url, *args, **kwargs)
+        response = (session or requests).delete(url, *args, **kwargs)
         response.raise_for_status()
         return response
 
+    @staticmethod
+    def __timed(rest):
+        # The network (and JSON decode) time of a request of an API call.
+        @functools.wraps(rest)
+        def action(*args, **kwargs):
+            span = getattr(_local, "span", None)
+            if span is None:
+                return rest(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                response = rest(*args, **kwargs)
+            except requests.HTTPError as exc:
+                if exc.response is not None:
+                    span.account(exc.response, False)
+                raise
+            finally:
+                span.network += time.perf_counter() - start
+            span.account(response, bool(kwargs.get("stream")))
+            json = response.json
+
+            def timed_json(**kwargs):
+                start = time.perf_counter()
+                try:
+                    return json(**kwargs)
+                finally:
+                    span.decode += time.perf_counter() - start
+
+            response.json = timed_json
+            return response
+
+        return action
+
+    @staticmethod
+    def __instrument(func, method: str, url: str):
+        # Records the metrics and reports to the tracing hooks every call of an API method.
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            hooks = self._hooks
+            if not hooks and not metrics.enabled:
+                return func(self, *args, **kwargs)
+            params = None
+            if hooks:
+                params = signature.bind(self, *args, **kwargs).arguments
+                del params["self"]
+            span = Span(method, url, params)
+            outer, _local.span = getattr(_local, "span", None), span
+            span.start_time = time.time()
+            started = []  # the hooks to be ended
+            start = time.perf_counter()
+            try:
+                for hook in hooks:
+                    try:
+                        hook.on_start(span)
+                    except Exception:
+                        _log.exception("Tracing hook %r failed to start", hook)
+                    else:
+                        started.append(hook)
+                start = time.perf_counter()
+                result = func(self, *args, **kwargs)
+            except BaseException as exc:
+                span.error = exc
+                raise
+            else:
+                if isinstance(result, (tuple, list)):
+                    span.count = len(result)
+                return result
+            finally:
+                span.duration = elapsed = time.perf_counter() - start
+                _local.span = outer
+                # Reading a streamed body is a part of the network time.
+                if span.streamed:
+                    span.network = elapsed - span.decode
+                span.convert = max(elapsed - span.network - span.decode, 0.0)
+                if metrics.enabled:
+                    metrics.record(method, url, network=span.network, decode=span.decode,
+                                   convert=span.convert, bytes_in=span.bytes_in,
+                                   bytes_out=span.bytes_out, error=span.error is not None)
+                for hook in reversed(started):
+                    try:
+                        hook.on_end(span)
+                    except Exception:
+                        _log.exception("Tracing hook %r failed to end", hook)
+        return wrapper
+
     @staticmethod
     def REQUEST(method: str, url: str, rest=__request):
         def decorate(func):
-            func.REST = (method, url, rest)
+            route  = REST.__route(func, method.upper(), url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (method, route, action)
             return func
         return decorate
 
     @staticmethod
     def GET(url: str, rest=__get):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "GET", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
 
     @staticmethod
     def OPTIONS(url: str, rest=__options):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "OPTIONS", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
 
     @staticmethod
     def HEAD(url: str, rest=__head):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "HEAD", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
 
     @staticmethod
     def PUT(url: str, rest=__put):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "PUT", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
 
     @staticmethod
     def POST(url: str, rest=__post):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "POST", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
 
     @staticmethod
     def PATCH(url: str, rest=__patch):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "PATCH", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
 
     @staticmethod
     def DELETE(url: str, rest=__delete):
         def decorate(func):
-            func.REST = (url, rest)
+            route  = REST.__route(func, "DELETE", url)
+            action = REST.__timed(rest)
+            func = REST.__instrument(func, route.method, route)
+            func.REST = (route, action)
             return func
         return decorate
+
+
+@public
+class ReplicaSession:
+    """Routes repository reads to the lowest-latency healthy replica.
+
+    Only the GET requests of the repository routes (/repos/...) can be
+    served by replicas; the workspaces (/wkspaces/...) are local to the
+    primary server. The latency of every base url (the primary included) is measured with
+    an exponentially weighted moving average of its response times.
+    Replicas failing with connection errors or server errors are skipped
+    for retry_after seconds and the request falls back to the next
+    candidate. All other requests always go to the primary.
+    """
+
+    def __init__(self, primary_url: str, replica_urls: List[str], *,
+                 alpha: float = 0.2, retry_after: float = 30.0):
+        """Init
+
+        Args:
+            primary_url:  The base url of the primary server.
+            replica_urls: The base urls of the read replicas.
+            alpha:        The weight of a new response time in the average
+                          (default: 0.2).
+            retry_after:  How long an unhealthy url is skipped in seconds
+                          (default: 30).
+        """
+        self._primary = primary_url.rstrip("/")
+        self._bases = list(dict.fromkeys([self._primary]
+                                         + [url.rstrip("/") for url in replica_urls]))
+        self._sessions = {base: REST.host_session(base) for base in self._bases}
+        self._latency: Dict[str, Optional[float]] = dict.fromkeys(self._bases)
+        self._down_until: Dict[str, float] = dict.fromkeys(self._bases, 0.0)
+        self._alpha = alpha
+        self._retry_after = retry_after
+        self._lock = threading.Lock()
+
+    @property
+    def latencies(self) -> Dict[str, Optional[float]]:
+        """The average response times (in seconds) of the base urls."""
+        with self._lock:
+            return dict(self._latency)
+
+    def select(self, exclude: Tuple[str, ...] = ()) -> Optional[str]:
+        """The best base url for a read.
+
+        Not yet measured urls come first, then the healthy one with the
+        lowest average latency.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [base for base in self._bases
+                          if base not in exclude and self._down_until[base] <= now]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda base: (self._latency[base] is not None,
+                                                     self._latency[base] or 0.0))
+
+    def get(self, url: str, *args, **kwargs) -> requests.Response:
+        """Send a GET request to the best url able to serve it.
+
+        Args:
+            url:    The url of the request (on the primary server).
+            args:   The positional arguments of requests.Session.get().
+            kwargs: The keyword arguments of requests.Session.get().
+
+        Returns:
+            The response.
+        """
+        path = url[len(self._primary):] if url.startswith(self._primary) else None
+        if path is None or not _is_replicated(path):
+            return self._sessions[self._primary].get(url, *args, **kwargs)
+        tried, last = (), None
+        while True:
+            # The primary is the last resort, even if unhealthy.
+            base = self.select(tried) or (self._primary if self._primary not in tried
+                                          else None)
+            if base is None:
+                break
+            if tried:
+                span = getattr(_local, "span", None)
+                if span is not None:
+                    span.retries += 1
+            tried += (base,)
+            start = time.perf_counter()
+            try:
+                last = self._sessions[base].get(base + path, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self._mark_down(base)
+                last = exc
+                continue
+            if last.status_code >= 500:
+                self._mark_down(base)
+                continue
+            self._measure(base, time.perf_counter() - start)
+            return last
+        if isinstance(last, Exception):
+            raise last
+        return last
+
+    def __getattr__(self, name: str):
+        """Mutations (and everything else) go to the primary."""
+        return getattr(self._sessions[self._primary], name)
+
+    def _measure(self, base: str, elapsed: float) -> None:
+        with self._lock:
+            latency = self._latency[base]
+            self._latency[base] = (elapsed if latency is None else
+                                   self._alpha * elapsed + (1 - self._alpha) * latency)
+
+    def _mark_down(self, base: str) -> None:
+        with self._lock:
+            self._down_until[base] = time.monotonic() + self._retry_after
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_replicated(path: str) -> bool:
+    # Whether a GET of the url path (relative to the API endpoint) can be
+    # served by a replica: a known route of a repository.
+    path = path.partition("?")[0]
+    return ((path == "/repos" or path.startswith("/repos/"))
+            and REST.resolve("GET", path) is not None)
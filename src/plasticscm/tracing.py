@@ -0,0 +1,221 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Tracing hooks of the API calls."""
+
+from typing import Any, Dict, List, Tuple, NamedTuple, Optional, TYPE_CHECKING
+from collections import deque
+import threading
+import logging
+import io
+
+from public import public
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+_ = __doc__
+
+
+@public
+class Span:
+    """An API call, as seen by the tracing hooks.
+
+    The timings are in seconds; network, decode and convert are the parts
+    of the duration spent in HTTP requests, JSON decoding and model
+    conversion. Hooks can keep their own data (e.g. a tracer's span) in
+    the data dict.
+    """
+
+    __slots__ = ("method", "route", "params", "start_time", "duration",
+                 "network", "decode", "convert", "bytes_in", "bytes_out",
+                 "status", "retries", "error", "count", "streamed", "data")
+
+    def __init__(self, method: str, route: str, params: Optional[Dict[str, Any]] = None):
+        """Init"""
+        self.method: str = method          # The HTTP method
+        self.route:  str = route           # The route template
+        self.params: Optional[Dict[str, Any]] = params  # The arguments of the call
+        self.start_time: float = 0.0       # The time of the start (since the epoch)
+        self.duration:   float = 0.0
+        self.network:    float = 0.0
+        self.decode:     float = 0.0
+        self.convert:    float = 0.0
+        self.bytes_in:   int = 0           # The size of the response body
+        self.bytes_out:  int = 0           # The size of the request body
+        self.status: Optional[int] = None  # The HTTP status code of the last response
+        self.retries:    int = 0           # The number of repeated requests
+        self.error: Optional[BaseException] = None
+        self.count: Optional[int] = None   # The number of the returned elements
+        self.streamed:   bool = False
+        self.data: Dict[Any, Any] = {}
+
+    def account(self, response: "requests.Response", streamed: bool) -> None:
+        """Account for a received response."""
+        self.status = response.status_code
+        body = response.request.body if response.request is not None else None
+        if isinstance(body, (bytes, str)):
+            self.bytes_out += len(body)
+        if streamed:
+            self.streamed = True
+            self.bytes_in += int(response.headers.get("Content-Length") or 0)
+        else:
+            self.bytes_in += len(response.content or b"")
+
+    def __repr__(self):
+        """Convert to string"""
+        return "<Span {} {} status={} duration={:.6f}>".format(self.method, self.route,
+                                                               self.status, self.duration)
+
+
+@public
+class Hook:
+    """Base class of the tracing hooks (registered with Plastic.add_hook()).
+
+    Both methods are called in the thread making the call and should not
+    block. on_end() is called only if on_start() succeeded; the exceptions
+    of the hooks are logged (by the "plasticscm.rest" logger), they do
+    not affect the call nor the other hooks.
+    """
+
+    def on_start(self, span: Span) -> None:
+        """Called before an API call (only the method, route and params are set)."""
+
+    def on_end(self, span: Span) -> None:
+        """Called after an API call (also a failed one)."""
+
+
+@public
+class SlowCall(NamedTuple):
+    """An API call which exceeded the threshold of a SlowCallLog."""
+
+    method:      str
+    route:       str
+    params:      Optional[Dict[str, Any]]
+    duration:    float
+    network:     float
+    decode:      float
+    convert:     float
+    bytes_in:    int                  # The payload size
+    count:       Optional[int]        # The number of the returned elements
+    status:      Optional[int]
+    profile:     Optional[str]        # The cProfile statistics (most expensive first)
+    memory_peak: Optional[int]        # The peak of memory allocated during the call
+    memory_top:  Optional[List[str]]  # The biggest allocations alive at the end
+
+
+@public
+class SlowCallLog(Hook):
+    """Logs the API calls exceeding a duration threshold.
+
+    Every slow call is logged (with the route, payload size, element count
+    and the network/decode/convert breakdown) and kept in entries.
+    Optionally, calls are profiled with cProfile and/or tracemalloc and the
+    captures of the slow ones are kept too, attributing CPU and memory
+    spikes to the conversion functions. Both tools are global, so only one
+    call at a time is captured (by any log); they slow down calls considerably.
+    """
+
+    _capture_lock = threading.Lock()  # shared by all the logs
+
+    def __init__(self, threshold: float = 1.0, *,
+                 profile: bool = False, trace_memory: bool = False,
+                 max_entries: int = 100, logger: Optional[logging.Logger] = None,
+                 top: int = 20):
+        """Init
+
+        Args:
+            threshold:    The minimal duration of a logged call in seconds
+                          (default: 1).
+            profile:      Whether to capture cProfile statistics (default: False).
+            trace_memory: Whether to capture tracemalloc statistics (default: False).
+            max_entries:  The number of the kept slow calls (default: 100).
+            logger:       The logger (default: the "plasticscm.slow" logger).
+            top:          The number of reported functions and allocation
+                          sites (default: 20).
+        """
+        self.threshold = threshold
+        self._profile = profile
+        self._trace_memory = trace_memory
+        self._logger = logger or logging.getLogger("plasticscm.slow")
+        self._top = top
+        self._entries = deque(maxlen=max_entries)
+
+    @property
+    def entries(self) -> Tuple[SlowCall, ...]:
+        """The kept slow calls (the oldest first)."""
+        return tuple(self._entries)
+
+    def clear(self) -> None:
+        """Forget the kept slow calls."""
+        self._entries.clear()
+
+    def on_start(self, span: Span) -> None:
+        if not (self._profile or self._trace_memory):
+            return
+        if not self._capture_lock.acquire(blocking=False):
+            return
+        profiler = None
+        own_tracing = False
+        try:
+            if self._profile:
+                import cProfile
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:  # another profiler is active
+                    profiler = None
+            start_memory = 0
+            if self._trace_memory:
+                import tracemalloc
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    own_tracing = True
+                tracemalloc.reset_peak()
+                start_memory = tracemalloc.get_traced_memory()[0]
+            span.data[self] = (profiler, own_tracing, start_memory)
+        except BaseException:
+            # No capture: on_end() does not release anything.
+            if profiler is not None:
+                profiler.disable()
+            if own_tracing:
+                tracemalloc.stop()
+            self._capture_lock.release()
+            raise
+
+    def on_end(self, span: Span) -> None:
+        slow = span.duration >= self.threshold
+        profile = memory_peak = memory_top = None
+        capture = span.data.pop(self, None)
+        if capture is not None:
+            profiler, own_tracing, start_memory = capture
+            import tracemalloc
+            try:
+                if profiler is not None:
+                    profiler.disable()
+                    if slow:
+                        import pstats
+                        stream = io.StringIO()
+                        pstats.Stats(profiler, stream=stream).sort_stats(
+                            "cumulative").print_stats(self._top)
+                        profile = stream.getvalue()
+                if self._trace_memory:
+                    if slow:
+                        memory_peak = tracemalloc.get_traced_memory()[1] - start_memory
+                        memory_top = [str(stat) for stat in
+                                      tracemalloc.take_snapshot().statistics("lineno")
+                                      [:self._top]]
+                    if own_tracing:
+                        tracemalloc.stop()
+            finally:
+                self._capture_lock.release()
+        if not slow:
+            return
+        entry = SlowCall(span.method, span.route, span.params, span.duration,
+                         span.network, span.decode, span.convert, span.bytes_in,
+                         span.count, span.status, profile, memory_peak, memory_top)
+        self._entries.append(entry)
+        self._logger.warning("Slow call %s %s: %.3fs (network %.3fs, decode %.3fs, "
+                             "convert %.3fs), %d bytes, %s elements",
+                             entry.method, entry.route, entry.duration, entry.network,
+                             entry.decode, entry.convert, entry.bytes_in, entry.count)
@@ -0,0 +1,281 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Recording and replaying of the HTTP traffic of the API clients."""
+
+from typing import Any, Dict, List, Tuple, NamedTuple, Iterable, Optional, Union
+from datetime import timedelta
+from pathlib import Path
+import threading
+import base64
+import gzip
+import json
+import time
+import io
+
+from public import public
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .exceptions import PlasticReplayError
+from .rest import REST
+
+_ = __doc__
+
+TRAFFIC_FORMAT = 1
+
+# Not recorded request headers (credentials).
+REDACTED_HEADERS = ("Authorization", "Proxy-Authorization", "Cookie")
+# Not recorded response headers (the bodies are recorded decoded, so
+# Content-Length is rewritten to their size).
+_DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "set-cookie"}
+
+
+@public
+class Exchange(NamedTuple):
+    """A recorded request and its response."""
+
+    method:          str
+    url:             str
+    request_headers: Dict[str, str]
+    request_body:    Optional[bytes]
+    status:          int
+    reason:          str
+    headers:         Dict[str, str]
+    body:            bytes
+    elapsed:         float  # The response time in seconds
+    offset:          float  # The start since the beginning of the recording
+
+    @property
+    def key(self) -> Tuple[str, str, Optional[bytes]]:
+        """The key matching a request with its response."""
+        return (self.method, self.url, self.request_body)
+
+
+def _encode_body(body: Optional[bytes]) -> Any:
+    if body is None:
+        return None
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(body: Any) -> Optional[bytes]:
+    if body is None:
+        return None
+    if isinstance(body, dict):
+        return base64.b64decode(body["base64"])
+    return body.encode("utf-8")
+
+
+def _request_body(request: requests.PreparedRequest) -> Optional[bytes]:
+    body = request.body
+    if body is None or isinstance(body, bytes):
+        return body
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    raise TypeError("Streamed request bodies can not be recorded")
+
+
+@public
+def save_traffic(path: Union[str, Path], exchanges: Iterable[Exchange]) -> None:
+    """Save the recorded traffic.
+
+    The file is in the JSON lines format, gzip-compressed if its name ends
+    with '.gz'.
+
+    Args:
+        path:      The file path.
+        exchanges: The recorded requests and responses.
+    """
+    path = Path(path)
+    with (gzip.open(path, "wt", encoding="utf-8") if path.suffix == ".gz" else
+          path.open("wt", encoding="utf-8")) as file:
+        file.write(json.dumps({"format": TRAFFIC_FORMAT}) + "\n")
+        for exchange in exchanges:
+            entry = exchange._asdict()
+            entry["request_body"] = _encode_body(exchange.request_body)
+            entry["body"] = _encode_body(exchange.body)
+            file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+@public
+def load_traffic(path: Union[str, Path]) -> List[Exchange]:
+    """Load the traffic saved by save_traffic().
+
+    Args:
+        path: The file path.
+
+    Returns:
+        The recorded requests and responses.
+    """
+    path = Path(path)
+    with (gzip.open(path, "rt", encoding="utf-8") if path.suffix == ".gz" else
+          path.open("rt", encoding="utf-8")) as file:
+        header = json.loads(file.readline() or "{}")
+        if header.get("format") != TRAFFIC_FORMAT:
+            raise ValueError("Unsupported traffic file: {}".format(path))
+        exchanges = []
+        for line in file:
+            entry = json.loads(line)
+            entry["request_body"] = _decode_body(entry["request_body"])
+            entry["body"] = _decode_body(entry["body"])
+            exchanges.append(Exchange(**entry))
+        return exchanges
+
+
+@public
+class TrafficRecorder(HTTPAdapter):
+    """Transport adapter recording the traffic of the API clients.
+
+    Used as a context manager, it is mounted on all the sessions of the
+    clients (see REST.mount()) and saves the traffic to the file at exit.
+    Bodies of streamed responses are read (and recorded) at once.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, *,
+                 prefixes: Tuple[str, ...] = ("http://", "https://"),
+                 redact: Tuple[str, ...] = REDACTED_HEADERS, pool_maxsize: int = 32,
+                 **kwargs):
+        """Init
+
+        Args:
+            path:         The file to save the traffic to at exit of the context.
+            prefixes:     The url prefixes to record (default: all urls).
+            redact:       The request headers not recorded (default: credentials).
+            pool_maxsize: The size of the pool of connections.
+            kwargs:       Other arguments of HTTPAdapter.
+        """
+        super().__init__(pool_maxsize=pool_maxsize, **kwargs)
+        self.path = path
+        self.prefixes = prefixes
+        self.redact = {name.lower() for name in redact}
+        self.exchanges: List[Exchange] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        body = response.content
+        elapsed = time.perf_counter() - start
+        exchange = Exchange(
+            method=request.method, url=request.url,
+            request_headers={name: value for name, value in request.headers.items()
+                             if name.lower() not in self.redact},
+            request_body=_request_body(request),
+            status=response.status_code, reason=response.reason or "",
+            headers={name: str(len(body)) if name.lower() == "content-length" else value
+                     for name, value in response.headers.items()
+                     if name.lower() not in _DROPPED_HEADERS},
+            body=body, elapsed=elapsed, offset=start - self._start)
+        with self._lock:
+            self.exchanges.append(exchange)
+        return response
+
+    def save(self, path: Optional[Union[str, Path]] = None) -> None:
+        """Save the traffic recorded so far (by default to the file of the recorder)."""
+        with self._lock:
+            exchanges = list(self.exchanges)
+        save_traffic(path or self.path, exchanges)
+
+    def __enter__(self):
+        """Start recording the traffic of all the clients."""
+        self._start = time.perf_counter()
+        for prefix in self.prefixes:
+            REST.mount(prefix, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop recording and save the traffic (if the recorder has a file)."""
+        REST.unmount(self)
+        if self.path is not None:
+            self.save()
+
+
+@public
+class TrafficReplayer(BaseAdapter):
+    """Transport adapter answering the requests from recorded traffic.
+
+    Requests are matched by the method, url and body; repeated requests
+    get the recorded responses in order (cycling through them if loop).
+    Responses are returned at once or after the recorded response time
+    (scaled by speed). Used as a context manager, it is mounted on all the
+    sessions of the clients (see REST.mount()), so no server is needed.
+    """
+
+    def __init__(self, traffic: Union[str, Path, Iterable[Exchange]], *,
+                 speed: Optional[float] = None, loop: bool = True,
+                 prefixes: Tuple[str, ...] = ("http://", "https://")):
+        """Init
+
+        Args:
+            traffic:  The recorded traffic or the file of it.
+            speed:    The replay pace relative to the recorded one (1.0 is the
+                      recorded pace, 2.0 twice as fast; default: as fast as
+                      possible).
+            loop:     Whether the responses to repeated requests are reused
+                      after the recorded ones run out (default: True).
+            prefixes: The url prefixes to replay (default: all urls).
+        """
+        super().__init__()
+        if isinstance(traffic, (str, Path)):
+            traffic = load_traffic(traffic)
+        self.speed = speed
+        self.loop = loop
+        self.prefixes = prefixes
+        self._exchanges: Dict[Tuple[str, str, Optional[bytes]], List[Exchange]] = {}
+        for exchange in traffic:
+            self._exchanges.setdefault(exchange.key, []).append(exchange)
+        self._cursors: Dict[Tuple[str, str, Optional[bytes]], int] = {}
+        self._lock = threading.Lock()
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False,
+             timeout=None, verify=True, cert=None, proxies=None) -> requests.Response:
+        key = (request.method, request.url, _request_body(request))
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            raise PlasticReplayError("Not recorded: {} {}".format(request.method, request.url))
+        with self._lock:
+            cursor = self._cursors.get(key, 0)
+            if cursor >= len(exchanges) and not self.loop:
+                raise PlasticReplayError("No more recorded responses: {} {}".format(
+                                         request.method, request.url))
+            self._cursors[key] = cursor + 1
+        exchange = exchanges[cursor % len(exchanges)]
+        if self.speed:
+            time.sleep(exchange.elapsed / self.speed)
+        response = requests.Response()
+        response.status_code = exchange.status
+        response.reason = exchange.reason
+        response.headers = CaseInsensitiveDict(exchange.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(exchange.body)
+        response._content = exchange.body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=exchange.elapsed)
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        pass
+
+    def rewind(self) -> None:
+        """Replay the traffic from the beginning."""
+        with self._lock:
+            self._cursors.clear()
+
+    def __enter__(self):
+        """Start answering the requests of all the clients."""
+        for prefix in self.prefixes:
+            REST.mount(prefix, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop answering the requests."""
+        REST.unmount(self)
@@ -1,7 +1,10 @@
 # Copyright (c) 2019 Adam Karpierz
 # SPDX-License-Identifier: Zlib
 
+from pathlib import Path
 import inspect
+import hashlib
+import base64
 import enum
 
 from public import public
@@ -65,6 +68,26 @@ def inherit_docs(cls: type) -> type:
     return cls
 
 
+@public
+def file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the hash of a file the way PlasticSCM does.
+
+    Args:
+        path:       path of the file.
+        chunk_size: size of the chunks the file is read in.
+
+    Returns:
+        The base64-encoded MD5 digest of the file content
+        (e.g. "u0gJQzQnjLNUUHRI1+QQLg==").
+    """
+    md5 = hashlib.md5(usedforsecurity=False)
+    with Path(path).open("rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode("ascii")
+
+
 """
 def inherit_docs(cls):
     for name in dir(cls):
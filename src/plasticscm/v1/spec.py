@@ -0,0 +1,319 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""The declarative specification of the REST API (v1): schemas and endpoints."""
+
+from typing import List, Optional, Union
+from pathlib import Path
+
+from ..endpoint import Field, Schema, Param, Endpoint
+from .model import (RepId, Owner, Repository, Workspace, ObjectType, Branch,
+                    Changeset, LocalInfo, RevisionInfo, RevisionHistoryItem,
+                    Label, Change, OperationStatus, CheckinStatus, XLink,
+                    Item, Merge, Diff, AffectedPaths)
+
+_ = __doc__
+
+# The JSON objects of the responses.
+
+SCHEMAS = {
+    "RepId": Schema(RepId, (
+        Field("id",        "id"),
+        Field("module_id", "moduleId"),
+    )),
+    "Owner": Schema(Owner, (
+        Field("name",     "name"),
+        Field("is_group", "isGroup"),
+    )),
+    "Repository": Schema(Repository, (
+        Field("name",   "name"),
+        Field("server", "server"),
+        Field("owner",  "owner", "Owner", "optional"),
+        Field("rep_id", "repId", "RepId", "optional"),
+        Field("guid",   "guid",  "guid",  "optional"),
+    )),
+    "Workspace": Schema(Workspace, (
+        Field("name",         "name"),
+        Field("path",         "path", "path"),
+        Field("machine_name", "machineName"),
+        Field("guid",         "guid", "guid"),
+    )),
+    "Branch": Schema(Branch, (
+        Field("name",              "name"),
+        Field("id",                "id"),
+        Field("parent_id",         "parentId"),
+        Field("last_changeset_id", "lastChangeset"),
+        Field("comment",           "comment", None, "get"),
+        Field("creation_date",     "creationDate", "date"),
+        Field("guid",              "guid", "guid"),
+        Field("owner",             "owner", "Owner", "optional"),
+        Field("repository",        "repository", "Repository"),
+    )),
+    "Label": Schema(Label, (
+        Field("name",          "name"),
+        Field("id",            "id"),
+        Field("changeset_id",  "changeset"),
+        Field("comment",       "comment", None, "get"),
+        Field("creation_date", "creationDate", "date"),
+        Field("branch",        "branch", "Branch"),
+        Field("owner",         "owner", "Owner", "optional"),
+        Field("repository",    "repository", "Repository"),
+    )),
+    "Changeset": Schema(Changeset, (
+        Field("id",            "id"),
+        Field("parent_id",     "parentId"),
+        Field("comment",       "comment", None, "get"),
+        Field("creation_date", "creationDate", "date"),
+        Field("guid",          "guid", "guid"),
+        Field("branch",        "branch", "Branch"),
+        Field("owner",         "owner", "Owner", "optional"),
+        Field("repository",    "repository", "Repository"),
+    )),
+    "LocalInfo": Schema(LocalInfo, (
+        Field("modified_time", "modifiedTime", "date"),
+        Field("size",          "size"),
+        Field("is_missing",    "isMissing"),
+    )),
+    "RevisionInfo": Schema(RevisionInfo, (
+        Field("id",             "id"),
+        Field("parent_id",      "parentId"),
+        Field("item_id",        "itemId"),
+        Field("type",           "type"),
+        Field("size",           "size"),
+        Field("hash",           "hash"),
+        Field("branch_id",      "branchId"),
+        Field("changeset_id",   "changesetId"),
+        Field("is_checked_out", "isCheckedOut"),
+        Field("creation_date",  "creationDate", "date"),
+        Field("rep_id",         "repositoryId", "RepId", "optional"),
+        Field("owner",          "owner", "Owner", "optional"),
+    )),
+    "Change": Schema(Change, (
+        Field("changes",         "changes"),
+        Field("path",            "path", "path"),
+        Field("old_path",        "oldPath", "path", "optional"),
+        Field("server_path",     "serverPath"),
+        Field("old_server_path", "oldServerPath", None, "optional"),
+        Field("is_xlink",        "isXlink"),
+        Field("local_info",      "localInfo", "LocalInfo"),
+        Field("revision_info",   "revisionInfo", "RevisionInfo"),
+    )),
+    "OperationStatus": Schema(OperationStatus, (
+        Field("status",        "status",       None, "get"),
+        Field("message",       "message",      None, "get"),
+        Field("total_files",   "totalFiles",   None, "get"),
+        Field("total_bytes",   "totalBytes",   None, "get"),
+        Field("updated_files", "updatedFiles", None, "get"),
+        Field("updated_bytes", "updatedBytes", None, "get"),
+    )),
+    "CheckinStatus": Schema(CheckinStatus, (
+        Field("status",           "status",          None, "get"),
+        Field("message",          "message",         None, "get"),
+        Field("total_size",       "totalSize",       None, "get"),
+        Field("transferred_size", "transferredSize", None, "get"),
+    )),
+    "XLink": Schema(XLink, (
+        Field("changeset_id",   "changesetId"),
+        Field("changeset_guid", "changesetGuid"),
+        Field("repo_name",      "repository"),
+        Field("server",         "server"),
+    )),
+    "Item": Schema(Item, (
+        Field("type",           "type", Item.Type),
+        Field("name",           "name"),
+        Field("path",           "path"),
+        Field("revision_id",    "revisionId", None, "get"),
+        Field("size",           "size"),
+        Field("is_under_xlink", "isUnderXlink", None, "get"),
+        Field("content",        "content", None, "get"),
+        Field("hash",           "hash", None, "get"),
+        Field("items",          "items", ["Item"], "optional"),
+        Field("xlink_target",   "xlinkTarget", "XLink", "optional"),
+        Field("repository",     "repository", "Repository", "optional"),
+    )),
+    "RevisionHistoryItem": Schema(RevisionHistoryItem, (
+        Field("type",           "type"),
+        Field("revision_id",    "revisionId"),
+        Field("revision_link",  "revisionLink", None, "get"),
+        Field("changeset_id",   "changesetId"),
+        Field("changeset_link", "changesetLink", None, "get"),
+        Field("branch_name",    "branchName"),
+        Field("branch_link",    "branchLink", None, "get"),
+        Field("repo_name",      "repositoryName"),
+        Field("repo_link",      "repositoryLink", None, "get"),
+        Field("comment",        "comment", None, "get"),
+        Field("creation_date",  "creationDate", "date"),
+        Field("owner",          "owner", "Owner", "optional"),
+    )),
+    "Merge": Schema(Merge, (
+        Field("merge_type",       "mergeType", Merge.Type),
+        Field("source_changeset", "sourceChangeset", "Changeset"),
+    )),
+    "Diff": Schema(Diff, (
+        Field("status",                        "status", Diff.Status),
+        Field("path",                          "path"),
+        Field("source_path",                   "srcPath", None, "get"),
+        Field("revision_id",                   "revisionId", None, "get"),
+        Field("source_revision_id",            "srcRevisionId", None, "get"),
+        Field("is_directory",                  "isDirectory"),
+        Field("size",                          "size", None, "get"),
+        Field("hash",                          "hash", None, "get"),
+        Field("source_hash",                   "srcHash", None, "get"),
+        Field("is_under_xlink",                "isUnderXlink"),
+        Field("xlink",                         "xlink", "XLink", "optional"),
+        Field("base_xlink",                    "baseXlink", "XLink", "optional"),
+        Field("merges",                        "merges", ["Merge"], "optional"),
+        Field("is_item_fs_protection_changed", "isItemFSProtectionChanged"),
+        Field("item_fs_protection",            "itemFileSystemProtection"),
+        Field("repository",                    "repository", "Repository"),
+        Field("modified_time",                 "modifiedTime", "date", "optional"),
+        Field("created_by",                    "createdBy", "Owner", "optional"),
+    )),
+    "AffectedPaths": Schema(AffectedPaths, (
+        Field("paths", "affectedPaths", ["path"]),
+    )),
+}
+
+# The API methods (get_item_content, streaming the content, is written by hand).
+
+_repo_name    = Param("repo_name")
+_wkspace_name = Param("wkspace_name")
+_branch_name  = Param("branch_name")
+_label_name   = Param("label_name")
+_changeset_id = Param("changeset_id", int)
+_item_path    = Param("item_path")
+_query        = Param("query", Optional[str], "q", "query", None)
+_change_types = Param("change_types", List[Change.Type], "types", "query", [Change.Type.ALL],
+                      '",".join(chtype.value for chtype in {})')
+
+ENDPOINTS = (
+    # Repositories
+    Endpoint("get_repositories", "GET", "/repos", (), ["Repository"]),
+    Endpoint("create_repository", "POST", "/repos", (
+             Param("repo_name", str, "name", "data"),
+             Param("server", Optional[str], "server", "data", None)), "Repository"),
+    Endpoint("get_repository", "GET", "/repos/{repo_name}", (_repo_name,), "Repository"),
+    Endpoint("rename_repository", "PUT", "/repos/{repo_name}", (
+             _repo_name, Param("repo_new_name", str, "name", "data")), "Repository"),
+    Endpoint("delete_repository", "DELETE", "/repos/{repo_name}", (_repo_name,)),
+    # Workspaces
+    Endpoint("get_workspaces", "GET", "/wkspaces", (), ["Workspace"]),
+    Endpoint("create_workspace", "POST", "/wkspaces", (
+             Param("wkspace_name", str, "name", "data"),
+             Param("wkspace_path", Path, "path", "data", encode="str({})"),
+             Param("repo_name", Optional[str], "repository", "data", None)), "Workspace"),
+    Endpoint("get_workspace", "GET", "/wkspaces/{wkspace_name}", (_wkspace_name,),
+             "Workspace"),
+    Endpoint("rename_workspace", "PATCH", "/wkspaces/{wkspace_name}", (
+             _wkspace_name, Param("wkspace_new_name", str, "name", "data")), "Workspace"),
+    Endpoint("delete_workspace", "DELETE", "/wkspaces/{wkspace_name}", (_wkspace_name,)),
+    # Branches
+    Endpoint("get_branches", "GET", "/repos/{repo_name}/branches", (
+             _repo_name, _query), ["Branch"]),
+    Endpoint("create_branch", "POST", "/repos/{repo_name}/branches", (
+             _repo_name,
+             Param("branch_name", str, "name", "data", encode="{}.strip('/')"),
+             Param("origin_type", ObjectType, "originType", "data", encode="{}.value"),
+             Param("origin", Union[str, int], "origin", "data", encode="str({})"),
+             Param("top_level", bool, "topLevel", "data", False)), "Branch"),
+    Endpoint("get_branch", "GET", "/repos/{repo_name}/branches/{branch_name}", (
+             _repo_name, _branch_name), "Branch"),
+    Endpoint("rename_branch", "PATCH", "/repos/{repo_name}/branches/{branch_name}", (
+             _repo_name, _branch_name, Param("branch_new_name", str, "name", "data")), "Branch"),
+    Endpoint("delete_branch", "DELETE", "/repos/{repo_name}/branches/{branch_name}", (
+             _repo_name, _branch_name)),
+    # Labels
+    Endpoint("get_labels", "GET", "/repos/{repo_name}/labels", (
+             _repo_name, _query), ["Label"]),
+    Endpoint("create_label", "POST", "/repos/{repo_name}/labels", (
+             _repo_name,
+             Param("label_name", str, "name", "data"),
+             Param("changeset_id", int, "changeset", "data"),
+             Param("comment", Optional[str], "comment", "data", None),
+             Param("apply_to_xlinks", bool, "applyToXlinks", "data", False)), "Label"),
+    Endpoint("get_label", "GET", "/repos/{repo_name}/labels/{label_name}", (
+             _repo_name, _label_name), "Label"),
+    Endpoint("rename_label", "PATCH", "/repos/{repo_name}/labels/{label_name}", (
+             _repo_name, _label_name, Param("label_new_name", str, "name", "data")), "Label"),
+    Endpoint("delete_label", "DELETE", "/repos/{repo_name}/labels/{label_name}", (
+             _repo_name, _label_name)),
+    # Changesets
+    Endpoint("get_changesets", "GET", "/repos/{repo_name}/changesets", (
+             _repo_name, _query), ["Changeset"]),
+    Endpoint("get_changesets_in_branch", "GET",
+             "/repos/{repo_name}/branches/{branch_name}/changesets", (
+             _repo_name, _branch_name, _query), ["Changeset"]),
+    Endpoint("get_changeset", "GET", "/repos/{repo_name}/changesets/{changeset_id}", (
+             _repo_name, _changeset_id), "Changeset"),
+    # Changes
+    Endpoint("get_pending_changes", "GET", "/wkspaces/{wkspace_name}/changes", (
+             _wkspace_name, _change_types), ["Change"]),
+    Endpoint("get_pending_changes_raw", "GET", "/wkspaces/{wkspace_name}/changes", (
+             _wkspace_name, _change_types), "raw"),
+    Endpoint("undo_pending_changes", "DELETE", "/wkspaces/{wkspace_name}/changes", (
+             _wkspace_name,
+             Param("paths", List[Union[str, Path]], "paths", "json",
+                   encode="[str(path) for path in {}]")), "AffectedPaths"),
+    # Workspace Update and Switch
+    Endpoint("get_workspace_update_status", "GET", "/wkspaces/{wkspace_name}/update", (
+             _wkspace_name,), "OperationStatus"),
+    Endpoint("update_workspace", "POST", "/wkspaces/{wkspace_name}/update", (
+             _wkspace_name,), "OperationStatus"),
+    Endpoint("get_workspace_switch_status", "GET", "/wkspaces/{wkspace_name}/switch", (
+             _wkspace_name,), "OperationStatus"),
+    Endpoint("switch_workspace", "POST", "/wkspaces/{wkspace_name}/switch", (
+             _wkspace_name,
+             Param("object_type", ObjectType, "objectType", "data", encode="{}.value"),
+             Param("object", Union[str, int], "object", "data", encode="str({})")),
+             "OperationStatus"),
+    # Checkin
+    Endpoint("get_workspace_checkin_status", "GET", "/wkspaces/{wkspace_name}/checkin", (
+             _wkspace_name,), "CheckinStatus"),
+    Endpoint("checkin_workspace", "POST", "/wkspaces/{wkspace_name}/checkin", (
+             _wkspace_name,
+             Param("paths", Optional[List[str]], "paths", "data", None),
+             Param("comment", Optional[str], "comment", "data", None),
+             Param("recurse", bool, "recurse", "data", True)), "CheckinStatus"),
+    # Repository contents
+    Endpoint("get_item", "GET", "/repos/{repo_name}/contents/{item_path}", (
+             _repo_name, _item_path), "Item"),
+    Endpoint("get_item_in_branch", "GET",
+             "/repos/{repo_name}/branches/{branch_name}/contents/{item_path}", (
+             _repo_name, _branch_name, _item_path), "Item"),
+    Endpoint("get_item_in_changeset", "GET",
+             "/repos/{repo_name}/changesets/{changeset_id}/contents/{item_path}", (
+             _repo_name, _changeset_id, _item_path), "Item"),
+    Endpoint("get_item_in_label", "GET",
+             "/repos/{repo_name}/labels/{label_name}/contents/{item_path}", (
+             _repo_name, _label_name, _item_path), "Item"),
+    Endpoint("get_item_revision", "GET", "/repos/{repo_name}/revisions/{revision_spec}", (
+             _repo_name, Param("revision_spec")), "Item"),
+    Endpoint("get_item_revision_history_in_branch", "GET",
+             "/repos/{repo_name}/branches/{branch_name}/history/{item_path}", (
+             _repo_name, _branch_name, _item_path), ["RevisionHistoryItem"]),
+    Endpoint("get_item_revision_history_in_changeset", "GET",
+             "/repos/{repo_name}/changesets/{changeset_id}/history/{item_path}", (
+             _repo_name, _changeset_id, _item_path), ["RevisionHistoryItem"]),
+    Endpoint("get_item_revision_history_in_label", "GET",
+             "/repos/{repo_name}/labels/{label_name}/history/{item_path}", (
+             _repo_name, _label_name, _item_path), ["RevisionHistoryItem"]),
+    # Diff
+    Endpoint("diff_changesets", "GET",
+             "/repos/{repo_name}/changesets/{changeset_id}/diff/{source_changeset_id}", (
+             _repo_name, _changeset_id, Param("source_changeset_id", int)), ["Diff"]),
+    Endpoint("diff_changeset", "GET", "/repos/{repo_name}/changesets/{changeset_id}/diff", (
+             _repo_name, _changeset_id), ["Diff"]),
+    Endpoint("diff_branch", "GET", "/repos/{repo_name}/branches/{branch_name}/diff", (
+             _repo_name, _branch_name), ["Diff"]),
+    # Workspace actions
+    Endpoint("add_workspace_item", "POST", "/wkspaces/{wkspace_name}/content/{item_path}", (
+             _wkspace_name, _item_path,
+             Param("add_parents", bool, "addPrivateParents", "data", True),
+             Param("checkout_parent", bool, "checkoutParent", "data", True),
+             Param("recurse", bool, "recurse", "data", True)), "AffectedPaths"),
+    Endpoint("checkout_workspace_item", "PUT", "/wkspaces/{wkspace_name}/content/{item_path}", (
+             _wkspace_name, _item_path), "AffectedPaths"),
+    Endpoint("move_workspace_item", "PATCH", "/wkspaces/{wkspace_name}/content/{item_path}", (
+             _wkspace_name, _item_path, Param("dest_item_path", str, "destination", "data")),
+             "AffectedPaths"),
+)
@@ -0,0 +1,91 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+"""Incremental watching of the pending changes of a workspace."""
+
+from typing import Dict, Tuple, NamedTuple, Callable, Optional
+import hashlib
+import json
+
+from public import public
+
+from .model import Change
+
+_ = __doc__
+
+
+@public
+class PendingChangesDelta(NamedTuple):
+    """The differences between two snapshots of pending changes."""
+
+    added:    Tuple[Change]
+    removed:  Tuple[Change]
+    modified: Tuple[Change]
+
+    def __bool__(self) -> bool:
+        """Whether there are any differences."""
+        return bool(self.added or self.removed or self.modified)
+
+
+@public
+class PendingChangesWatcher:
+    """Keeps the last snapshot of the pending changes of a workspace.
+
+    Every poll fetches the raw list of changes. If its body did not change
+    since the previous poll, nothing is parsed at all; otherwise only the
+    entries which are new or differ from the previous ones are converted
+    to Change objects. The snapshot is indexed by the changes' paths.
+
+    Created by Plastic.watch_pending_changes().
+    """
+
+    def __init__(self, fetch: Callable[[], bytes], convert: Callable[[Dict], Change]):
+        """Init
+
+        Args:
+            fetch:   A callable returning the raw (JSON) body of the
+                     pending changes of the workspace.
+            convert: A callable converting a raw change to a Change.
+        """
+        self._fetch   = fetch
+        self._convert = convert
+        self._digest: Optional[bytes] = None
+        self._raw:     Dict[str, Dict]   = {}
+        self._changes: Dict[str, Change] = {}
+
+    @property
+    def changes(self) -> Dict[str, Change]:
+        """The last snapshot of the pending changes, by path."""
+        return dict(self._changes)
+
+    def poll(self) -> PendingChangesDelta:
+        """Fetch the pending changes and diff them against the last snapshot.
+
+        Returns:
+            The added, removed and modified changes (all empty if nothing
+            has changed since the last poll).
+        """
+        body = self._fetch()
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if digest == self._digest:
+            return PendingChangesDelta((), (), ())
+        raw = {entry["path"]: entry for entry in json.loads(body)}
+        old_raw, old_changes = self._raw, self._changes
+        changes: Dict[str, Change] = {}
+        added, modified = [], []
+        for path, entry in raw.items():
+            old_entry = old_raw.get(path)
+            if old_entry == entry:
+                changes[path] = old_changes[path]
+                continue
+            changes[path] = change = self._convert(entry)
+            (added if old_entry is None else modified).append(change)
+        removed = tuple(change for path, change in old_changes.items() if path not in raw)
+        self._digest, self._raw, self._changes = digest, raw, changes
+        return PendingChangesDelta(tuple(added), removed, tuple(modified))
+
+    def reset(self) -> None:
+        """Forget the last snapshot (the next poll reports all changes as added)."""
+        self._digest = None
+        self._raw = {}
+        self._changes = {}
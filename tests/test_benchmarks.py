@@ -0,0 +1,49 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+from benchmarks.__main__ import main
+from benchmarks.data import SyntheticRepo
+from benchmarks.server import FakeServer
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_tiny_run(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "results.json")
+            args = ["--changesets", "20", "--branches", "3", "--labels", "2",
+                    "--diff-size", "5", "--history-size", "3", "--repeat", "1",
+                    "--calls", "4", "--workers", "2", "-o", output]
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args), 0)
+            with open(output, encoding="utf-8") as file:
+                results = json.load(file)
+            self.assertEqual(results["meta"]["parameters"]["changesets"], 20)
+            self.assertIn("get_changeset", results["methods"])
+            self.assertIn("Changeset", results["parse"])
+            self.assertGreater(results["memory"]["get_changesets"], 0)
+            self.assertEqual(set(results["clients"]), {"sync", "threaded", "async"})
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args[:-2] + ["--suite", "parse", "--baseline", output,
+                                                    "--tolerance", "1000"]), 0)
+
+    def test_server(self):
+        repo = SyntheticRepo(changesets=5, branches=2, labels=1)
+        repo.changesets.reverse()
+        server = FakeServer(repo)
+        status, body, _ = server._respond("/api/v1/repos/bench/changesets/3")
+        self.assertEqual((status, json.loads(body)["id"]), (200, 3))
+        self.assertIs(server._respond("/api/v1/repos/bench/changesets/3"),
+                      server._respond("/api/v1/repos/bench/changesets/3"))
+        self.assertEqual(server._respond("/api/v1/repos/bench/changesets/9")[0], 404)
+
+
+if __name__.rpartition(".")[-1] == "__main__":
+    unittest.main()
@@ -153,3 +153,28 @@ class TestConfigParser(unittest.TestCase):
         self.assertEqual("STUV", cp.oauth_token)
         self.assertEqual(2, cp.timeout)
         self.assertEqual(True, cp.ssl_verify)
+
+    @mock.patch("pathlib.Path.is_file")
+    @mock.patch("builtins.open")
+    def test_plastic_ids(self, m_open, path_isfile):
+        fd = io.StringIO(valid_config)
+        fd.close = mock.Mock(return_value=None)
+        m_open.return_value = fd
+        path_isfile.return_value = True
+        self.assertEqual(["one", "two", "three", "four"],
+                         config.PlasticConfigParser.plastic_ids())
+        fd.seek(0)
+        cp = config.PlasticConfigParser(plastic_id="one")
+        self.assertIsNone(cp.server)
+        self.assertEqual([], cp.replica_urls)
+
+    @mock.patch("pathlib.Path.is_file")
+    @mock.patch("builtins.open")
+    def test_replica_urls(self, m_open, path_isfile):
+        fd = io.StringIO("[one]\nurl = http://one.url, http://r1.url\n  http://r2.url\n")
+        fd.close = mock.Mock(return_value=None)
+        m_open.return_value = fd
+        path_isfile.return_value = True
+        cp = config.PlasticConfigParser(plastic_id="one")
+        self.assertEqual("http://one.url", cp.url)
+        self.assertEqual(["http://r1.url", "http://r2.url"], cp.replica_urls)
@@ -0,0 +1,87 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+import inspect
+import asyncio
+import json
+from urllib.parse import unquote
+
+from httmock import all_requests, HTTMock
+
+from plasticscm import Plastic
+from plasticscm.endpoint import iter_json_array
+from plasticscm.rest import REST
+
+repository = {"name": "repo", "server": "localhost:8087"}
+
+
+def branch(name, id):  # noqa A002
+    return {"name": name, "id": id, "parentId": 1, "lastChangeset": 7,
+            "creationDate": "2015-06-30T15:18:08",
+            "guid": "1b30674f-14cc-4fd7-a5b2-00d6e0e1e8c3", "repository": repository}
+
+
+class TestEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.plastic = Plastic("http://localhost:9090")
+        self.branches = [branch("/main", 3), branch("/main/task 1", 4)]
+        self.requests = []
+
+        @all_requests
+        def mock(url, request):
+            self.requests.append((request.method, url.path, url.query))
+            if url.path.endswith("/branches"):
+                return {"status_code": 200, "content": json.dumps(self.branches)}
+            name = unquote(url.path.split("/branches", 1)[1])
+            return {"status_code": 200,
+                    "content": json.dumps(next(branch for branch in self.branches
+                                               if branch["name"] == name))}
+
+        self.mock = mock
+
+    def test_iter_json_array(self):
+        values = [1, 23.5, -7e3, "ąę€ \"[],", None, True, {"a": [1, {"b": "]"}]}, [], {}]
+        text = json.dumps(values, ensure_ascii=False).encode("utf-8")
+        for size in (1, 2, 3, 7, len(text)):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(list(iter_json_array(chunks)), values)
+        self.assertEqual(list(iter_json_array([b" [ ", b"] "])), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"a": 1}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[1, 2']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[1, {"a": ']))
+
+    def test_generated_methods(self):
+        api = type(self.plastic._Plastic__api)
+        signature = inspect.signature(api.get_branches)
+        self.assertEqual(list(signature.parameters), ["self", "repo_name", "query"])
+        self.assertIs(signature.parameters["query"].kind, inspect.Parameter.KEYWORD_ONLY)
+        self.assertIs(signature.return_annotation.__args__[0], self.plastic.model.Branch)
+        route, _ = api.get_branches.REST
+        self.assertEqual(route.endpoint, "plasticscm.v1.api.API.get_branches")
+        self.assertIn(route, REST.routes())
+        self.assertFalse(hasattr(api, "get_branch_iter"))  # not a list
+        with self.assertRaises(AttributeError):
+            self.plastic.get_cm_location_async
+
+    def test_variants(self):
+        query = "name = 'x'"
+        with HTTMock(self.mock):
+            names = [branch.name for branch in self.plastic.get_branches("repo", query=query)]
+            self.assertEqual(names, ["/main", "/main/task 1"])
+            self.assertEqual([branch.name for branch in
+                              self.plastic.get_branches_iter("repo", query=query)], names)
+            self.assertEqual(self.requests[0], self.requests[1])
+            self.assertEqual(self.requests[0], ("GET", "/api/v1/repos/repo/branches",
+                                                "q=name+%3D+%27x%27"))
+            branches = self.plastic.get_branch_batch([("repo", name) for name in names * 5],
+                                                     workers=4)
+            self.assertEqual([branch.name for branch in branches], names * 5)
+            self.assertEqual(self.plastic.get_branch_batch([]), ())
+            branch = asyncio.run(self.plastic.get_branch_async("repo", "/main/task 1"))
+            self.assertEqual(branch.id, 4)
+            self.assertEqual(self.requests[-1][1], "/api/v1/repos/repo/branches/main/task%201")
@@ -0,0 +1,104 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from types import SimpleNamespace
+import threading
+
+import requests
+
+from plasticscm import WorkspaceFleet, PlasticOperationError
+
+
+def status(name, files=0, message=None):
+    return SimpleNamespace(status=name, message=message,
+                           total_files=10, total_bytes=1000,
+                           updated_files=files, updated_bytes=files * 100)
+
+
+class FakePlastic:
+
+    def __init__(self, scripts):
+        # wkspace_name -> list of attempts, each a list of statuses (or exceptions)
+        self.scripts = {name: [iter(attempt) for attempt in attempts]
+                        for name, attempts in scripts.items()}
+        self.current = {}
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        self.switched = []
+
+    def next_status(self, wkspace_name):
+        ret = next(self.current[wkspace_name])
+        if isinstance(ret, Exception):
+            raise ret
+        if ret.status in ("Finished", "Failed"):
+            with self.lock:
+                self.running -= 1
+        return ret
+
+    def update_workspace(self, wkspace_name):
+        with self.lock:
+            self.current[wkspace_name] = self.scripts[wkspace_name].pop(0)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        return self.next_status(wkspace_name)
+
+    def switch_workspace(self, wkspace_name, object_type, object):  # noqa A002
+        self.switched.append((wkspace_name, object_type, object))
+        return self.update_workspace(wkspace_name)
+
+    get_workspace_update_status = next_status
+    get_workspace_switch_status = next_status
+
+
+class TestWorkspaceFleet(unittest.TestCase):
+
+    def test_update(self):
+        ok = [status("Running"), status("Running", 5), status("Finished", 10)]
+        scripts = {"wk{}".format(i): [ok] for i in range(10)}
+        scripts["wk3"] = [[status("Running"), status("Failed", message="Disk full")], ok]
+        scripts["wk7"] = [[status("Failed", message="Locked")]] * 3
+        plastic = FakePlastic(scripts)
+        fleet = WorkspaceFleet(plastic, scripts, max_concurrent=4, poll_interval=0)
+        progress = []
+        report = fleet.update(on_progress=progress.append)
+        self.assertLessEqual(plastic.max_running, 4)
+        self.assertEqual(set(report.succeeded), set(scripts) - {"wk7"})
+        self.assertEqual(list(report.errors), ["wk7"])
+        self.assertIsInstance(report.errors["wk7"], PlasticOperationError)
+        self.assertEqual(report.attempts["wk3"], 2)
+        self.assertEqual(report.attempts["wk7"], 3)
+        self.assertEqual(report.updated_files, 90)
+        self.assertEqual(report.updated_bytes, 9000)
+        self.assertGreater(report.bytes_per_second, 0)
+        self.assertLess(progress[0].updated_files, report.updated_files)
+
+    def test_switch_errors(self):
+        ok = [status("Finished", 10)]
+        not_found = requests.HTTPError(response=SimpleNamespace(status_code=404))
+        unavailable = requests.HTTPError(response=SimpleNamespace(status_code=503))
+        plastic = FakePlastic({"wk1": [[unavailable], ok], "wk2": [[not_found], ok]})
+        report = WorkspaceFleet(plastic, ["wk1", "wk2"], poll_interval=0).switch("branch",
+                                                                                 "/main")
+        self.assertEqual(report.succeeded, ("wk1",))
+        self.assertIs(report.errors["wk2"], not_found)
+        self.assertEqual(report.attempts, {"wk1": 2, "wk2": 1})
+        self.assertEqual(plastic.switched[0][1:], ("branch", "/main"))
+
+    def test_poll_errors(self):
+        unavailable = requests.HTTPError(response=SimpleNamespace(status_code=503))
+        not_found = requests.HTTPError(response=SimpleNamespace(status_code=404))
+        plastic = FakePlastic({"wk1": [[status("Running"), unavailable, unavailable,
+                                        status("Finished", 10)]],
+                               "wk2": [[status("Running"), not_found]]})
+        report = WorkspaceFleet(plastic, ["wk1", "wk2"], poll_interval=0).update()
+        self.assertEqual(report.succeeded, ("wk1",))
+        self.assertIs(report.errors["wk2"], not_found)
+        self.assertEqual(report.attempts, {"wk1": 1, "wk2": 1})
+
+    def test_timeout(self):
+        plastic = FakePlastic({"wk1": [[status("Running")] * 1000]})
+        report = WorkspaceFleet(plastic, ["wk1"], poll_interval=0.01).update(timeout=0.05)
+        self.assertIsInstance(report.errors["wk1"], TimeoutError)
+        self.assertEqual(report.succeeded, ())
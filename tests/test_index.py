@@ -0,0 +1,262 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from types import SimpleNamespace
+from pathlib import Path
+from datetime import datetime
+import tempfile
+import random
+
+from plasticscm import ChangesetGraph, BranchTree, LabelIndex
+
+
+class FakePlastic:
+
+    def __init__(self, changesets, merges=None):
+        self.changesets = changesets
+        self.merges = merges or {}
+        self.queries = []
+
+    def get_changesets(self, repo_name, *, query=None):
+        self.queries.append(query)
+        last_id = int(query.split(">")[1]) if query else -1
+        return tuple(SimpleNamespace(id=id, parent_id=parent_id,  # noqa A002
+                                     branch=SimpleNamespace(name=branch_name))
+                     for id, parent_id, branch_name in self.changesets if id > last_id)
+
+    def diff_changeset(self, repo_name, changeset_id):
+        return tuple(SimpleNamespace(merges=[SimpleNamespace(
+                                             source_changeset=SimpleNamespace(id=source))])
+                     for source in self.merges.get(changeset_id, ()))
+
+
+class TestChangesetGraph(unittest.TestCase):
+
+    #          4 --- 5
+    #         /       \
+    #   0 -- 1 -- 2 -- 3 -- 6 -- 8
+    #              \            /
+    #               7 --------'
+    changesets = [(0, -1, "/main"), (1, 0, "/main"), (2, 1, "/main"), (3, 2, "/main"),
+                  (4, 1, "/main/t1"), (5, 4, "/main/t1"), (6, 3, "/main"),
+                  (7, 2, "/main/t2"), (8, 6, "/main")]
+    merges = {6: [5], 8: [7]}
+
+    def setUp(self):
+        self.plastic = FakePlastic(self.changesets, self.merges)
+        self.graph = ChangesetGraph.from_plastic(self.plastic, "my_repo", merges=True)
+
+    def test_structure(self):
+        graph = self.graph
+        self.assertEqual(len(graph), 9)
+        self.assertEqual(graph.last_id, 8)
+        self.assertEqual(graph.parent(0), None)
+        self.assertEqual(graph.parent(5), 4)
+        self.assertEqual(graph.merge_sources(6), (5,))
+        self.assertEqual(graph.branch(7), "/main/t2")
+        self.assertEqual(list(graph.first_parent_walk(8)), [8, 6, 3, 2, 1, 0])
+
+    def test_is_ancestor(self):
+        graph = self.graph
+        self.assertTrue(graph.is_ancestor(1, 8))
+        self.assertTrue(graph.is_ancestor(5, 6))   # merged
+        self.assertTrue(graph.is_ancestor(4, 8))   # merged
+        self.assertTrue(graph.is_ancestor(7, 8))
+        self.assertTrue(graph.is_ancestor(3, 3))
+        self.assertFalse(graph.is_ancestor(7, 6))
+        self.assertFalse(graph.is_ancestor(3, 5))
+        self.assertFalse(graph.is_ancestor(8, 1))
+        with self.assertRaises(KeyError):
+            graph.is_ancestor(1, 100)
+
+    def test_merge_base(self):
+        graph = self.graph
+        self.assertEqual(graph.merge_base(5, 3), 1)
+        self.assertEqual(graph.merge_base(7, 5), 1)
+        self.assertEqual(graph.merge_base(7, 6), 2)
+        self.assertEqual(graph.merge_base(5, 8), 5)
+
+    def test_changesets_between(self):
+        graph = self.graph
+        self.assertEqual(graph.changesets_between(2, 6), (3, 4, 5, 6))
+        self.assertEqual(graph.changesets_between(6, 8), (7, 8))
+        self.assertEqual(graph.changesets_between(3, 3), ())
+        self.assertEqual(graph.changesets_between(8, 5), ())
+        self.assertEqual(graph.changesets_between(1, 3), (2, 3))
+
+    def test_update(self):
+        self.plastic.changesets.append((9, 5, "/main/t1"))
+        try:
+            self.assertEqual(self.graph.update(self.plastic, "my_repo"), (9,))
+        finally:
+            self.plastic.changesets.pop()
+        self.assertEqual(self.plastic.queries[-1], "id > 8")
+        self.assertEqual(self.graph.merge_base(9, 7), 1)
+        with self.assertRaises(ValueError):
+            self.graph.add(2, 1)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir)/"graph.json"
+            self.graph.save(path)
+            graph = ChangesetGraph.load(path)
+        self.assertEqual(list(graph), list(self.graph))
+        self.assertEqual(graph.merge_sources(8), (7,))
+        self.assertTrue(graph.is_ancestor(4, 8))
+
+    def test_random_dag(self):
+        rnd = random.Random(1234)
+        graph = ChangesetGraph()
+        ancestors = {}
+        for node in range(400):
+            parent = rnd.randrange(node) if node and rnd.random() < 0.98 else None
+            sources = ({rnd.randrange(node) for _ in range(rnd.randrange(3))}
+                       if node and rnd.random() < 0.2 else set()) - {parent}
+            graph.add(node, parent, merge_sources=sorted(sources))
+            ancestors[node] = {node}.union(*(ancestors[pred] for pred in
+                                             ({parent} | sources) - {None}))
+        for _ in range(500):
+            node1, node2 = rnd.randrange(400), rnd.randrange(400)
+            self.assertEqual(graph.is_ancestor(node1, node2), node1 in ancestors[node2])
+            common = ancestors[node1] & ancestors[node2]
+            self.assertEqual(graph.merge_base(node1, node2), max(common, default=None))
+            self.assertEqual(graph.changesets_between(node1, node2),
+                             tuple(sorted(ancestors[node2] - ancestors[node1])))
+
+
+class TestBranchTree(unittest.TestCase):
+
+    names = ["/main", "/main/task001", "/main/task001/task002", "/main/task010",
+             "/release", "/main/scm003"]
+
+    @staticmethod
+    def branch(id, name, day=1):  # noqa A002
+        return SimpleNamespace(id=id, name=name, creation_date=datetime(2021, 5, day))
+
+    def setUp(self):
+        self.branches = [self.branch(id, name) for id, name in enumerate(self.names, 1)]
+        self.tree = BranchTree(self.branches)
+
+    def test_lookups(self):
+        tree = self.tree
+        self.assertEqual(len(tree), 6)
+        self.assertIs(tree[2], self.branches[1])
+        self.assertIs(tree["main/task001/"], self.branches[1])
+        self.assertIn("/release", tree)
+        self.assertNotIn(100, tree)
+        self.assertEqual([branch.name for branch in tree.roots()], ["/main", "/release"])
+        self.assertIs(tree.parent("/main/task001/task002"), tree["/main/task001"])
+        self.assertIsNone(tree.parent("/main"))
+        self.assertEqual([branch.name for branch in tree.children("/main")],
+                         ["/main/scm003", "/main/task001", "/main/task010"])
+
+    def test_prefix_and_walk(self):
+        tree = self.tree
+        self.assertEqual([branch.name for branch in tree.with_prefix("/main/task")],
+                         ["/main/task001", "/main/task001/task002", "/main/task010"])
+        self.assertEqual([branch.name for branch in tree],
+                         ["/main", "/main/scm003", "/main/task001",
+                          "/main/task001/task002", "/main/task010", "/release"])
+        self.assertEqual([branch.name for branch in tree.walk("/main/task001")],
+                         ["/main/task001", "/main/task001/task002"])
+
+    def test_add_remove(self):
+        tree = BranchTree([self.branch(1, "/main"), self.branch(3, "/main/a/b")])
+        self.assertIs(tree.parent(3), tree[1])  # "/main/a" is not known yet
+        tree.add(self.branch(2, "/main/a"))
+        self.assertIs(tree.parent(3), tree[2])
+        tree.remove(2)
+        self.assertIs(tree.parent(3), tree[1])
+        tree.add(self.branch(3, "/main/c"))  # renamed
+        self.assertEqual([branch.name for branch in tree], ["/main", "/main/c"])
+        tree.add(self.branch(4, "/main/c/d"))
+        tree.add(self.branch(5, "/main/c"))  # deleted and recreated
+        self.assertEqual([branch.id for branch in tree], [1, 5, 4])
+        self.assertNotIn(3, tree)
+        self.assertIs(tree.parent(4), tree[5])
+        tree.add(self.branch(5, "/main/c"))  # the same again
+        self.assertEqual([branch.id for branch in tree.children(5)], [4])
+        self.assertEqual([branch.id for branch in tree.with_prefix("/main/c")], [5, 4])
+
+    def test_refresh(self):
+        plastic = SimpleNamespace(queries=[])
+
+        def get_branches(repo_name, *, query=None):
+            plastic.queries.append(query)
+            return (self.branch(6, "/main/scm003", 2), self.branch(7, "/main/scm003/x", 3))
+
+        plastic.get_branches = get_branches
+        self.assertEqual([branch.id for branch in self.tree.refresh(plastic, "my_repo")], [7])
+        self.assertEqual(plastic.queries, ["date >= '2021/05/01 00:00:00'"])
+        self.assertEqual(self.tree.last_date, datetime(2021, 5, 3))
+        self.assertIs(self.tree.parent(7), self.tree[6])
+        self.tree.refresh(plastic, "my_repo", full=True)
+        self.assertEqual([branch.id for branch in self.tree], [6, 7])
+        self.assertIsNone(self.tree.parent(6))
+
+
+class TestLabelIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.labels = [SimpleNamespace(id=id, name=name, changeset_id=changeset_id)
+                       for id, name, changeset_id in [(1, "v1.0", 2), (2, "v1.1", 5),
+                                                      (3, "v1.1-final", 5), (4, "v2.0", 8),
+                                                      (5, "t1-test", 4)]]
+        self.index = LabelIndex(self.labels)
+
+    def test_lookups(self):
+        index = self.index
+        self.assertEqual(len(index), 5)
+        self.assertIs(index["v2.0"], self.labels[3])
+        self.assertIs(index[1], self.labels[0])
+        self.assertIn("v1.1", index)
+        self.assertEqual([label.name for label in index],
+                         ["v1.0", "t1-test", "v1.1", "v1.1-final", "v2.0"])
+        self.assertEqual([label.name for label in index.at(5)], ["v1.1", "v1.1-final"])
+        self.assertEqual(index.nearest(7).name, "v1.1-final")
+        self.assertEqual(index.nearest(2).name, "v1.0")
+        self.assertIsNone(index.nearest(1))
+        self.assertEqual([label.name for label in index.between(3, 5)],
+                         ["t1-test", "v1.1", "v1.1-final"])
+
+    def test_containing(self):
+        graph = ChangesetGraph.from_plastic(FakePlastic(TestChangesetGraph.changesets,
+                                                        TestChangesetGraph.merges),
+                                            "my_repo", merges=True)
+        self.assertEqual([label.name for label in self.index.containing(3)],
+                         ["t1-test", "v1.1", "v1.1-final", "v2.0"])
+        self.assertEqual([label.name for label in self.index.containing(3, graph)],
+                         ["v2.0"])
+        self.assertEqual([label.name for label in self.index.containing(4, graph)],
+                         ["t1-test", "v1.1", "v1.1-final", "v2.0"])
+        # a label of a changeset newer than the graph
+        self.index.add(SimpleNamespace(id=6, name="v3.0", changeset_id=100))
+        self.assertEqual([label.name for label in self.index.containing(3, graph)],
+                         ["v2.0"])
+
+    def test_refresh(self):
+        queries = []
+
+        def get_labels(repo_name, *, query=None):
+            queries.append(query)
+            return (SimpleNamespace(id=6, name="v2.1", changeset_id=8),)
+
+        self.assertEqual(len(self.index.refresh(SimpleNamespace(get_labels=get_labels),
+                                                "my_repo")), 1)
+        self.assertEqual(queries, ["id > 5"])
+        self.assertEqual(self.index.nearest(100).name, "v2.1")
+        self.index.remove(6)
+        self.assertEqual(self.index.nearest(100).name, "v2.0")
+
+    def test_recreated(self):
+        index = self.index
+        index.add(SimpleNamespace(id=7, name="v2.0", changeset_id=9))  # deleted and recreated
+        self.assertNotIn(4, index)
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index["v2.0"].id, 7)
+        self.assertEqual(index.at(8), ())
+        self.assertEqual([label.id for label in index.between(6, 100)], [7])
+        index.remove(7)
+        self.assertNotIn("v2.0", index)
+        self.assertEqual(index.nearest(100).name, "v1.1-final")
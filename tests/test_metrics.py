@@ -0,0 +1,71 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+
+import requests
+from httmock import urlmatch, HTTMock
+
+from plasticscm import Plastic
+from plasticscm.metrics import metrics, Metrics
+
+repo = {"repId": {"id": 1, "moduleId": 0}, "name": "default",
+        "guid": "c43e1cf9-50b0-4e0d-aca5-c1814d016425",
+        "owner": {"name": "all", "isGroup": False}, "server": "localhost:8084"}
+
+
+@urlmatch(netloc="metrics.plastic:9090", method="get", path=r"^/api/v1/repos$")
+def repos_mock(url, request):
+    return {"status_code": 200, "content": [repo] * 3}
+
+
+@urlmatch(netloc="metrics.plastic:9090", method="get", path=r"^/api/v1/repos/\w+$")
+def missing_mock(url, request):
+    return {"status_code": 404, "content": {"error": "not found"}}
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        metrics.enabled = True
+        self.pl = Plastic("http://metrics.plastic:9090")
+
+    def tearDown(self):
+        metrics.enabled = False
+        metrics.reset()
+
+    def test_api_calls(self):
+        with HTTMock(repos_mock, missing_mock):
+            self.pl.get_repositories()
+            self.pl.get_repositories()
+            with self.assertRaises(requests.HTTPError):
+                self.pl.get_repository("missing")
+            metrics.enabled = False
+            self.pl.get_repositories()
+        snapshot = metrics.snapshot()
+        self.assertEqual(list(snapshot), ["GET /repos", "GET /repos/{repo_name}"])
+        repos = snapshot["GET /repos"]
+        self.assertEqual((repos["requests"], repos["errors"]), (2, 0))
+        self.assertGreater(repos["bytes_in"], 0)
+        for phase in ("network", "decode", "convert"):
+            self.assertEqual(repos[phase]["count"], 2)
+            self.assertEqual(repos[phase]["buckets"][float("inf")], 2)
+        self.assertEqual(snapshot["GET /repos/{repo_name}"]["errors"], 1)
+
+    def test_prometheus(self):
+        registry = Metrics(bounds=(0.1, float("inf")))
+        self.assertFalse(registry.enabled)  # opt-in
+        registry.record("GET", '/repos/{repo_name}"', network=0.05, decode=0.001,
+                        convert=0.2, bytes_in=100)
+        text = registry.to_prometheus()
+        labels = 'method="GET",route="/repos/{repo_name}\\""'
+        self.assertIn("# TYPE plasticscm_requests_total counter\n", text)
+        self.assertIn("plasticscm_requests_total{%s} 1\n" % labels, text)
+        self.assertIn("plasticscm_received_bytes_total{%s} 100\n" % labels, text)
+        self.assertIn('plasticscm_call_duration_seconds_bucket{%s,phase="convert",le="0.1"} 0\n'
+                      % labels, text)
+        self.assertIn('plasticscm_call_duration_seconds_bucket{%s,phase="convert",le="+Inf"} 1\n'
+                      % labels, text)
+        self.assertIn('plasticscm_call_duration_seconds_count{%s,phase="network"} 1\n'
+                      % labels, text)
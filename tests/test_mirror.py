@@ -0,0 +1,101 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from types import SimpleNamespace
+from datetime import datetime
+from uuid import UUID
+
+from plasticscm.mirror import Mirror
+
+owner = SimpleNamespace(name="tester")
+guid  = UUID("c43e1cf9-50b0-4e0d-aca5-c1814d016425")
+
+
+def branch(id, name, day, last_changeset_id=0):  # noqa A002
+    return SimpleNamespace(id=id, name=name, parent_id=-1,
+                           last_changeset_id=last_changeset_id,
+                           comment=None, creation_date=datetime(2021, 5, day),
+                           guid=guid, owner=owner)
+
+
+def changeset(id, branch):  # noqa A002
+    return SimpleNamespace(id=id, parent_id=id - 1, comment="cs{}".format(id),
+                           creation_date=datetime(2021, 5, 1, id), guid=guid,
+                           branch=branch, owner=owner)
+
+
+class FakePlastic:
+
+    def __init__(self):
+        self.queries = []
+        main = branch(1, "/main", 1, 2)
+        self.branches   = [main]
+        self.changesets = [changeset(id, main) for id in range(3)]
+        self.labels     = [SimpleNamespace(id=1, name="v1", changeset_id=1, comment=None,
+                                           creation_date=datetime(2021, 5, 1), branch=main,
+                                           owner=None)]
+
+    def get_branches(self, repo_name, *, query=None):
+        self.queries.append(("branches", query))
+        since = query and datetime.strptime(query.split("'")[1], "%Y/%m/%d %H:%M:%S")
+        return tuple(item for item in self.branches
+                     if since is None or item.creation_date >= since)
+
+    def get_labels(self, repo_name, *, query=None):
+        self.queries.append(("labels", query))
+        last_id = int(query.split(">")[1]) if query else -1
+        return tuple(item for item in self.labels if item.id > last_id)
+
+    def get_changesets(self, repo_name, *, query=None):
+        self.queries.append(("changesets", query))
+        last_id = int(query.split(">")[1]) if query else -1
+        return tuple(item for item in self.changesets if item.id > last_id)
+
+    def get_item_revision_history_in_branch(self, repo_name, branch_name, item_path):
+        return tuple(SimpleNamespace(revision_id=10 + id, type="text", changeset_id=id,
+                                     branch_name=branch_name, comment=None,
+                                     creation_date=datetime(2021, 5, 1), owner=owner)
+                     for id in (1, 2))
+
+
+class TestMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.plastic = FakePlastic()
+        self.mirror = Mirror(self.plastic)
+
+    def tearDown(self):
+        self.mirror.close()
+
+    def test_sync(self):
+        mirror, plastic = self.mirror, self.plastic
+        self.assertEqual(mirror.sync("my_repo"),
+                         {"branches": 1, "labels": 1, "changesets": 3})
+        self.assertEqual(mirror.watermark("my_repo", "changesets"), "2")
+        task = branch(2, "/main/task001", 3)
+        plastic.branches.append(task)
+        plastic.changesets.append(changeset(3, task))
+        self.assertEqual(mirror.sync("my_repo"),
+                         {"branches": 2, "labels": 0, "changesets": 1})
+        self.assertEqual(plastic.queries[-3:],
+                         [("branches", "date >= '2021/05/01 00:00:00'"),
+                          ("labels", "id > 1"), ("changesets", "id > 2")])
+        self.assertEqual(mirror.execute("SELECT name, last_changeset_id FROM branches "
+                                        "ORDER BY id").fetchall(),
+                         [("/main", 2), ("/main/task001", 3)])
+        self.assertEqual(mirror.execute("SELECT COUNT(*) FROM changesets WHERE owner = ?",
+                                        ("tester",)).fetchone(), (4,))
+
+    def test_sync_undated(self):
+        self.plastic.branches[0].creation_date = None
+        self.assertEqual(self.mirror.sync("my_repo")["branches"], 1)
+        self.assertIsNone(self.mirror.watermark("my_repo", "branches"))
+
+    def test_sync_history(self):
+        mirror = self.mirror
+        self.assertEqual(mirror.sync_history("my_repo", ["/src/a.c", "/src/b.c"]), 4)
+        self.assertEqual(mirror.sync_history("my_repo", ["/src/a.c"]), 2)
+        self.assertEqual(mirror.execute("SELECT item_path, COUNT(*) FROM revisions "
+                                        "GROUP BY item_path").fetchall(),
+                         [("/src/a.c", 2), ("/src/b.c", 2)])
@@ -6,9 +6,22 @@ from typing import List, Tuple, Optional, Union
 from functools import partial
 from pathlib import Path
 from pprint import pprint
-
+import tempfile
+import mmap
+import copy
+import threading
+import asyncio
+import subprocess
+import gzip
+import sys
+import io
+
+import urllib3
+from requests.adapters import BaseAdapter, HTTPAdapter
 from httmock import all_requests, urlmatch, response, HTTMock
 from plasticscm import Plastic
+from plasticscm.rest import REST
+from plasticscm import PlasticOperationError, PlasticBatchError
 
 
 class TestPlastic(unittest.TestCase):
@@ -2514,6 +2527,30 @@ class TestPlastic(unittest.TestCase):
                 }
             },
 
+            {
+                "method": "get_item_content",
+                "args": ("my_repo", 771),
+                "rtype": memoryview,
+                "urlmatch": urlmatch(scheme=scheme, netloc=netloc, method="get",
+                                     path=r"^/api/v1/repos/\w+/revisions/\d+/blob$"),
+                "expected": {
+                    "status_code": 200, # OK
+                    "content": b"int main(void)\n{\n    return 0;\n}\n"
+                }
+            },
+            {
+                "method": "get_item_content",
+                "args": ("my_repo", 771),
+                "kwargs": dict(dest=bytearray(64), chunk_size=8),
+                "rtype": memoryview,
+                "urlmatch": urlmatch(scheme=scheme, netloc=netloc, method="get",
+                                     path=r"^/api/v1/repos/\w+/revisions/\d+/blob$"),
+                "expected": {
+                    "status_code": 200, # OK
+                    "content": b"int main(void)\n{\n    return 0;\n}\n"
+                }
+            },
+
             # Diff
 
             {
@@ -2996,6 +3033,29 @@ class TestPlastic(unittest.TestCase):
 
     def test_api_version(self):
         self.assertEqual(self.pl.api_version, "1")
+        with self.assertRaises(ModuleNotFoundError):
+            Plastic(self.url, api_version="0")
+
+    def test_shared(self):
+        Plastic.clear_shared()
+        pl = Plastic.shared(self.url, timeout=5)
+        self.assertIs(Plastic.shared(self.url, timeout=5.0), pl)
+        self.assertIsNot(Plastic.shared(self.url, timeout=10), pl)
+        self.assertIsNot(Plastic.shared(self.url, timeout=5, http_username="u"), pl)
+        self.assertIs(pl.model, self.pl.model)
+        Plastic.clear_shared()
+        self.assertIsNot(Plastic.shared(self.url, timeout=5), pl)
+        Plastic.clear_shared()
+
+    def test_lazy_imports(self):
+        # Neither importing nor creating a client loads the heavy dependencies.
+        heavy = ("requests", "dateutil", "pkg_about", "asyncio", "plasticscm.v1.api")
+        code = ("import sys, plasticscm; plasticscm.Plastic({!r}).api_version; "
+                "print(*[name for name in {!r} if name in sys.modules])").format(self.url,
+                                                                                 heavy)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                text=True, check=True).stdout
+        self.assertEqual(output.split(), [])
 
     # Utils
 
@@ -3136,6 +3196,40 @@ class TestPlastic(unittest.TestCase):
         for test in self.select_tests_for_method(method_name):
             ret = self.do_test(test)
 
+    def test_watch_pending_changes(self):
+        test = next(self.select_tests_for_method("get_pending_changes"))
+        change1 = test["expected"]["content"][0]
+        change2 = copy.deepcopy(change1)
+        change2["path"] = change2["path"].replace("orchestrated", "other")
+        change2["localInfo"]["size"] = 10
+        modified2 = copy.deepcopy(change2)
+        modified2["localInfo"]["size"] = 20
+        bodies = iter([[change1], [change1], [change1, change2], [modified2]])
+        scheme, _, netloc = self.url.partition("://")
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/wkspaces/\w+/changes$")
+        def changes_mock(url, request):
+            return {"status_code": 200, "content": next(bodies)}
+
+        watcher = self.pl.watch_pending_changes("main_wkspace")
+        converted = []
+        convert = watcher._convert
+        watcher._convert = lambda entry: converted.append(entry) or convert(entry)
+        with HTTMock(changes_mock):
+            delta = watcher.poll()
+            self.assertEqual(len(delta.added), 1)
+            self.assertIsInstance(delta.added[0], self.pl.model.Change)
+            self.assertFalse(watcher.poll())
+            delta = watcher.poll()
+            self.assertEqual([change.local_info.size for change in delta.added], [10])
+            self.assertEqual((delta.removed, delta.modified), ((), ()))
+            delta = watcher.poll()
+            self.assertEqual([str(change.path) for change in delta.removed], [change1["path"]])
+            self.assertEqual([change.local_info.size for change in delta.modified], [20])
+        self.assertEqual(len(converted), 3)
+        self.assertEqual(list(watcher.changes), [change2["path"]])
+
     # @staticmethod
     # @urlmatch(scheme="http", netloc="localhost:9090",
     #           path=r"^/api/v1/wkspaces/\w+/changes$", method="delete")
@@ -3223,6 +3317,178 @@ class TestPlastic(unittest.TestCase):
         for test in self.select_tests_for_method(method_name):
             ret = self.do_test(test)
 
+    def test_get_item_content(self):
+        method_name = "get_item_content"
+        for test in self.select_tests_for_method(method_name):
+            ret = self.do_test(test)
+            self.assertEqual(bytes(ret), test["expected"]["content"])
+        test = dict(test, kwargs=dict(dest=bytearray(4)))
+        with self.assertRaises(ValueError):
+            self.do_test(test)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test = dict(test, kwargs=dict(dest=Path(tmp_dir)/"main.c"), rtype=mmap.mmap)
+            ret = self.do_test(test)
+            self.assertEqual(ret[:], test["expected"]["content"])
+            ret.close()
+
+    def test_get_item_content_encoded(self):
+        content = b"int main(void)\n{\n    return 0;\n}\n" * 100
+        body = gzip.compress(content)
+
+        class GzipAdapter(BaseAdapter):
+            # Serves a gzip-encoded body (Content-Length of the encoded body).
+            def send(self, request, **kwargs):
+                raw = urllib3.HTTPResponse(body=io.BytesIO(body), preload_content=False,
+                                           headers={"Content-Encoding": "gzip",
+                                                    "Content-Length": str(len(body))},
+                                           status=200)
+                return HTTPAdapter.build_response(self, request, raw)
+
+            def close(self):
+                pass
+
+        adapter = GzipAdapter()
+        REST.mount(self.url, adapter)
+        try:
+            self.assertEqual(bytes(self.pl.get_item_content("my_repo", 771)), content)
+            self.assertEqual(bytes(self.pl.get_item_content("my_repo", 771, chunk_size=100)),
+                             content)
+        finally:
+            REST.unmount(adapter)
+
+    def test_get_revision_histories(self):
+        test = next(self.select_tests_for_method("get_item_revision_history_in_branch"))
+        scheme, _, netloc = self.url.partition("://")
+        requested = []
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/branches/main/history/[^/]+(/[^/]+)*$")
+        def history_mock(url, request):
+            requested.append(url.path)
+            if url.path.endswith("/flaky.c") and requested.count(url.path) == 1:
+                return {"status_code": 503, "content": None}
+            return self.response(test)
+
+        item_paths = ["src/{}.c".format(name) for name in ("a", "b", "c", "d", "e", "flaky")]
+        progress = []
+        with HTTMock(history_mock):
+            ret = dict(self.pl.get_revision_histories("my_repo",
+                                                      self.pl.model.ObjectType.BRANCH,
+                                                      "/main", item_paths,
+                                                      workers=2, retry_delay=0,
+                                                      on_progress=lambda *args:
+                                                      progress.append(args)))
+        self.assertEqual(set(ret), set(item_paths))
+        for history in ret.values():
+            self.assertEqual(len(history), len(test["expected"]["content"]))
+            self.assertIsInstance(history[0], self.pl.model.RevisionHistoryItem)
+        self.assertEqual(len(requested), 7)
+        self.assertEqual(progress[-1], (6, 6))
+
+    def status_mock(self, operation, statuses):
+        scheme, _, netloc = self.url.partition("://")
+        statuses = {wkspace: iter(seq) for wkspace, seq in statuses.items()}
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/wkspaces/\w+/{}$".format(operation))
+        def mock(url, request):
+            return {"status_code": 200, "content": next(statuses[url.path.split("/")[-2]])}
+
+        return mock
+
+    def test_wait_for_update(self):
+        statuses = [test["expected"]["content"]
+                    for test in self.select_tests_for_method("get_workspace_update_status")
+                    if test["expected"]["status_code"] == 200 and
+                    test["expected"]["content"]["status"] in ("Calculating", "Running",
+                                                               "Finished")]
+        progress = []
+        with HTTMock(self.status_mock("update", {"main_wkspace": statuses})):
+            ret = self.pl.wait_for_update("main_wkspace", min_interval=0, max_interval=0,
+                                          on_progress=progress.append)
+        self.assertEqual(ret.status, "Finished")
+        self.assertEqual(ret.updated_bytes, ret.total_bytes)
+        self.assertEqual([status.status for status in progress],
+                         [status["status"] for status in statuses])
+        failed = {"status": "Failed", "message": "Error updating workspace",
+                  "totalFiles": 0, "totalBytes": 0, "updatedFiles": 0, "updatedBytes": 0}
+        with HTTMock(self.status_mock("switch", {"main_wkspace": statuses[:1] + [failed]})):
+            with self.assertRaisesRegex(PlasticOperationError, "Error updating workspace"):
+                self.pl.wait_for_switch("main_wkspace", min_interval=0, max_interval=0)
+        with HTTMock(self.status_mock("update", {"main_wkspace": statuses[:1] * 100})):
+            with self.assertRaises(TimeoutError):
+                self.pl.wait_for_update("main_wkspace", timeout=0.05,
+                                        min_interval=0.01, max_interval=0.01)
+            cancel = threading.Event()
+            cancel.set()
+            ret = self.pl.wait_for_update("main_wkspace", cancel=cancel)
+            self.assertEqual(ret.status, "Calculating")
+
+    def test_wait_for_checkin_async(self):
+        def statuses(transferred):
+            return [{"status": "Checkin operation starting...",
+                     "totalSize": 0, "transferredSize": 0}] + \
+                   [{"status": "Running", "totalSize": 100, "transferredSize": size}
+                    for size in transferred] + \
+                   [{"status": "Checkin finished", "totalSize": 100, "transferredSize": 100}]
+
+        async def wait_all():
+            return await asyncio.gather(*(self.pl.wait_for_checkin_async(wkspace,
+                                                                         min_interval=0,
+                                                                         max_interval=0)
+                                          for wkspace in ("wk1", "wk2")))
+
+        with HTTMock(self.status_mock("checkin", {"wk1": statuses([10, 50]),
+                                                  "wk2": statuses([90])})):
+            ret = asyncio.run(wait_all())
+        self.assertEqual([status.status for status in ret], ["Checkin finished"] * 2)
+        self.assertIsInstance(ret[0], self.pl.model.CheckinStatus)
+
+    def test_annotate(self):
+        scheme, _, netloc = self.url.partition("://")
+        revisions = {  # revision_id: (changeset_id, owner, content)
+            101: (1, "alice", b"a\nb\nc\n"),
+            102: (2, "bob",   b"a\nB\nc\nd\n"),
+            103: (3, "carol", b"x\na\nB\nd\n"),
+        }
+        history = [{"type": "text", "revisionId": revision_id, "changesetId": changeset_id,
+                    "branchName": "/main", "repositoryName": "my_repo",
+                    "creationDate": "2015-04-09T09:51:20",
+                    "owner": {"name": owner, "isGroup": False}}
+                   for revision_id, (changeset_id, owner, _) in revisions.items()]
+        requested = []
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/branches/main/history/src/foo.c$")
+        def history_mock(url, request):
+            return {"status_code": 200, "content": history[::-1]}
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/revisions/\d+/blob$")
+        def blob_mock(url, request):
+            revision_id = int(url.path.split("/")[-2])
+            requested.append(revision_id)
+            return {"status_code": 200, "content": revisions[revision_id][2]}
+
+        pl = Plastic(self.url, api_version="1")
+        BRANCH = pl.model.ObjectType.BRANCH
+        with HTTMock(history_mock, blob_mock):
+            ret = pl.annotate("my_repo", BRANCH, "/main", "src/foo.c")
+        self.assertEqual([(line.text, line.changeset_id, line.owner) for line in ret],
+                         [("x", 3, "carol"), ("a", 1, "alice"),
+                          ("B", 2, "bob"), ("d", 2, "bob")])
+        self.assertEqual(ret[0].line_number, 1)
+        self.assertEqual(sorted(requested), [101, 102, 103])
+        # A new revision is annotated incrementally.
+        revisions[104] = (4, "dave", b"x\na\nB\nd\ne\n")
+        history.append(dict(history[-1], revisionId=104, changesetId=4,
+                            owner={"name": "dave", "isGroup": False}))
+        with HTTMock(history_mock, blob_mock):
+            ret = pl.annotate("my_repo", BRANCH, "/main", "src/foo.c")
+        self.assertEqual([line.owner for line in ret],
+                         ["carol", "alice", "bob", "bob", "dave"])
+        self.assertEqual(sorted(requested), [101, 102, 103, 104])
+
     # Diff
 
     def test_diff_changesets(self):
@@ -3256,3 +3522,160 @@ class TestPlastic(unittest.TestCase):
         method_name = "move_workspace_item"
         for test in self.select_tests_for_method(method_name):
             ret = self.do_test(test)
+
+    def test_workspace_items_batch(self):
+        scheme, _, netloc = self.url.partition("://")
+        requested = []
+
+        @urlmatch(scheme=scheme, netloc=netloc,
+                  path=r"^/api/v1/wkspaces/\w+/content/[^/]+(/[^/]+)*$")
+        def content_mock(url, request):
+            item_path = url.path.split("/content/")[1]
+            requested.append((request.method, item_path))
+            return {"status_code": 200,
+                    "content": {"affectedPaths": ["/wk/src", "/wk/" + item_path]}}
+
+        with HTTMock(content_mock):
+            ret = self.pl.add_workspace_items("my_wkspace", ["src/a.c", "src/b.c", "src/c.c"])
+            self.assertIsInstance(ret, self.pl.model.AffectedPaths)
+            self.assertEqual(sorted(map(str, ret.paths)),
+                             ["/wk/src", "/wk/src/a.c", "/wk/src/b.c", "/wk/src/c.c"])
+            self.assertEqual(sorted(requested), [("POST", "src/a.c"), ("POST", "src/b.c"),
+                                                 ("POST", "src/c.c")])
+            requested.clear()
+            ret = self.pl.checkout_workspace_items("my_wkspace", ["src/a.c", "src/b.c"],
+                                                   workers=1)
+            self.assertEqual(requested, [("PUT", "src/a.c"), ("PUT", "src/b.c")])
+            requested.clear()
+            # dependent moves keep their order
+            ret = self.pl.move_workspace_items("my_wkspace",
+                                               [("src/b.c", "src/c.c"), ("src/a.c", "src/b.c"),
+                                                ("lib", "src/lib"), ("doc", "docs")])
+            self.assertEqual(requested, [("PATCH", "src/b.c"), ("PATCH", "src/a.c"),
+                                         ("PATCH", "lib"), ("PATCH", "doc")])
+            self.assertEqual([str(path) for path in ret.paths],
+                             ["/wk/src", "/wk/src/b.c", "/wk/src/a.c", "/wk/lib", "/wk/doc"])
+
+        @urlmatch(scheme=scheme, netloc=netloc, path=r"^/api/v1/wkspaces/\w+/content/src/b.c$")
+        def failing_mock(url, request):
+            return {"status_code": 409, "content": {"error": {"message": "Locked"}}}
+
+        for workers in (1, 8):
+            with HTTMock(failing_mock, content_mock):
+                with self.assertRaises(PlasticBatchError) as ctx:
+                    self.pl.checkout_workspace_items("my_wkspace",
+                                                     ["src/a.c", "src/b.c", "src/c.c"],
+                                                     workers=workers)
+            self.assertEqual([str(path) for path in ctx.exception.result.paths],
+                             ["/wk/src", "/wk/src/a.c", "/wk/src/c.c"])
+            self.assertEqual(list(ctx.exception.errors), ["src/b.c"])
+
+    # Export
+
+    export_tree = {
+        "/": [
+            {"revisionId": 10, "type": "directory", "size": 0, "name": "src", "path": "/src"},
+            {"revisionId": 11, "type": "file", "size": 6, "name": "README", "path": "/README",
+             "hash": "xHx8c4MiWrVf9ZHLWcQeaw=="},
+        ],
+        "/src": [
+            {"revisionId": 12, "type": "file", "size": 4, "name": "main.c", "path": "/src/main.c",
+             "hash": "+tWN5zZkldtGUM/vrC/NYQ=="},
+        ],
+    }
+    export_blobs = {
+        11: b"README",
+        12: b"main",
+    }
+
+    def export_mock(self, requested):
+        scheme, _, netloc = self.url.partition("://")
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/changesets/\d+/contents(/.*)?$")
+        def contents_mock(url, request):
+            path = "/" + url.path.partition("/contents")[2].strip("/")
+            return {"status_code": 200,
+                    "content": {"revisionId": 1, "type": "directory", "size": 0,
+                                "name": path.rpartition("/")[2], "path": path,
+                                "items": self.export_tree[path]}}
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/revisions/\d+/blob$")
+        def blob_mock(url, request):
+            revision_id = int(url.path.split("/")[-2])
+            requested.append(revision_id)
+            return {"status_code": 200, "content": self.export_blobs[revision_id]}
+
+        return HTTMock(contents_mock, blob_mock)
+
+    def test_export_changeset(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dest_dir = Path(tmp_dir).resolve()
+            requested = []
+            with self.export_mock(requested):
+                ret = self.pl.export_changeset("my_repo", 3, dest_dir, workers=2)
+            self.assertEqual(set(ret), {dest_dir/"README", dest_dir/"src"/"main.c"})
+            self.assertEqual(sorted(requested), [11, 12])
+            self.assertEqual((dest_dir/"src"/"main.c").read_bytes(), b"main")
+            self.assertEqual(sorted(path.name for path in dest_dir.rglob("*")),
+                             ["README", "main.c", "src"])
+            # Re-export fetches only the files that differ.
+            (dest_dir/"README").write_bytes(b"readme")
+            requested = []
+            with self.export_mock(requested):
+                ret = self.pl.export_changeset("my_repo", 3, dest_dir)
+            self.assertEqual(ret, (dest_dir/"README",))
+            self.assertEqual(requested, [11])
+            self.assertEqual((dest_dir/"README").read_bytes(), b"README")
+
+    def test_sync_export(self):
+        scheme, _, netloc = self.url.partition("://")
+        repository = {"name": "my_repo", "server": "localhost:8084"}
+        diffs = [
+            {"status": "Changed", "path": "/README", "revisionId": 11,
+             "hash": "xHx8c4MiWrVf9ZHLWcQeaw==", "isDirectory": False},
+            {"status": "Moved", "path": "/src/app.c", "srcPath": "/src/main.c",
+             "revisionId": 12, "hash": "+tWN5zZkldtGUM/vrC/NYQ==",
+             "srcHash": "+tWN5zZkldtGUM/vrC/NYQ==", "isDirectory": False},
+            {"status": "Deleted", "path": "/old", "isDirectory": True},
+            {"status": "Added", "path": "/docs", "isDirectory": True},
+            {"status": "Added", "path": "/docs/index.rst", "revisionId": 13,
+             "hash": "", "isDirectory": False},
+        ]
+        for diff in diffs:
+            diff.update(isUnderXlink=False, isItemFSProtectionChanged=False,
+                        itemFileSystemProtection="NOT_DEFINED", repository=repository)
+        blobs = {11: b"README", 13: b"Index"}
+        requested = []
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/changesets/4/diff/3$")
+        def diff_mock(url, request):
+            return {"status_code": 200, "content": diffs}
+
+        @urlmatch(scheme=scheme, netloc=netloc, method="get",
+                  path=r"^/api/v1/repos/\w+/revisions/\d+/blob$")
+        def blob_mock(url, request):
+            revision_id = int(url.path.split("/")[-2])
+            requested.append(revision_id)
+            return {"status_code": 200, "content": blobs[revision_id]}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dest_dir = Path(tmp_dir).resolve()
+            (dest_dir/"src").mkdir()
+            (dest_dir/"old").mkdir()
+            (dest_dir/"README").write_bytes(b"readme")
+            (dest_dir/"src"/"main.c").write_bytes(b"main")
+            (dest_dir/"old"/"x.txt").write_bytes(b"x")
+            with HTTMock(diff_mock, blob_mock):
+                ret = self.pl.sync_export("my_repo", 3, 4, dest_dir)
+            self.assertEqual(set(ret), {dest_dir/"README", dest_dir/"src"/"app.c",
+                                        dest_dir/"old", dest_dir/"docs",
+                                        dest_dir/"docs"/"index.rst"})
+            self.assertEqual(sorted(requested), [11, 13])
+            self.assertEqual(sorted(str(path.relative_to(dest_dir).as_posix())
+                                    for path in dest_dir.rglob("*")),
+                             ["README", "docs", "docs/index.rst", "src", "src/app.c"])
+            self.assertEqual((dest_dir/"README").read_bytes(), b"README")
+            self.assertEqual((dest_dir/"src"/"app.c").read_bytes(), b"main")
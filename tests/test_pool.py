@@ -0,0 +1,85 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from pathlib import Path
+import tempfile
+
+from httmock import urlmatch, HTTMock
+
+from plasticscm import PlasticPool
+from plasticscm.rest import REST
+
+pool_config = """\
+[global]
+default = us
+
+[eu]
+url = http://eu.plastic:9090
+server = eu-scm:8087
+
+[us]
+url = http://us.plastic:9090
+server = us-scm:8087
+
+[us2]
+url = http://us.plastic:9090
+"""
+
+
+def repo(name, server):
+    return {"repId": {"id": 1, "moduleId": 0}, "name": name,
+            "guid": "c43e1cf9-50b0-4e0d-aca5-c1814d016425",
+            "owner": {"name": "all", "isGroup": False}, "server": server}
+
+
+@urlmatch(method="get", path=r"^/api/v1/repos$")
+def repos_mock(url, request):
+    server = url.netloc.split(".")[0] + "-scm:8087"
+    return {"status_code": 200, "content": [repo("default", server), repo("game", server)]}
+
+
+@urlmatch(method="get", path=r"^/api/v1/repos/\w+$")
+def repo_mock(url, request):
+    server = url.netloc.split(".")[0] + "-scm:8087"
+    return {"status_code": 200, "content": repo(url.path.split("/")[-1], server)}
+
+
+class TestPlasticPool(unittest.TestCase):
+
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = Path(tmp_dir)/"plasticscm.cfg"
+            config_file.write_text(pool_config)
+            self.pool = PlasticPool.from_config(config_files=[config_file])
+
+    def test_clients(self):
+        pool = self.pool
+        self.assertEqual(list(pool), ["eu", "us", "us2"])
+        client, name = pool.client("game@US-SCM:8087")
+        self.assertIs(client, pool["us"])
+        self.assertEqual(name, "game")
+        self.assertIs(pool.client("game@us2")[0], pool["us2"])
+        self.assertIs(pool.client("game")[0], pool["us"])  # [global] default
+        self.assertIs(pool["us2"], pool["us"])  # the same host
+        with self.assertRaises(KeyError):
+            pool.client("game@asia-scm:8087")
+
+    def test_host_session(self):
+        self.assertIs(REST.host_session("http://US.plastic:9090/api"),
+                      REST.host_session("http://us.plastic:9090"))
+        self.assertIsNot(REST.host_session("http://us.plastic:9090"),
+                         REST.host_session("http://eu.plastic:9090"))
+
+    def test_dispatch_and_query(self):
+        pool = self.pool
+        with HTTMock(repos_mock, repo_mock):
+            repository = pool.dispatch("get_repository", "game@us-scm:8087")
+            self.assertEqual(repository.full_name, "game@us-scm:8087")
+            repositories = pool.query("get_repositories")
+            results = pool.fan_out("get_repositories")
+        self.assertEqual(list(results), ["eu", "us", "us2"])
+        self.assertIs(results["us2"], results["us"])
+        self.assertEqual([repository.full_name for repository in repositories],
+                         ["default@eu-scm:8087", "game@eu-scm:8087",
+                          "default@us-scm:8087", "game@us-scm:8087"])
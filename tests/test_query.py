@@ -0,0 +1,132 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from datetime import datetime, date, timedelta, timezone
+from urllib.parse import parse_qs
+from types import SimpleNamespace
+import json
+
+from httmock import all_requests, HTTMock
+
+from plasticscm import Plastic, Q, Query, predicate, pushdown
+
+repository = {"name": "repo", "server": "localhost:8087"}
+
+
+def changeset(id, comment, day):  # noqa A002
+    return {"id": id, "parentId": id - 1, "comment": comment,
+            "creationDate": "2019-01-{:02d}T10:00:00".format(day),
+            "guid": "1b30674f-14cc-4fd7-a5b2-00d6e0e1e8c3",
+            "branch": {"name": "/main", "id": 3, "parentId": -1, "lastChangeset": 9,
+                       "creationDate": "2015-06-30T15:18:08",
+                       "guid": "1b30674f-14cc-4fd7-a5b2-00d6e0e1e8c3",
+                       "repository": repository},
+            "owner": {"name": "tester", "isGroup": False},
+            "repository": repository}
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.changesets = [changeset(1, "init", 1), changeset(2, "fix: crash", 2),
+                           changeset(3, "feature", 3), changeset(4, "fix: typo", 4)]
+        self.queries = []
+
+        @all_requests
+        def mock(url, request):
+            self.queries.append(parse_qs(url.query).get("q", [None])[0])
+            return {"status_code": 200, "content": json.dumps(self.changesets[1:])}
+
+        self.mock = mock
+
+    def test_compile(self):
+        self.assertEqual(str(Q.id > 100), "id > 100")
+        self.assertEqual(str(Q.owner == "tester"), "owner = 'tester'")
+        self.assertEqual(str(Q.name.like("%task%") | (Q.id != 3)),
+                         "name like '%task%' or id != 3")
+        self.assertEqual(str((Q.id > 1) & ((Q.owner == "a") | (Q.owner == "b")) & (Q.id < 9)),
+                         "id > 1 and (owner = 'a' or owner = 'b') and id < 9")
+        self.assertEqual(str(Q.date.between(date(2019, 1, 1), datetime(2019, 2, 1, 12, 30))),
+                         "date >= '2019/01/01' and date <= '2019/02/01 12:30:00'")
+        self.assertEqual(str(Q["branch"] == "/main"), "branch = '/main'")
+        with self.assertRaises(ValueError):
+            Q.comment == "it's"
+        with self.assertRaises(TypeError):
+            Q.id == 1.5
+        with self.assertRaises(TypeError):
+            1 < Q.id < 3  # chained comparisons
+        with self.assertRaises(ValueError):
+            str((Q.id > 1) & (lambda chset: True))
+
+    def test_pushdown(self):
+        def fix(chset):
+            return chset.comment.startswith("fix")
+        server, local = pushdown((Q.id > 1) & fix & (Q.owner == "tester"))
+        self.assertEqual(str(server), "id > 1 and owner = 'tester'")
+        self.assertIsInstance(local, Query)
+        self.assertIn("<fix>", repr(local))
+        self.assertEqual(pushdown(fix)[0], None)
+        self.assertEqual(pushdown(Q.id > 1)[1], None)
+        # an or is sent to the server if all its parts narrow the results down
+        server, local = pushdown((Q.id == 1) | ((Q.id > 3) & fix))
+        self.assertEqual(str(server), "id = 1 or id > 3")
+        self.assertIsNotNone(local)
+        server, local = pushdown((Q.id == 1) | predicate(fix))
+        self.assertIsNone(server)
+        # only the local part of the single partly sent part is checked
+        server, local = pushdown((Q.comment == "init") | ((Q.status == "x") & fix))
+        self.assertEqual(str(server), "comment = 'init' or status = 'x'")
+        self.assertEqual(repr(local), "<_Or comment = 'init' or <fix>>")
+        with self.assertRaises(ValueError):
+            pushdown((Q.status == "x") | ((Q.id > 3) & fix))
+        with self.assertRaises(ValueError):
+            pushdown((Q.status == "x") | fix)
+        # the local parts agree with the query
+        changesets = [SimpleNamespace(id=index, comment=comment)
+                      for index, comment in enumerate(["init", "fix: a", "feature", "fix: b"])]
+        for query in ((Q.id == 1) | ((Q.id > 2) & fix),
+                      ((Q.id < 1) & fix) | ((Q.id > 2) & fix) | (Q.comment == "feature")):
+            server, local = pushdown(query)
+            self.assertEqual([chset.id for chset in changesets if server(chset) and local(chset)],
+                             [chset.id for chset in changesets if query(chset)])
+
+    def test_find(self):
+        plastic = Plastic("http://localhost:9090")
+        with HTTMock(self.mock):
+            found = plastic.find("get_changesets", "repo",
+                                 where=(Q.date >= date(2019, 1, 2)) & (lambda chset:
+                                                                       "fix" in chset.comment))
+            self.assertEqual([chset.id for chset in found], [2, 4])
+            self.assertEqual(self.queries, ["date >= '2019/01/02'"])
+            found = plastic.find("get_changesets", "repo", where=Q.owner == "tester")
+            self.assertEqual([chset.id for chset in found], [2, 3, 4])
+            plastic.get_changesets_in_branch("repo", "/main", query=Q.comment.like("fix%"))
+            self.assertEqual(self.queries[-1], "comment like 'fix%'")
+            with self.assertRaises(ValueError):
+                plastic.find("get_repositories", where=Q.id > 1)
+            # local evaluation agrees with the query
+            changesets = plastic.get_changesets("repo")
+            query = Q.date.between(date(2019, 1, 3), date(2019, 1, 4)) | Q.comment.like("FIX: C%")
+            self.assertEqual([chset.id for chset in changesets if query(chset)], [2, 3])
+
+    def test_dates(self):
+        # the dates of the model are UTC
+        for chset in self.changesets:
+            chset["creationDate"] += "Z"
+        plastic = Plastic("http://localhost:9090")
+        with HTTMock(self.mock):
+            changesets = plastic.get_changesets("repo")
+            self.assertIsNotNone(changesets[0].creation_date.tzinfo)
+            plus2 = timezone(timedelta(hours=2))
+            for query, ids in [(Q.date > date(2019, 1, 3), [3, 4]),
+                               (Q.date >= datetime(2019, 1, 3, 10), [3, 4]),
+                               (Q.date >= datetime(2019, 1, 3, 12, tzinfo=plus2), [3, 4]),
+                               (Q.date == datetime(2019, 1, 2, 10), [2])]:
+                self.assertEqual([chset.id for chset in changesets if query(chset)], ids)
+            found = plastic.find("get_changesets", "repo",
+                                 where=(Q.date < date(2019, 1, 3)) | (lambda chset:
+                                                                      "typo" in chset.comment))
+            self.assertEqual([chset.id for chset in found], [2, 4])
+        self.assertEqual(str(Q.date < datetime(2019, 1, 3, 1, tzinfo=plus2)),
+                         "date < '2019/01/02 23:00:00'")
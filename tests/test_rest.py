@@ -0,0 +1,138 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+
+import requests
+from httmock import all_requests, HTTMock
+
+from plasticscm import Plastic
+from plasticscm.rest import REST, ReplicaSession, Route
+import plasticscm.v1.api  # noqa: F401 (the routes)
+
+primary = "http://primary:9090/api/v1"
+replica1 = "http://replica1:9090/api/v1"
+replica2 = "http://replica2:9090/api/v1"
+
+
+class TestReplicaSession(unittest.TestCase):
+
+    def setUp(self):
+        self.hits = []
+        self.broken = {"replica2:9090": 503}
+
+        @all_requests
+        def mock(url, request):
+            self.hits.append((request.method, url.netloc))
+            error = self.broken.get(url.netloc)
+            if error == "down":
+                raise requests.ConnectionError("down")
+            return {"status_code": error or 200, "content": []}
+
+        self.mock = mock
+
+    def test_routing(self):
+        session = ReplicaSession(primary, [replica1, replica2])
+        with HTTMock(self.mock):
+            for _ in range(3):
+                self.assertEqual(session.get(primary + "/repos").status_code, 200)
+            # not yet measured urls are probed first, broken ones are skipped
+            self.assertEqual([netloc for _, netloc in self.hits[:3]],
+                             ["primary:9090", "replica1:9090", "replica2:9090"])
+            self.assertIn(self.hits[3][1], ("primary:9090", "replica1:9090"))
+            self.assertIsNone(session.latencies[replica2])
+            session._latency[primary] = 1.0
+            session._latency[replica1] = 0.001
+            self.hits.clear()
+            session.get(primary + "/repos")
+            session.post(primary + "/repos", data={})
+            session.delete(primary + "/repos/foo")
+            self.assertEqual(self.hits, [("GET", "replica1:9090"), ("POST", "primary:9090"),
+                                         ("DELETE", "primary:9090")])
+            # the workspaces (and unknown routes) are local to the primary
+            self.hits.clear()
+            session.get(primary + "/repos/foo/branches")
+            session.get(primary + "/wkspaces")
+            session.get(primary + "/wkspaces/wk/changes?types=added")
+            session.get(primary + "/repos/foo/unknown")
+            self.assertEqual([netloc for _, netloc in self.hits],
+                             ["replica1:9090", "primary:9090", "primary:9090", "primary:9090"])
+            # a replica which goes down falls back to the next best one
+            self.broken["replica1:9090"] = "down"
+            self.hits.clear()
+            session.get(primary + "/repos")
+            self.assertEqual(self.hits, [("GET", "replica1:9090"), ("GET", "primary:9090")])
+            # everything down
+            self.broken["primary:9090"] = "down"
+            with self.assertRaises(requests.ConnectionError):
+                session.get(primary + "/repos")
+
+    def test_plastic(self):
+        pl = Plastic("http://primary:9090",
+                     replica_urls=["http://replica1:9090", "http://replica2:9090"])
+        with HTTMock(self.mock):
+            pl.get_repositories()
+            pl.get_repositories()
+            self.assertEqual(self.hits, [("GET", "primary:9090"), ("GET", "replica1:9090")])
+            self.hits.clear()
+            pl.delete_repository("foo")
+            self.assertEqual(self.hits, [("DELETE", "primary:9090")])
+            self.hits.clear()
+            pl.get_workspaces()
+            pl.get_workspaces()
+            self.assertEqual(self.hits, [("GET", "primary:9090"), ("GET", "primary:9090")])
+
+
+class TestRoute(unittest.TestCase):
+
+    def test_build(self):
+        route = Route("/repos/{repo_name}/branches/{branch_name}/history/{item_path}")
+        self.assertEqual(route, "/repos/{repo_name}/branches/{branch_name}/history/{item_path}")
+        self.assertEqual(route.fields, ("repo_name", "branch_name", "item_path"))
+        self.assertEqual(route.build(repo_name="default", branch_name="/main/task1",
+                                     item_path="/src/a.c"),
+                         "/repos/default/branches/main/task1/history/src/a.c")
+        self.assertEqual(route.build(repo_name="my repo/x", branch_name="/main/task #1/",
+                                     item_path="/src/100%/a b.c"),
+                         "/repos/my%20repo%2Fx/branches/main/task%20%231"
+                         "/history/src/100%25/a%20b.c")
+        self.assertEqual(Route("/repos/{repo_name}/changesets/{changeset_id}").build(
+                         repo_name="default", changeset_id=12), "/repos/default/changesets/12")
+        self.assertEqual(Route("/repos").build(), "/repos")
+        with self.assertRaises(TypeError):
+            route.build(repo_name="default")
+
+    def test_match(self):
+        route = Route("/repos/{repo_name}/branches/{branch_name}/history/{item_path}")
+        self.assertEqual(route.match("/repos/my%20repo/branches/main/task%231/history/src/a.c"),
+                         {"repo_name": "my repo", "branch_name": "main/task#1",
+                          "item_path": "src/a.c"})
+        self.assertIsNone(route.match("/repos/default/branches/main"))
+
+    def test_registry(self):
+        from plasticscm.v1.api import API
+        self.assertIs(API.get_branch.REST[0], next(
+            route for route in REST.routes() if route.endpoint.endswith("API.get_branch")))
+        route, fields = REST.resolve("get", "/repos/default/branches/main/task1")
+        self.assertEqual(route.endpoint, "plasticscm.v1.api.API.get_branch")
+        self.assertEqual(fields, {"repo_name": "default", "branch_name": "main/task1"})
+        route, fields = REST.resolve("GET", "/repos/default/branches/main/task1/changesets")
+        self.assertEqual(route.endpoint, "plasticscm.v1.api.API.get_changesets_in_branch")
+        self.assertEqual(fields, {"repo_name": "default", "branch_name": "main/task1"})
+        route, fields = REST.resolve("DELETE", "/repos/default")
+        self.assertEqual((route.method, route), ("DELETE", "/repos/{repo_name}"))
+        self.assertIsNone(REST.resolve("GET", "/nothing"))
+
+    def test_encoded_request(self):
+        urls = []
+
+        @all_requests
+        def mock(url, request):
+            urls.append(request.path_url)
+            return {"status_code": 200, "content": []}
+
+        pl = Plastic(primary[:-len("/api/v1")])
+        with HTTMock(mock):
+            pl.get_item_revision_history_in_branch("my repo", "/main/task#1", "/src/a b.c")
+        self.assertEqual(urls, ["/api/v1/repos/my%20repo/branches/main/task%231"
+                                "/history/src/a%20b.c"])
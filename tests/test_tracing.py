@@ -0,0 +1,145 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from unittest import mock
+import sys
+
+import requests
+from httmock import all_requests, HTTMock
+
+from plasticscm import Plastic, Hook, Span, SlowCallLog
+from plasticscm import rest
+
+repo = {"repId": {"id": 1, "moduleId": 0}, "name": "default",
+        "guid": "c43e1cf9-50b0-4e0d-aca5-c1814d016425",
+        "owner": {"name": "all", "isGroup": False}, "server": "localhost:8084"}
+
+
+class RecordingHook(Hook):
+
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, span):
+        self.events.append(("start", span.method, span.route, dict(span.params)))
+
+    def on_end(self, span):
+        self.events.append(("end", span.status, span.retries, span.error, span))
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.down = set()
+
+        @all_requests
+        def mock(url, request):
+            if url.netloc in self.down:
+                raise requests.ConnectionError("down")
+            if url.path.endswith("/missing"):
+                return {"status_code": 404, "content": {"error": "not found"}}
+            return {"status_code": 200, "content": repo}
+
+        self.mock = mock
+
+    def test_hooks(self):
+        pl = Plastic("http://tracing.plastic:9090")
+        hook = RecordingHook()
+        pl.add_hook(hook)
+        self.assertEqual(pl.hooks, (hook,))
+        with HTTMock(self.mock):
+            pl.get_repository("default")
+            with self.assertRaises(requests.HTTPError):
+                pl.get_repository("missing")
+            pl.remove_hook(hook)
+            pl.get_repository("default")
+        self.assertEqual(len(hook.events), 4)
+        self.assertEqual(hook.events[0], ("start", "GET", "/repos/{repo_name}",
+                                          {"repo_name": "default"}))
+        _, status, retries, error, span = hook.events[1]
+        self.assertEqual((status, retries, error), (200, 0, None))
+        self.assertGreaterEqual(span.duration, span.network + span.decode)
+        self.assertGreater(span.bytes_in, 0)
+        _, status, _, error, _ = hook.events[3]
+        self.assertEqual(status, 404)
+        self.assertIsInstance(error, requests.HTTPError)
+        with self.assertRaises(ValueError):
+            pl.remove_hook(hook)
+
+    def test_failing_hooks(self):
+        class FailingHook(Hook):
+            def __init__(self, fail_on):
+                self.fail_on, self.events = fail_on, []
+
+            def on_start(self, span):
+                self.events.append("start")
+                if self.fail_on == "start":
+                    raise RuntimeError("broken hook")
+
+            def on_end(self, span):
+                self.events.append("end")
+                if self.fail_on == "end":
+                    raise RuntimeError("broken hook")
+
+        pl = Plastic("http://tracing.plastic:9090")
+        recording, slow_log = RecordingHook(), SlowCallLog(threshold=0, profile=True)
+        failing_start, failing_end = FailingHook("start"), FailingHook("end")
+        for hook in (recording, slow_log, failing_start, failing_end):
+            pl.add_hook(hook)
+        with HTTMock(self.mock), self.assertLogs("plasticscm.rest", "ERROR") as logs, \
+             self.assertLogs("plasticscm.slow", "WARNING"):
+            for _ in range(2):
+                self.assertEqual(pl.get_repository("default").name, "default")
+        self.assertEqual(len(logs.records), 4)
+        self.assertEqual(failing_start.events, ["start"] * 2)  # not ended
+        self.assertEqual(failing_end.events, ["start", "end"] * 2)
+        self.assertEqual([event[0] for event in recording.events], ["start", "end"] * 2)
+        self.assertEqual(len(slow_log.entries), 2)
+        self.assertTrue(all(entry.profile for entry in slow_log.entries))
+        self.assertFalse(SlowCallLog._capture_lock.locked())
+        self.assertIsNone(getattr(rest._local, "span", None))
+
+    def test_failed_capture(self):
+        log = SlowCallLog(threshold=0, profile=True, trace_memory=True)
+        span = Span("GET", "/repos", {})
+        with mock.patch("tracemalloc.start", side_effect=RuntimeError("no memory")):
+            with self.assertRaises(RuntimeError):
+                log.on_start(span)
+        self.assertFalse(SlowCallLog._capture_lock.locked())
+        self.assertIsNone(sys.getprofile())
+        self.assertNotIn(log, span.data)
+
+    def test_retries(self):
+        pl = Plastic("http://primary:9090", replica_urls=["http://replica:9090"])
+        hook = RecordingHook()
+        pl.add_hook(hook)
+        self.down.add("primary:9090")
+        with HTTMock(self.mock):
+            pl.get_repository("default")
+        self.assertEqual(hook.events[-1][1:3], (200, 1))
+
+    def test_slow_call_log(self):
+        pl = Plastic("http://tracing.plastic:9090")
+        fast_log = SlowCallLog(threshold=3600, profile=True, trace_memory=True)
+        slow_log = SlowCallLog(threshold=0, profile=True, trace_memory=True)
+        pl.add_hook(fast_log)
+        pl.add_hook(slow_log)
+        with HTTMock(self.mock):
+            with self.assertLogs("plasticscm.slow", "WARNING") as logs:
+                pl.get_repository("default")
+                pl.remove_hook(fast_log)
+                pl.get_repository("default")
+        self.assertEqual(fast_log.entries, ())
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("GET /repos/{repo_name}", logs.output[0])
+        entry = slow_log.entries[0]
+        self.assertEqual(entry.params, {"repo_name": "default"})
+        self.assertGreater(entry.bytes_in, 0)
+        self.assertEqual(entry.status, 200)
+        # the first call was captured by the fast log
+        self.assertIsNone(entry.profile)
+        entry = slow_log.entries[1]
+        self.assertIn("get_repository", entry.profile)
+        self.assertGreaterEqual(entry.memory_peak, 0)
+        self.assertIsInstance(entry.memory_top, list)
@@ -0,0 +1,110 @@
+# Copyright (c) 2019 Adam Karpierz
+# SPDX-License-Identifier: Zlib
+
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import os
+import tempfile
+import gzip
+import time
+
+from plasticscm import Plastic, PlasticReplayError
+from plasticscm import TrafficRecorder, TrafficReplayer, load_traffic
+from plasticscm.rest import REST
+
+from benchmarks.data import SyntheticRepo
+from benchmarks.server import FakeServer
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "traffic.jsonl.gz")
+        self.repo = SyntheticRepo(changesets=10, branches=2, labels=1, diff_size=3,
+                                  history_size=2, dir_size=2, blob_size=300)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def record(self):
+        with FakeServer(self.repo, latency=0.05) as server:
+            url = server.url
+            pl = Plastic(url)
+            with TrafficRecorder(self.path):
+                repos = pl.get_repositories()
+                changeset = pl.get_changeset("bench", 3)
+                content = bytes(pl.get_item_content("bench", 5000))
+                with self.assertRaises(Exception):
+                    pl.get_changeset("bench", 99)
+        return url, repos, changeset, content
+
+    def test_record_replay(self):
+        url, repos, changeset, content = self.record()
+        exchanges = load_traffic(self.path)
+        self.assertEqual([(exchange.method, exchange.status) for exchange in exchanges],
+                         [("GET", 200), ("GET", 200), ("GET", 200), ("GET", 404)])
+        self.assertEqual(exchanges[2].body, content)
+        self.assertGreaterEqual(exchanges[0].elapsed, 0.05)
+        # The server is gone: everything comes from the recorded traffic.
+        pl = Plastic(url)
+        with TrafficReplayer(self.path):
+            start = time.perf_counter()
+            for _ in range(3):
+                self.assertEqual([repo.guid for repo in pl.get_repositories()],
+                                 [repo.guid for repo in repos])
+                self.assertEqual(pl.get_changeset("bench", 3).guid, changeset.guid)
+                self.assertEqual(bytes(pl.get_item_content("bench", 5000)), content)
+            self.assertLess(time.perf_counter() - start, 0.05 * 3)
+            with self.assertRaises(Exception):
+                pl.get_changeset("bench", 99)
+            with self.assertRaises(PlasticReplayError):
+                pl.get_changeset("bench", 4)
+        # paced replay and no looping
+        with TrafficReplayer(exchanges, speed=1.0, loop=False) as replayer:
+            start = time.perf_counter()
+            pl.get_repositories()
+            self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+            with self.assertRaises(PlasticReplayError):
+                pl.get_repositories()
+            replayer.rewind()
+            pl.get_repositories()
+        # unmounted
+        self.assertNotIsInstance(REST.host_session(url).get_adapter(url), TrafficReplayer)
+
+    def test_record_encoded(self):
+        content = b"encoded content " * 200
+        body = gzip.compress(content)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa N802
+                self.send_response(200)
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # noqa A002
+                pass
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://{}:{}".format(*httpd.server_address[:2])
+            pl = Plastic(url)
+            with TrafficRecorder() as recorder:
+                self.assertEqual(bytes(pl.get_item_content("bench", 1)), content)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        headers = {name.lower(): value for name, value in recorder.exchanges[0].headers.items()}
+        self.assertNotIn("content-encoding", headers)
+        self.assertEqual(headers["content-length"], str(len(content)))
+        with TrafficReplayer(recorder.exchanges):
+            self.assertEqual(bytes(pl.get_item_content("bench", 1)), content)
+
+
+if __name__.rpartition(".")[-1] == "__main__":
+    unittest.main()